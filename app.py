@@ -1,15 +1,38 @@
+import base64
+import gzip
+import hashlib
+import itertools
+import json
+import mimetypes
+import mmap
 import os
+import random
 import re
 import sqlite3
-from urllib.parse import quote
+import struct
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from urllib.parse import quote, unquote
 from functools import wraps
-from datetime import datetime
-from io import BytesIO
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from io import BytesIO, RawIOBase
 from typing import Tuple
 
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
 from flask import (
+    Blueprint,
     Flask,
+    current_app,
     g,
     render_template,
     request,
@@ -20,39 +43,72 @@ from flask import (
     session,
     Response,
     abort,
+    before_render_template,
+    template_rendered,
+    has_app_context,
+    has_request_context,
+    stream_with_context,
+    send_from_directory,
 )
 
-# Pillow (redimensionar imagens)
+# flock (Unix) serializa a publicação do snapshot do catálogo entre workers
 try:
-    from PIL import Image, ImageOps
+    import fcntl
 except Exception:
-    Image = None
-    ImageOps = None
+    fcntl = None
 
-# Postgres (Railway)
+# Brotli (opcional: sem ele a compressão das respostas fica só em gzip)
 try:
-    import psycopg
+    import brotli
 except Exception:
-    psycopg = None
+    brotli = None
+
+# Métricas Prometheus (opcional)
+try:
+    import prometheus_client as prom
+    from prometheus_client import multiprocess as prom_multiprocess
+except Exception:
+    prom = None
+    prom_multiprocess = None
 
 
 APP_NAME = "Distribuidora de Bebidas Nova Cidade"
 BASE_DIR = os.path.dirname(__file__)
 
-# Se existir DATABASE_URL -> Postgres
-DATABASE_URL = (os.getenv("DATABASE_URL") or "").strip()
 
-# Normaliza caso venha postgres://
-if DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = "postgresql://" + DATABASE_URL[len("postgres://") :]
 
-# SQLite fallback (se não tiver Postgres)
-DB_PATH = os.path.join(BASE_DIR, "database.sqlite3")
+def normalize_database_url(url: str) -> str:
+    # Normaliza caso venha postgres://
+    url = (url or "").strip()
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://") :]
+    return url
+
+
+# Se existir DATABASE_URL -> Postgres
+DATABASE_URL = normalize_database_url(os.getenv("DATABASE_URL"))
+
+# Réplica de leitura (opcional, só com Postgres): a vitrine lê dela
+DATABASE_READ_URL = normalize_database_url(os.getenv("DATABASE_READ_URL"))
+
+# SQLite fallback (se não tiver Postgres); SQLITE_PATH troca o arquivo (bench/testes)
+DB_PATH = os.getenv("SQLITE_PATH") or os.path.join(BASE_DIR, "database.sqlite3")
+
+# "production": WAL + pragmas + 1 conexão reaproveitada por thread
+# "default": comportamento antigo (conecta a cada request, journal padrão)
+SQLITE_PROFILE = (os.getenv("SQLITE_PROFILE") or "production").strip().lower()
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;",  # leitores não bloqueiam escritores (fica gravado no arquivo)
+    "PRAGMA synchronous=NORMAL;",  # seguro em WAL, bem menos fsync
+    "PRAGMA busy_timeout=5000;",
+    "PRAGMA cache_size=-20000;",  # ~20 MB de page cache por conexão
+    "PRAGMA mmap_size=268435456;",  # 256 MB
+    "PRAGMA temp_store=MEMORY;",
+)
 
 # Uploads locais (apenas para dev; em produção no Railway sem Volume isso SOME)
 DEFAULT_UPLOAD = os.path.join(BASE_DIR, "static", "uploads")
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", DEFAULT_UPLOAD)
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "webp"}
 
@@ -61,37 +117,660 @@ STORE_WHATSAPP_NUMBER = os.getenv("STORE_WHATSAPP_NUMBER", "5531999999999")
 ADMIN_USER = os.getenv("ADMIN_USER", "admin")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "NovaCidade@2026")
 
-app = Flask(__name__)
-app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-key-change-me")
-app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
-app.config["MAX_CONTENT_LENGTH"] = 12 * 1024 * 1024  # 12MB
+# Rotas e hooks ficam no blueprint; o app é montado em create_app() (final do arquivo)
+bp = Blueprint("main", __name__)
+
+
+# =========================
+# IMPORTS PESADOS (sob demanda)
+# =========================
+# Pillow e psycopg só carregam quando um upload ou uma conexão Postgres
+# precisam deles: o import do app (cold start e cada worker) fica mais leve.
+_lazy_modules = {}
+
+
+def load_pillow():
+    """
+    Retorna (Image, ImageOps) do Pillow, ou (None, None) se não estiver instalado.
+    """
+    if "PIL" not in _lazy_modules:
+        try:
+            from PIL import Image, ImageOps
+        except Exception:
+            Image = ImageOps = None
+        _lazy_modules["PIL"] = (Image, ImageOps)
+    return _lazy_modules["PIL"]
+
+
+def load_psycopg():
+    """
+    Retorna o módulo psycopg, ou None se não estiver instalado.
+    """
+    if "psycopg" not in _lazy_modules:
+        try:
+            import psycopg
+        except Exception:
+            psycopg = None
+        _lazy_modules["psycopg"] = psycopg
+    return _lazy_modules["psycopg"]
+
+
+def load_psycopg_pool():
+    """
+    Retorna psycopg_pool.ConnectionPool, ou None se não estiver instalado.
+    """
+    if "psycopg_pool" not in _lazy_modules:
+        try:
+            from psycopg_pool import ConnectionPool
+        except Exception:
+            ConnectionPool = None
+        _lazy_modules["psycopg_pool"] = ConnectionPool
+    return _lazy_modules["psycopg_pool"]
+
+
+# =========================
+# INSTRUMENTAÇÃO (Server-Timing + log de request lenta)
+# =========================
+MAX_LOGGED_QUERIES = 50
+
+
+def _request_timing():
+    if not has_app_context():
+        return None
+    return g.get("_timing")
+
+
+@bp.before_app_request
+def _start_timing():
+    g._timing = dict(
+        start=time.perf_counter(),
+        queries=0,
+        db_ms=0.0,
+        rows=0,
+        bytes=0,
+        tpl_ms=0.0,
+        compress_ms=0.0,
+        compress_desc="",
+        log=[],
+    )
+
+
+def _row_size(row) -> int:
+    size = 0
+    for v in row:
+        if isinstance(v, (bytes, bytearray, memoryview, str)):
+            size += len(v)
+        elif v is not None:
+            size += 8
+    return size
+
+
+class TimedCursor:
+    """
+    Embrulha o cursor devolvido por db_execute para contar tempo de fetch,
+    linhas e bytes lidos (no SQLite boa parte do trabalho acontece no fetch).
+    """
+
+    def __init__(self, cur, timing: dict, entry: dict):
+        self._cur = cur
+        self._timing = timing
+        self._entry = entry
+
+    def _account(self, rows, started):
+        ms = (time.perf_counter() - started) * 1000.0
+        n = len(rows)
+        nbytes = sum(_row_size(r) for r in rows)
+        self._timing["db_ms"] += ms
+        self._timing["rows"] += n
+        self._timing["bytes"] += nbytes
+        self._entry["ms"] += ms
+        self._entry["rows"] += n
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cur.fetchone()
+        self._account([row] if row is not None else [], started)
+        return row
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cur.fetchall()
+        self._account(rows, started)
+        return rows
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cur.fetchmany(size) if size is not None else self._cur.fetchmany()
+        self._account(rows, started)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+
+@before_render_template.connect
+def _template_timing_start(_sender, **_extra):
+    timing = _request_timing()
+    if timing is not None:
+        timing.setdefault("tpl_stack", []).append(time.perf_counter())
+
+
+@template_rendered.connect
+def _template_timing_end(_sender, **_extra):
+    timing = _request_timing()
+    if timing is not None and timing.get("tpl_stack"):
+        started = timing["tpl_stack"].pop()
+        # template incluído dentro de outro já está contado no tempo do de fora
+        if not timing["tpl_stack"]:
+            timing["tpl_ms"] += (time.perf_counter() - started) * 1000.0
+
+
+@bp.after_app_request
+def _finish_timing(response):
+    timing = _request_timing()
+    if timing is None:
+        return response
+
+    total_ms = (time.perf_counter() - timing["start"]) * 1000.0
+    if current_app.config.get("SERVER_TIMING"):
+        response.headers["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={timing["db_ms"]:.1f};desc="{timing["queries"]} queries, {timing["rows"]} rows, {timing["bytes"]} B"',
+                f'tpl;dur={timing["tpl_ms"]:.1f}',
+                f'compress;dur={timing["compress_ms"]:.1f};desc="{timing["compress_desc"]}"',
+                f"total;dur={total_ms:.1f}",
+            ]
+        )
+
+    if total_ms >= current_app.config.get("SLOW_REQUEST_MS", 500):
+        lines = [
+            f"{e['ms']:8.1f} ms {e['rows']:6d} rows  {e['sql']}" for e in timing["log"]
+        ]
+        current_app.logger.warning(
+            "Request lenta: %s %s %.1f ms (db %.1f ms em %d queries, %d rows, %d B; template %.1f ms; compressão %.1f ms)\n%s",
+            request.method,
+            request.full_path.rstrip("?"),
+            total_ms,
+            timing["db_ms"],
+            timing["queries"],
+            timing["rows"],
+            timing["bytes"],
+            timing["tpl_ms"],
+            timing["compress_ms"],
+            "\n".join(lines),
+        )
+    return response
+
+
+# =========================
+# MÉTRICAS (/metrics no formato Prometheus)
+# =========================
+# Com vários workers (gunicorn), defina PROMETHEUS_MULTIPROC_DIR apontando para
+# um diretório vazio: cada processo grava seus valores em arquivos mmap lá e o
+# /metrics agrega todos (ver gunicorn.conf.py).
+METRICS_TOKEN = (os.getenv("METRICS_TOKEN") or "").strip()
+
+if prom is not None:
+    HTTP_LATENCY = prom.Histogram(
+        "http_request_duration_seconds",
+        "Latência por endpoint Flask",
+        ["endpoint", "method"],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    )
+    HTTP_REQUESTS = prom.Counter(
+        "http_requests_total",
+        "Requests por endpoint e status",
+        ["endpoint", "method", "status"],
+    )
+    HTTP_IN_FLIGHT = prom.Gauge(
+        "http_requests_in_flight",
+        "Requests em andamento",
+        multiprocess_mode="livesum",
+    )
+    DB_LATENCY = prom.Histogram(
+        "db_query_duration_seconds",
+        "Latência de db_execute por tipo de comando",
+        ["op"],
+        buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+    )
+    IMAGE_PROCESSING = prom.Histogram(
+        "image_process_duration_seconds",
+        "Tempo de process_image_to_webp_bytes",
+        buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0),
+    )
+    REQUESTS_SHED = prom.Counter(
+        "http_requests_shed_total",
+        "Requests recusadas por rate limit (ip/global) ou limite de concorrência; storage = liberada sem conferir (buckets travados)",
+        ["endpoint", "reason"],
+    )
+    DB_READ_ROUTING = prom.Counter(
+        "db_read_routing_total",
+        "Leituras da vitrine por destino (replica/primary) e motivo",
+        ["target", "reason"],
+    )
+
+
+def metrics_enabled() -> bool:
+    return prom is not None
+
+
+def _endpoint_label() -> str:
+    # sem o prefixo do blueprint ("main.index" -> "index")
+    return (request.endpoint or "unmatched").split(".")[-1]
+
+
+@bp.before_app_request
+def _metrics_start():
+    if metrics_enabled():
+        HTTP_IN_FLIGHT.inc()
+        g._metrics_start = time.perf_counter()
+
+
+@bp.after_app_request
+def _metrics_record(response):
+    started = g.get("_metrics_start")
+    if started is not None:
+        g._metrics_start = None
+        HTTP_LATENCY.labels(_endpoint_label(), request.method).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(_endpoint_label(), request.method, str(response.status_code)).inc()
+        HTTP_IN_FLIGHT.dec()
+    return response
+
+
+@bp.teardown_app_request
+def _metrics_teardown(exc):
+    # exceção não tratada: after_request não rodou
+    started = g.get("_metrics_start")
+    if started is not None:
+        g._metrics_start = None
+        HTTP_LATENCY.labels(_endpoint_label(), request.method).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(_endpoint_label(), request.method, "500").inc()
+        HTTP_IN_FLIGHT.dec()
+
+
+def observe_db_query(sql: str, seconds: float):
+    if metrics_enabled():
+        op = (sql.lstrip().split(None, 1) or ["?"])[0].upper()
+        if op not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+            op = "OTHER"
+        DB_LATENCY.labels(op).observe(seconds)
+
+
+def metrics_registry():
+    if prom_multiprocess is not None and os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = prom.CollectorRegistry()
+        prom_multiprocess.MultiProcessCollector(registry)
+        return registry
+    return prom.REGISTRY
+
+
+@bp.get("/metrics")
+def metrics():
+    if not metrics_enabled():
+        abort(404)
+    auth = request.headers.get("Authorization") or ""
+    token_ok = bool(METRICS_TOKEN) and auth == f"Bearer {METRICS_TOKEN}"
+    if not token_ok and not is_admin_logged_in():
+        abort(403)
+    return Response(prom.generate_latest(metrics_registry()), mimetype=prom.CONTENT_TYPE_LATEST)
+
+
+# =========================
+# PROFILER (amostragem sob demanda)
+# =========================
+# Admin logado + header "X-Profile: 1" (ou ?_profile=1) amostra a pilha da
+# thread da request a cada PROFILE_INTERVAL_MS e grava no formato "collapsed"
+# (flamegraph.pl / speedscope). Com PROFILE_SAMPLE_EVERY=N, 1 a cada N requests
+# é amostrada automaticamente. Os perfis ficam em arquivos (PROFILE_DIR), para
+# todos os workers enxergarem, e só os PROFILE_KEEP mais recentes são mantidos.
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "nc_profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP") or "50")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS") or "5")
+PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY") or "0")
+
+_profile_counter = itertools.count(1)
+_PROFILE_NAME_RE = re.compile(r"^[0-9]+-[0-9]+-[0-9]+$")
+
+
+class StackSampler:
+    """
+    Thread que olha a pilha de outra thread via sys._current_frames() em
+    intervalos fixos. Só roda enquanto a request perfilada está em andamento.
+    """
+
+    def __init__(self, thread_id: int, interval_s: float):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ";".join(reversed(parts))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+def _should_profile() -> str:
+    flag = request.headers.get("X-Profile") or request.args.get("_profile")
+    if flag and flag != "0" and is_admin_logged_in():
+        return "manual"
+    if PROFILE_SAMPLE_EVERY > 0 and next(_profile_counter) % PROFILE_SAMPLE_EVERY == 0:
+        return "auto"
+    return ""
+
+
+@bp.before_app_request
+def _profile_start():
+    if request.endpoint in ("main.admin_profiles", "main.admin_profile_download", "main.asset", "static"):
+        return
+    mode = _should_profile()
+    if mode:
+        sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000.0)
+        g._profile = dict(sampler=sampler, mode=mode, start=time.perf_counter())
+        sampler.start()
+
+
+def _profile_finish(status_code: int):
+    prof = g.pop("_profile", None)
+    if prof is None:
+        return None
+    prof["sampler"].stop()
+    duration_ms = (time.perf_counter() - prof["start"]) * 1000.0
+
+    name = f"{int(time.time() * 1000)}-{os.getpid()}-{threading.get_ident() % 100000}"
+    meta = dict(
+        name=name,
+        created=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        mode=prof["mode"],
+        method=request.method,
+        path=request.full_path.rstrip("?"),
+        endpoint=request.endpoint or "",
+        status=status_code,
+        duration_ms=round(duration_ms, 1),
+        samples=prof["sampler"].samples,
+    )
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, name + ".txt"), "w", encoding="utf-8") as f:
+            f.write(prof["sampler"].collapsed())
+        with open(os.path.join(PROFILE_DIR, name + ".json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        prune_profiles()
+    except OSError:
+        current_app.logger.exception("Não foi possível salvar o perfil %s", name)
+        return None
+    return name
+
+
+@bp.after_app_request
+def _profile_after(response):
+    name = _profile_finish(response.status_code)
+    if name:
+        response.headers["X-Profile-Id"] = name
+    return response
+
+
+@bp.teardown_app_request
+def _profile_teardown(_exc):
+    if g.get("_profile") is not None:
+        _profile_finish(500)
+
+
+def prune_profiles():
+    names = sorted(f[:-5] for f in os.listdir(PROFILE_DIR) if f.endswith(".json"))
+    for old in names[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else names:
+        for ext in (".json", ".txt"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old + ext))
+            except OSError:
+                pass
+
+
+def list_profiles() -> list:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    out = []
+    for f in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not f.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, f), encoding="utf-8") as fh:
+                out.append(json.load(fh))
+        except (OSError, ValueError):
+            continue
+    return out
+
+
+# =========================
+# COMPRESSÃO DAS RESPOSTAS (br / gzip)
+# =========================
+# Roda antes dos outros after_request (é registrado depois deles), então o
+# tempo de CPU gasto aqui entra no Server-Timing ("compress"). Corpos iguais
+# (ex.: a vitrine para visitantes) são comprimidos uma vez só: o resultado
+# fica num cache LRU pelo hash do corpo.
+COMPRESS_MIN_BYTES = 500
+COMPRESSIBLE_MIMETYPES = {
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/csv",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "application/manifest+json",
+    "image/svg+xml",
+}
+
+
+class CompressionCache:
+    """
+    LRU limitado pelo total de bytes comprimidos guardados.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                return
+            self._data[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, old = self._data.popitem(last=False)
+                self.size -= len(old)
+
+
+def compress_body(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+@bp.after_app_request
+def _compress_response(response):
+    if not current_app.config.get("COMPRESSION"):
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response  # webp/png/woff2 etc. já vêm comprimidos
+    response.vary.add("Accept-Encoding")
+    if (
+        response.direct_passthrough
+        or response.is_streamed  # stream_with_context (backup, etc.): get_data() leria tudo para a memória
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    encoding = request.accept_encodings.best_match(["br", "gzip"] if brotli is not None else ["gzip"])
+    if not encoding:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    level = current_app.config["COMPRESSION_BR_QUALITY" if encoding == "br" else "COMPRESSION_GZIP_LEVEL"]
+    started = time.thread_time()
+    cache = current_app.extensions.get("compression_cache")
+    cache = cache.get() if cache is not None else None
+    key = (encoding, level, hashlib.sha256(body).digest())
+    compressed = cache.get(key) if cache is not None else None
+    hit = compressed is not None
+    if not hit:
+        compressed = compress_body(body, encoding, level)
+        if cache is not None:
+            cache.put(key, compressed)
+    cpu_ms = (time.thread_time() - started) * 1000.0
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    timing = _request_timing()
+    if timing is not None:
+        timing["compress_ms"] += cpu_ms
+        timing["compress_desc"] = f"{encoding} {len(body)} -> {len(compressed)} B{' (cache)' if hit else ''}"
+    return response
 
 
 # =========================
 # DB helpers
 # =========================
+def _config(key: str, default):
+    # fora de um app (ex.: importar_produtos.py) valem os valores do ambiente
+    if has_app_context():
+        return current_app.config.get(key, default)
+    return default
+
+
+def database_url() -> str:
+    return _config("DATABASE_URL", DATABASE_URL)
+
+
+def sqlite_path() -> str:
+    return _config("SQLITE_PATH", DB_PATH)
+
+
+def sqlite_profile() -> str:
+    return _config("SQLITE_PROFILE", SQLITE_PROFILE)
+
+
 def using_postgres() -> bool:
-    return bool(DATABASE_URL)
+    return bool(database_url())
+
+
+_sqlite_local = threading.local()
+
+
+def sqlite_connect(path=None, profile=None):
+    conn = sqlite3.connect(path or sqlite_path())
+    conn.row_factory = sqlite3.Row
+    if (profile or sqlite_profile()) == "production":
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+    return conn
+
+
+def get_sqlite_connection():
+    """
+    No perfil "production" cada thread do worker mantém a sua conexão (os
+    pragmas rodam uma vez só, na abertura). No "default" abre uma por request.
+    """
+    if sqlite_profile() != "production":
+        return sqlite_connect()
+    path = sqlite_path()
+    conn = getattr(_sqlite_local, "conn", None)
+    if conn is None or getattr(_sqlite_local, "path", None) != path:
+        if conn is not None:
+            conn.close()
+        conn = sqlite_connect(path, "production")
+        _sqlite_local.conn = conn
+        _sqlite_local.path = path
+    return conn
+
+
+def close_sqlite_connection():
+    """
+    Fecha a conexão persistente da thread atual (ex.: antes do fork dos
+    workers: conexão SQLite não pode atravessar fork).
+    """
+    conn = getattr(_sqlite_local, "conn", None)
+    _sqlite_local.conn = None
+    _sqlite_local.path = None
+    if conn is not None:
+        conn.close()
+
+
+def is_persistent_connection(db) -> bool:
+    return db is getattr(_sqlite_local, "conn", None)
 
 
 def get_db():
     if "db" not in g:
         if using_postgres():
+            psycopg = load_psycopg()
             if psycopg is None:
                 raise RuntimeError("psycopg não instalado. Adicione psycopg[binary]==3.2.6 no requirements.txt")
-            g.db = psycopg.connect(DATABASE_URL)
+            g.db = psycopg.connect(database_url())
         else:
-            g.db = sqlite3.connect(DB_PATH)
-            g.db.row_factory = sqlite3.Row
+            g.db = get_sqlite_connection()
     return g.db
 
 
-@app.teardown_appcontext
 def close_db(_exc):
+    read_db = g.pop("read_db", None)
+    if read_db is not None and read_db is not g.get("db"):
+        replica = current_app.extensions.get("read_replica")
+        if replica is not None:
+            replica.release(read_db)
     db = g.pop("db", None)
     if db is not None:
         try:
-            db.close()
+            if is_persistent_connection(db):
+                # conexão da thread continua aberta; só não deixa transação pendurada
+                if db.in_transaction:
+                    db.rollback()
+            else:
+                db.close()
         except Exception:
             pass
 
@@ -104,11 +783,26 @@ def db_commit(db):
 
 
 def db_execute(db, sql: str, params=()):
+    started = time.perf_counter()
     if using_postgres():
         cur = db.cursor()
         cur.execute(sql, params)
+    else:
+        cur = db.execute(sql, params)
+    elapsed = time.perf_counter() - started
+    observe_db_query(sql, elapsed)
+
+    timing = _request_timing()
+    if timing is None:
         return cur
-    return db.execute(sql, params)
+
+    ms = elapsed * 1000.0
+    timing["queries"] += 1
+    timing["db_ms"] += ms
+    entry = dict(sql=" ".join(sql.split())[:300], ms=ms, rows=0)
+    if len(timing["log"]) < MAX_LOGGED_QUERIES:
+        timing["log"].append(entry)
+    return TimedCursor(cur, timing, entry)
 
 
 def db_fetchone(cur):
@@ -119,6 +813,124 @@ def db_fetchall(cur):
     return cur.fetchall()
 
 
+# =========================
+# RÉPLICA DE LEITURA (DATABASE_READ_URL)
+# =========================
+# Leituras da vitrine (produtos, categorias, imagens, settings) vão para a
+# réplica; escritas e tudo que o admin logado vê ficam no primário (o admin
+# enxerga o que acabou de salvar). Réplica atrasada demais ou fora do ar:
+# a leitura volta para o primário sozinha.
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS") or "5")
+REPLICA_POOL_MAX = int(os.getenv("REPLICA_POOL_MAX") or "10")
+REPLICA_CHECK_SECONDS = 1.0  # de quanto em quanto tempo mede o atraso (por processo)
+REPLICA_RETRY_SECONDS = 10.0  # depois de uma falha, fica esse tempo só no primário
+
+# sem WAL pendente de aplicar = em dia, mesmo que o primário esteja parado há horas
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END;
+"""
+
+
+class ReadReplica:
+    """
+    Pool de conexões (autocommit) para a réplica, criado no primeiro uso de
+    cada processo (o pool não atravessa o fork dos workers).
+    """
+
+    def __init__(self, url: str, max_lag: float, max_size: int):
+        self.url = url
+        self.max_lag = max_lag
+        self.max_size = max_size
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.lag = None
+        self._lag_checked = 0.0
+        self._down_until = 0.0
+
+    def _get_pool(self):
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    ConnectionPool = load_psycopg_pool()
+                    if ConnectionPool is None:
+                        raise RuntimeError("psycopg_pool não instalado. Adicione psycopg_pool==3.3.3 no requirements.txt")
+                    self._pool = ConnectionPool(
+                        self.url,
+                        min_size=1,
+                        max_size=self.max_size,
+                        kwargs=dict(autocommit=True),
+                        timeout=1.0,  # réplica fora do ar não segura a request por muito tempo
+                        open=True,
+                    )
+                    self._pid = os.getpid()
+        return self._pool
+
+    def _check_lag(self, conn):
+        now = time.monotonic()
+        if now - self._lag_checked < REPLICA_CHECK_SECONDS:
+            return
+        row = conn.execute(REPLICA_LAG_SQL).fetchone()
+        self.lag = float(row[0] or 0) if row else 0.0
+        self._lag_checked = now
+
+    def acquire(self):
+        """
+        Retorna (conexão, motivo). Conexão None = use o primário.
+        """
+        if time.monotonic() < self._down_until:
+            return None, "down"
+        conn = None
+        try:
+            conn = self._get_pool().getconn()
+            self._check_lag(conn)
+        except Exception as e:
+            # pool fechado: não fica tentando reconectar em segundo plano
+            self.close()
+            self._down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+            current_app.logger.warning("réplica de leitura indisponível (%s); lendo do primário", e)
+            return None, "down"
+        if self.lag is not None and self.lag > self.max_lag:
+            self.release(conn)
+            return None, "lag"
+        return conn, "ok"
+
+    def release(self, conn):
+        try:
+            self._get_pool().putconn(conn)
+        except Exception:
+            pass
+
+    def close(self):
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.close()
+        self._pool = None
+
+
+def get_read_db():
+    """
+    Conexão para as leituras da vitrine: a réplica quando configurada e em
+    dia; o primário para o admin logado, fora de request ou como fallback.
+    """
+    if "read_db" not in g:
+        replica = current_app.extensions.get("read_replica")
+        db, reason = None, "no_replica"
+        if replica is not None:
+            if not has_request_context():
+                reason = "no_request"
+            elif is_admin_logged_in():
+                reason = "admin"
+            else:
+                db, reason = replica.acquire()
+        if metrics_enabled():
+            DB_READ_ROUTING.labels("replica" if db is not None else "primary", reason).inc()
+        g.read_db = db if db is not None else get_db()
+    return g.read_db
+
+
 def sqlite_column_exists(db, table: str, col: str) -> bool:
     try:
         rows = db_execute(db, f"PRAGMA table_info({table});").fetchall()
@@ -137,12 +949,14 @@ def ensure_image_columns():
     - products.image_blob (bytes do webp)
     - products.image_mime (ex: image/webp)
     - products.image_name (nome original)
+    - products.image_placeholder (data URI de ~16px mostrado enquanto a foto carrega)
     """
     db = get_db()
     if using_postgres():
         db_execute(db, "ALTER TABLE products ADD COLUMN IF NOT EXISTS image_blob BYTEA;")
         db_execute(db, "ALTER TABLE products ADD COLUMN IF NOT EXISTS image_mime TEXT;")
         db_execute(db, "ALTER TABLE products ADD COLUMN IF NOT EXISTS image_name TEXT;")
+        db_execute(db, "ALTER TABLE products ADD COLUMN IF NOT EXISTS image_placeholder TEXT;")
         db_commit(db)
         return
 
@@ -153,8 +967,122 @@ def ensure_image_columns():
         db_execute(db, "ALTER TABLE products ADD COLUMN image_mime TEXT;")
     if not sqlite_column_exists(db, "products", "image_name"):
         db_execute(db, "ALTER TABLE products ADD COLUMN image_name TEXT;")
+    if not sqlite_column_exists(db, "products", "image_placeholder"):
+        db_execute(db, "ALTER TABLE products ADD COLUMN image_placeholder TEXT;")
+    db_commit(db)
+
+
+def ensure_store_columns():
+    """
+    Multi-loja: products.store_id e promotions.store_id (o que já existia
+    fica com a loja padrão).
+    """
+    db = get_db()
+    if using_postgres():
+        for table in ("products", "promotions"):
+            db_execute(
+                db,
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS store_id INTEGER NOT NULL "
+                f"DEFAULT {DEFAULT_STORE_ID} REFERENCES stores(id);",
+            )
+        db_commit(db)
+        return
+
+    for table in ("products", "promotions"):
+        if not sqlite_column_exists(db, table, "store_id"):
+            db_execute(db, f"ALTER TABLE {table} ADD COLUMN store_id INTEGER NOT NULL DEFAULT {DEFAULT_STORE_ID};")
+    db_commit(db)
+
+
+def ensure_sync_columns():
+    """
+    products.deactivated_by_sync: 1 quando quem escondeu o produto foi o
+    `importar_produtos.py --sync` (sumiu do export do ERP). Só esses voltam
+    sozinhos quando reaparecem; o que o admin escondeu continua escondido.
+    """
+    db = get_db()
+    if using_postgres():
+        db_execute(db, "ALTER TABLE products ADD COLUMN IF NOT EXISTS deactivated_by_sync INTEGER NOT NULL DEFAULT 0;")
+        db_commit(db)
+        return
+
+    if not sqlite_column_exists(db, "products", "deactivated_by_sync"):
+        db_execute(db, "ALTER TABLE products ADD COLUMN deactivated_by_sync INTEGER NOT NULL DEFAULT 0;")
+    db_commit(db)
+
+
+# bancos (URL ou caminho do SQLite) já preparados neste processo
+_indexes_ready = set()
+_schema_ready = set()
+
+
+def db_key() -> str:
+    return database_url() or os.path.abspath(sqlite_path())
+
+
+def ensure_indexes():
+    """
+    Índices das listagens (uma vez por processo: CREATE INDEX no Postgres
+    pega lock na tabela, não dá pra rodar a cada request).
+    """
+    key = db_key()
+    if key in _indexes_ready:
+        return
+
+    db = get_db()
+    statements = [
+        # tudo por loja começa com store_id: uma filial grande não pesa nas consultas da outra
+        # lista do admin: WHERE store_id=? ORDER BY is_active DESC, name, id + LIMIT/OFFSET
+        "CREATE INDEX IF NOT EXISTS idx_products_store_admin_list ON products (store_id, is_active DESC, name, id);",
+        # filtros do admin, UPDATE ... WHERE category_id=? ao remover categoria e FK
+        "CREATE INDEX IF NOT EXISTS idx_products_category ON products (category_id);",
+        "CREATE INDEX IF NOT EXISTS idx_products_store_promo ON products (store_id, is_promo, is_active);",
+        # fetch_categories: WHERE is_active=1 ORDER BY name / ORDER BY is_active DESC, name
+        "CREATE INDEX IF NOT EXISTS idx_categories_active_name ON categories (is_active DESC, name);",
+        # cronograma de promoções: WHERE store_id=? AND is_active=1 AND ends_at > agora
+        "CREATE INDEX IF NOT EXISTS idx_promotions_store_window ON promotions (store_id, is_active, ends_at);",
+        # lista do admin e remoção de produto/categoria (FK no Postgres)
+        "CREATE INDEX IF NOT EXISTS idx_promotions_store_admin_list ON promotions (store_id, ends_at DESC, id DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_promotions_product ON promotions (product_id);",
+        "CREATE INDEX IF NOT EXISTS idx_promotions_category ON promotions (category_id);",
+        # manutenção: última execução de cada tarefa
+        "CREATE INDEX IF NOT EXISTS idx_maintenance_runs_task ON maintenance_runs (task, started_at);",
+    ]
+    # versões sem store_id na frente (v1/v2 da vitrine: sem placeholder / sem loja)
+    for old in (
+        "idx_products_admin_list",
+        "idx_products_promo",
+        "idx_promotions_window",
+        "idx_promotions_admin_list",
+        "idx_products_storefront",
+        "idx_products_storefront_v2",
+        # v3 cobria a vitrine inteira, com description/image_url no índice: texto
+        # sem limite de tamanho estoura a entrada do btree no Postgres (~2,7 KB,
+        # 500 no admin) e no SQLite era quase uma cópia da tabela
+        "idx_products_storefront_v3",
+    ):
+        statements.append(f"DROP INDEX IF EXISTS {old};")
+    # vitrine (fetch_products): filtra pelo índice e lê o resto da linha; a
+    # ordem (categoria do JOIN) sai de um sort de qualquer jeito, e no dia a
+    # dia a vitrine vem do snapshot do catálogo
+    statements.append(
+        "CREATE INDEX IF NOT EXISTS idx_products_storefront_v4 ON products (store_id, is_active, category_id, name);"
+    )
+    for sql in statements:
+        db_execute(db, sql)
     db_commit(db)
 
+    if using_postgres():
+        # busca por texto (ILIKE '%termo%'); pg_trgm pode não estar disponível
+        try:
+            db_execute(db, "CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+            db_execute(db, "CREATE INDEX IF NOT EXISTS idx_products_name_trgm ON products USING gin (name gin_trgm_ops);")
+            db_commit(db)
+        except Exception:
+            db.rollback()
+
+    _indexes_ready.add(key)
+
 
 def init_db():
     db = get_db()
@@ -170,6 +1098,31 @@ def init_db():
             """,
         )
 
+        db_execute(
+            db,
+            """
+            CREATE TABLE IF NOT EXISTS stores (
+                id SERIAL PRIMARY KEY,
+                slug TEXT NOT NULL UNIQUE,
+                name TEXT NOT NULL,
+                host TEXT UNIQUE,
+                is_active INTEGER NOT NULL DEFAULT 1
+            );
+            """,
+        )
+
+        db_execute(
+            db,
+            """
+            CREATE TABLE IF NOT EXISTS store_settings (
+                store_id INTEGER NOT NULL REFERENCES stores(id) ON DELETE CASCADE,
+                key TEXT NOT NULL,
+                value TEXT,
+                PRIMARY KEY (store_id, key)
+            );
+            """,
+        )
+
         db_execute(
             db,
             """
@@ -198,9 +1151,50 @@ def init_db():
             );
             """,
         )
+
+        db_execute(
+            db,
+            """
+            CREATE TABLE IF NOT EXISTS promotions (
+                id SERIAL PRIMARY KEY,
+                name TEXT NOT NULL,
+                product_id INTEGER REFERENCES products(id) ON DELETE CASCADE,
+                category_id INTEGER REFERENCES categories(id) ON DELETE CASCADE,
+                kind TEXT NOT NULL DEFAULT 'price',
+                value INTEGER NOT NULL,
+                starts_at BIGINT NOT NULL,
+                ends_at BIGINT NOT NULL,
+                is_active INTEGER NOT NULL DEFAULT 1
+            );
+            """,
+        )
+
+        db_execute(
+            db,
+            """
+            CREATE TABLE IF NOT EXISTS maintenance_runs (
+                id SERIAL PRIMARY KEY,
+                task TEXT NOT NULL,
+                started_at DOUBLE PRECISION NOT NULL,
+                duration_ms INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                detail TEXT
+            );
+            """,
+        )
+        # loja padrão (id 1): tudo que já existia é dela
+        db_execute(
+            db,
+            "INSERT INTO stores (id, slug, name) VALUES (%s, %s, %s) ON CONFLICT (id) DO NOTHING;",
+            (DEFAULT_STORE_ID, DEFAULT_STORE_SLUG, APP_NAME),
+        )
+        db_execute(db, "SELECT setval(pg_get_serial_sequence('stores', 'id'), GREATEST((SELECT MAX(id) FROM stores), 1));")
         db_commit(db)
 
         ensure_image_columns()
+        ensure_store_columns()
+        ensure_sync_columns()
+        ensure_indexes()
 
         # seed whatsapp
         cur = db_execute(db, "SELECT value FROM settings WHERE key=%s;", ("whatsapp_number",))
@@ -234,6 +1228,31 @@ def init_db():
         """,
     )
 
+    db_execute(
+        db,
+        """
+        CREATE TABLE IF NOT EXISTS stores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            slug TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL,
+            host TEXT UNIQUE,
+            is_active INTEGER NOT NULL DEFAULT 1
+        );
+        """,
+    )
+
+    db_execute(
+        db,
+        """
+        CREATE TABLE IF NOT EXISTS store_settings (
+            store_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            PRIMARY KEY (store_id, key)
+        );
+        """,
+    )
+
     db_execute(
         db,
         """
@@ -262,27 +1281,70 @@ def init_db():
         );
         """,
     )
-    db_commit(db)
 
-    ensure_image_columns()
-
-    row = db_execute(db, "SELECT value FROM settings WHERE key=?;", ("whatsapp_number",)).fetchone()
-    if row is None:
-        db_execute(db, "INSERT INTO settings (key, value) VALUES (?, ?);", ("whatsapp_number", STORE_WHATSAPP_NUMBER))
-        db_commit(db)
+    db_execute(
+        db,
+        """
+        CREATE TABLE IF NOT EXISTS promotions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            product_id INTEGER,
+            category_id INTEGER,
+            kind TEXT NOT NULL DEFAULT 'price',
+            value INTEGER NOT NULL,
+            starts_at INTEGER NOT NULL,
+            ends_at INTEGER NOT NULL,
+            is_active INTEGER NOT NULL DEFAULT 1
+        );
+        """,
+    )
 
-    cur = db_execute(db, "SELECT COUNT(*) as c FROM categories;")
-    c = db_fetchone(cur)["c"]
-    if int(c) == 0:
-        base_cats = [("Cervejas", 1), ("Refrigerantes", 1), ("Águas", 1), ("Outros", 1)]
+    db_execute(
+        db,
+        """
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            duration_ms INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            detail TEXT
+        );
+        """,
+    )
+    db_execute(
+        db,
+        "INSERT OR IGNORE INTO stores (id, slug, name) VALUES (?, ?, ?);",
+        (DEFAULT_STORE_ID, DEFAULT_STORE_SLUG, APP_NAME),
+    )
+    db_commit(db)
+
+    ensure_image_columns()
+    ensure_store_columns()
+    ensure_sync_columns()
+    ensure_indexes()
+
+    row = db_execute(db, "SELECT value FROM settings WHERE key=?;", ("whatsapp_number",)).fetchone()
+    if row is None:
+        db_execute(db, "INSERT INTO settings (key, value) VALUES (?, ?);", ("whatsapp_number", STORE_WHATSAPP_NUMBER))
+        db_commit(db)
+
+    cur = db_execute(db, "SELECT COUNT(*) as c FROM categories;")
+    c = db_fetchone(cur)["c"]
+    if int(c) == 0:
+        base_cats = [("Cervejas", 1), ("Refrigerantes", 1), ("Águas", 1), ("Outros", 1)]
         for name, active in base_cats:
             db_execute(db, "INSERT OR IGNORE INTO categories (name, is_active) VALUES (?, ?);", (name, active))
         db_commit(db)
 
 
-@app.before_request
+@bp.before_app_request
 def _ensure_db():
-    init_db()
+    # schema/seed uma vez por banco em cada processo (warm_up já deixa pronto)
+    key = db_key()
+    if key not in _schema_ready:
+        init_db()
+        _schema_ready.add(key)
 
 
 # =========================
@@ -297,26 +1359,382 @@ def admin_required(view_func):
     def _wrapped(*args, **kwargs):
         if not is_admin_logged_in():
             flash("Faça login para acessar o admin.", "error")
-            return redirect(url_for("login", next=request.path))
+            return redirect(url_for("main.login", next=request.script_root + request.path))
         return view_func(*args, **kwargs)
     return _wrapped
 
 
+# =========================
+# LIMITES (rate limit + load shedding)
+# =========================
+# Token bucket por IP e global para cada rota protegida, mais um teto de
+# requests simultâneas por processo (o que passar disso recebe 503 na hora,
+# em vez de prender thread e conexão de banco). A vitrine (/) não tem teto por
+# padrão: INDEX_MAX_CONCURRENT liga um, se o servidor precisar. Com RATE_LIMIT_STORAGE
+# apontando para um arquivo, os buckets ficam num SQLite compartilhado por
+# todos os workers da máquina (gunicorn.conf.py já define um). O teto de
+# concorrência é sempre por processo. O "por IP" só é por cliente com
+# PROXY_HOPS certo: atrás do proxy do Railway, sem ele, todo mundo tem o IP do
+# proxy (gunicorn.conf.py já põe 1; o app avisa no log se vir X-Forwarded-For
+# com PROXY_HOPS=0). Se o arquivo dos buckets travar, a request passa.
+BUCKET_IDLE_SECONDS = 3600  # bucket parado esse tempo já está cheio: pode sair
+
+
+def _refill(tokens, ts, rate: float, burst: float, now: float):
+    """
+    Retorna (tokens restantes, segundos de espera); espera 0 = liberado.
+    """
+    if tokens is None:
+        tokens = burst
+    else:
+        tokens = min(burst, tokens + max(0.0, now - ts) * rate)
+    if tokens >= 1.0:
+        return tokens - 1.0, 0.0
+    return tokens, (1.0 - tokens) / rate
+
+
+class MemoryBuckets:
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        with self._lock:
+            tokens, ts = self._data.get(key, (None, now))
+            tokens, wait = _refill(tokens, ts, rate, burst, now)
+            self._data[key] = (tokens, now)
+            self._calls += 1
+            if self._calls % 1000 == 0:
+                cutoff = now - BUCKET_IDLE_SECONDS
+                for k in [k for k, (_, t) in self._data.items() if t < cutoff]:
+                    del self._data[k]
+        return wait
+
+    def give_back(self, key: str, burst: float):
+        with self._lock:
+            if key in self._data:
+                tokens, ts = self._data[key]
+                self._data[key] = (min(burst, tokens + 1.0), ts)
+
+
+class SQLiteBuckets:
+    """
+    Buckets num arquivo SQLite: a leitura + atualização de cada bucket roda
+    em BEGIN IMMEDIATE, então processos diferentes não se atropelam.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._calls = itertools.count(1)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=OFF;")  # estado descartável
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, ts REAL NOT NULL);")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            row = conn.execute("SELECT tokens, ts FROM buckets WHERE key=?;", (key,)).fetchone()
+            tokens, wait = _refill(row[0] if row else None, row[1] if row else now, rate, burst, now)
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, ts) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens=excluded.tokens, ts=excluded.ts;",
+                (key, tokens, now),
+            )
+            if next(self._calls) % 1000 == 0:
+                conn.execute("DELETE FROM buckets WHERE ts < ?;", (now - BUCKET_IDLE_SECONDS,))
+            conn.execute("COMMIT;")
+        except Exception:
+            conn.execute("ROLLBACK;")
+            raise
+        return wait
+
+    def give_back(self, key: str, burst: float):
+        try:
+            self._conn().execute("UPDATE buckets SET tokens = MIN(?, tokens + 1) WHERE key=?;", (burst, key))
+        except sqlite3.OperationalError:
+            pass  # devolução é cortesia: travado, o cliente só perde uma ficha
+
+
+class RateLimiter:
+    def __init__(self, storage: str = ""):
+        self.buckets = SQLiteBuckets(storage) if storage else MemoryBuckets()
+        self.proxy_warned = False
+        self._slots = {}
+        self._slots_lock = threading.Lock()
+
+    def slots(self, name: str, size: int) -> threading.BoundedSemaphore:
+        with self._slots_lock:
+            if name not in self._slots:
+                self._slots[name] = threading.BoundedSemaphore(size)
+            return self._slots[name]
+
+
+def _shed(name: str, reason: str, status: int, retry_after: float):
+    if metrics_enabled():
+        REQUESTS_SHED.labels(name, reason).inc()
+    seconds = max(1, int(retry_after + 0.999))
+    msg = "Muitas requisições. Tente novamente em instantes." if status == 429 else "Servidor ocupado. Tente novamente em instantes."
+    if request.is_json or request.path.startswith("/api/"):
+        resp = jsonify({"error": msg})
+    else:
+        resp = Response(msg, mimetype="text/plain")
+    resp.status_code = status
+    resp.headers["Retry-After"] = str(seconds)
+    return resp
+
+
+def rate_limited(name: str, per_ip=None, total=None, max_concurrent=0):
+    """
+    per_ip / total: (requests por minuto, rajada). max_concurrent: teto por
+    processo (número, ou o nome de uma chave do config; 0 = sem teto).
+    total e max_concurrent valem por loja (uma filial lotada não derruba as outras).
+    Estourou o bucket -> 429; estourou o teto de concorrência -> 503.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped(*args, **kwargs):
+            limiter = current_app.extensions.get("rate_limiter")
+            if limiter is None:
+                return view_func(*args, **kwargs)
+
+            now = time.time()
+            checks = []
+            if per_ip:
+                if not limiter.proxy_warned and not current_app.config["PROXY_HOPS"] and "X-Forwarded-For" in request.headers:
+                    limiter.proxy_warned = True
+                    current_app.logger.warning(
+                        "X-Forwarded-For recebido com PROXY_HOPS=0: o rate limit por IP está usando o IP do proxy "
+                        "(todos os clientes no mesmo bucket). Defina PROXY_HOPS."
+                    )
+                checks.append(("ip", f"{name}:ip:{request.remote_addr or '-'}", per_ip))
+            store_id = current_store_id()
+            if total:
+                checks.append(("global", f"{name}:{store_id}:global", total))
+            taken = []
+            for reason, key, (per_minute, burst) in checks:
+                try:
+                    wait = limiter.buckets.take(key, per_minute / 60.0, burst, now)
+                except sqlite3.OperationalError as e:
+                    # arquivo dos buckets travado (lock além do timeout): melhor
+                    # deixar passar do que devolver 500, sem esperar o lock de novo
+                    # nos outros buckets
+                    if metrics_enabled():
+                        REQUESTS_SHED.labels(name, "storage").inc()
+                    current_app.logger.warning("Rate limit %s sem conferir: %s", name, e)
+                    break
+                if wait > 0:
+                    # barrado no global: a cota do cliente não conta essa request
+                    for taken_key, taken_burst in taken:
+                        limiter.buckets.give_back(taken_key, taken_burst)
+                    return _shed(name, reason, 429, wait)
+                taken.append((key, burst))
+
+            limit = current_app.config.get(max_concurrent, 0) if isinstance(max_concurrent, str) else max_concurrent
+            if not limit:
+                return view_func(*args, **kwargs)
+            slots = limiter.slots(f"{name}:{store_id}", limit)
+            if not slots.acquire(blocking=False):
+                return _shed(name, "concurrency", 503, 1)
+            try:
+                return view_func(*args, **kwargs)
+            finally:
+                slots.release()
+
+        return _wrapped
+
+    return decorator
+
+
+# =========================
+# LOJAS (multi-loja)
+# =========================
+# Várias filiais no mesmo deploy. Cada loja tem o próprio catálogo
+# (products.store_id), promoções e settings (store_settings, caindo nos
+# settings globais). A loja da request sai de:
+#   - /s/<slug>/...  (StorePathPrefix tira o prefixo e põe no SCRIPT_NAME,
+#     então url_for já gera os links da filial), ou
+#   - o Host (stores.host), ou
+#   - a loja padrão (id 1, que herdou tudo o que existia antes).
+# Categorias continuam compartilhadas entre as lojas.
+DEFAULT_STORE_ID = 1
+DEFAULT_STORE_SLUG = (os.getenv("DEFAULT_STORE_SLUG") or "matriz").strip().lower()
+# loja criada/alterada em outro servidor aparece em até:
+STORES_RELOAD_SECONDS = float(os.getenv("STORES_RELOAD_SECONDS") or "30")
+STORE_SLUG_RE = re.compile(r"^[a-z0-9][a-z0-9-]{0,39}$")
+STORE_PATH_RE = re.compile(r"^/s/([a-z0-9][a-z0-9-]{0,39})(?=/|$)")
+
+
+class StorePathPrefix:
+    """
+    Middleware WSGI: /s/<slug>/resto -> PATH_INFO=/resto, SCRIPT_NAME=.../s/<slug>.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        m = STORE_PATH_RE.match(environ.get("PATH_INFO") or "")
+        if m:
+            prefix = m.group(0)
+            environ["nc.store_slug"] = m.group(1)
+            environ["SCRIPT_NAME"] = (environ.get("SCRIPT_NAME") or "") + prefix
+            environ["PATH_INFO"] = environ["PATH_INFO"][len(prefix):] or "/"
+        return self.wsgi_app(environ, start_response)
+
+
+class StoreDirectory:
+    """
+    Lojas do banco por id, slug e host (só as ativas respondem por slug/host;
+    a padrão responde sempre).
+    """
+
+    def __init__(self, rows, now: float):
+        self.loaded_at = now
+        self.by_id, self.by_slug, self.by_host = {}, {}, {}
+        for sid, slug, name, host, is_active in (tuple(r) for r in rows):
+            store = dict(id=int(sid), slug=slug, name=name, host=(host or "").lower() or None, is_active=bool(is_active))
+            self.by_id[store["id"]] = store
+            if store["is_active"] or store["id"] == DEFAULT_STORE_ID:
+                self.by_slug[slug] = store
+                if store["host"]:
+                    self.by_host[store["host"]] = store
+
+    def default(self) -> dict:
+        store = self.by_id.get(DEFAULT_STORE_ID)
+        if store is None:
+            store = dict(id=DEFAULT_STORE_ID, slug=DEFAULT_STORE_SLUG, name=APP_NAME, host=None, is_active=True)
+        return store
+
+    def resolve(self, host: str, slug=None):
+        if slug is not None:
+            return self.by_slug.get(slug)
+        return self.by_host.get((host or "").split(":")[0].lower()) or self.default()
+
+
+def store_directory() -> StoreDirectory:
+    now = time.time()
+    directories = current_app.extensions.setdefault("store_directories", {})
+    key = db_key()
+    directory = directories.get(key)
+    if directory is None or now - directory.loaded_at > STORES_RELOAD_SECONDS:
+        rows = db_fetchall(db_execute(get_read_db(), "SELECT id, slug, name, host, is_active FROM stores ORDER BY id;"))
+        directory = StoreDirectory(rows, now)
+        directories[key] = directory
+    return directory
+
+
+def stores_changed():
+    current_app.extensions.get("store_directories", {}).pop(db_key(), None)
+
+
+@bp.before_app_request
+def _resolve_store():
+    store = store_directory().resolve(request.host, request.environ.get("nc.store_slug"))
+    if store is None:
+        abort(404)
+    g.store = store
+
+
+def current_store() -> dict:
+    """
+    Loja da request (ou a escolhida com use_store); fora disso, a padrão.
+    """
+    store = g.get("store") if has_app_context() else None
+    return store if store is not None else store_directory().default()
+
+
+def current_store_id() -> int:
+    return current_store()["id"]
+
+
+def use_store(slug: str) -> dict:
+    """
+    Scripts (importador, manutenção): passa a trabalhar na loja `slug`
+    dentro do app_context atual. Levanta ValueError se não existir.
+    """
+    store = store_directory().by_slug.get((slug or "").strip().lower())
+    if store is None:
+        raise ValueError(f"loja não encontrada: {slug!r}")
+    g.store = store
+    return store
+
+
+class PerStore:
+    """
+    Uma instância de cache por loja, criada no primeiro uso: o tráfego e as
+    invalidações de uma filial não tiram do cache o que é das outras.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._parts = {}
+        self._lock = threading.Lock()
+
+    def get(self, store_id=None):
+        store_id = current_store_id() if store_id is None else store_id
+        part = self._parts.get(store_id)
+        if part is None:
+            with self._lock:
+                part = self._parts.setdefault(store_id, self._factory())
+        return part
+
+    def items(self):
+        return list(self._parts.items())
+
+
+@bp.app_context_processor
+def _store_context():
+    store = current_store()
+    # carrinho (localStorage) é por origem: filiais no mesmo host não podem dividir
+    cart_key = "nc_cart_v1" if store["id"] == DEFAULT_STORE_ID else f"nc_cart_v1:{store['slug']}"
+    return dict(store=store, cart_key=cart_key)
+
+
 # =========================
 # SETTINGS
 # =========================
 def get_setting(key: str, default: str = "") -> str:
-    db = get_db()
-    if using_postgres():
-        cur = db_execute(db, "SELECT value FROM settings WHERE key=%s;", (key,))
-        row = db_fetchone(cur)
-        if not row or row[0] is None:
-            return default
-        return str(row[0])
-    row = db_execute(db, "SELECT value FROM settings WHERE key=?;", (key,)).fetchone()
-    if not row or row["value"] is None:
+    """
+    Setting da loja atual; sem valor próprio, o global (tabela settings).
+    """
+    ph = "%s" if using_postgres() else "?"
+    cur = db_execute(
+        get_read_db(),
+        f"""
+        SELECT COALESCE(
+            (SELECT value FROM store_settings WHERE store_id = {ph} AND key = {ph}),
+            (SELECT value FROM settings WHERE key = {ph})
+        );
+        """,
+        (current_store_id(), key, key),
+    )
+    row = db_fetchone(cur)
+    if not row or row[0] is None:
         return default
-    return str(row["value"])
+    return str(row[0])
+
+
+def store_settings(db) -> dict:
+    """
+    Todos os settings valendo na loja atual (globais + os da loja por cima).
+    """
+    ph = "%s" if using_postgres() else "?"
+    settings = {r[0]: r[1] for r in db_fetchall(db_execute(db, "SELECT key, value FROM settings;"))}
+    cur = db_execute(db, f"SELECT key, value FROM store_settings WHERE store_id = {ph};", (current_store_id(),))
+    settings.update({r[0]: r[1] for r in db_fetchall(cur)})
+    return settings
 
 
 def set_setting(key: str, value: str) -> None:
@@ -325,19 +1743,19 @@ def set_setting(key: str, value: str) -> None:
         db_execute(
             db,
             """
-            INSERT INTO settings (key, value) VALUES (%s, %s)
-            ON CONFLICT (key) DO UPDATE SET value=EXCLUDED.value;
+            INSERT INTO store_settings (store_id, key, value) VALUES (%s, %s, %s)
+            ON CONFLICT (store_id, key) DO UPDATE SET value=EXCLUDED.value;
             """,
-            (key, value),
+            (current_store_id(), key, value),
         )
     else:
         db_execute(
             db,
             """
-            INSERT INTO settings (key, value) VALUES (?, ?)
-            ON CONFLICT(key) DO UPDATE SET value=excluded.value;
+            INSERT INTO store_settings (store_id, key, value) VALUES (?, ?, ?)
+            ON CONFLICT(store_id, key) DO UPDATE SET value=excluded.value;
             """,
-            (key, value),
+            (current_store_id(), key, value),
         )
     db_commit(db)
 
@@ -371,7 +1789,7 @@ def parse_price_to_cents(raw: str) -> int:
 
 
 def fetch_categories(active_only=True):
-    db = get_db()
+    db = get_read_db()
     if using_postgres():
         if active_only:
             cur = db_execute(db, "SELECT id, name, is_active FROM categories WHERE is_active=1 ORDER BY name;")
@@ -387,101 +1805,299 @@ def fetch_categories(active_only=True):
     return [dict(id=r["id"], name=r["name"], is_active=bool(r["is_active"])) for r in rows]
 
 
-def fetch_products(active_only=True):
-    db = get_db()
-
-    if using_postgres():
-        where = "WHERE p.is_active = 1" if active_only else ""
-        order = (
-            "ORDER BY p.is_active DESC, COALESCE(c.name, p.category, 'Outros'), p.name;"
-            if not active_only
-            else "ORDER BY COALESCE(c.name, p.category, 'Outros'), p.name;"
-        )
-        cur = db_execute(
-            db,
-            f"""
-            SELECT p.id, p.name, p.description, p.price_cents, p.promo_price_cents, p.is_promo,
-                   p.image_url, p.category, p.category_id, p.is_active,
-                   c.name AS category_name,
-                   p.image_blob
-            FROM products p
-            LEFT JOIN categories c ON c.id = p.category_id
-            {where}
-            {order}
-            """,
-        )
-
-        rows = db_fetchall(cur)
-        out = []
-        for r in rows:
-            pid, name, desc, price_cents, promo_price_cents, is_promo, image_url, category, category_id, is_active, category_name, image_blob = r
-            cat = category_name or category or "Outros"
-            base_cents = int(price_cents or 0)
-            promo_cents = int(promo_price_cents or 0) if promo_price_cents is not None else 0
-            is_promo_ok = bool(is_promo) and promo_cents > 0
-            effective_cents = promo_cents if is_promo_ok else base_cents
-
-            final_image_url = image_url or ""
-            if image_blob is not None:
-                final_image_url = f"/img/{pid}.webp"
-
-            out.append(
-                dict(
-                    id=pid,
-                    name=name,
-                    description=desc or "",
-                    price_cents=base_cents,
-                    price=money_br(base_cents),
-                    promo_price_cents=(promo_cents if promo_cents > 0 else None),
-                    promo_price=(money_br(promo_cents) if promo_cents > 0 else ""),
-                    is_promo=is_promo_ok,
-                    effective_price_cents=effective_cents,
-                    effective_price=money_br(effective_cents),
-                    image_url=final_image_url,
-                    category=cat,
-                    category_id=category_id,
-                    is_active=bool(is_active),
-                )
-            )
-        return out
-
-    where = "WHERE p.is_active = 1" if active_only else ""
+def products_query(active_only=True, ph: str = "?") -> str:
+    """
+    SQL da vitrine/listagem (igual nos dois bancos; um parâmetro: store_id).
+    """
+    where = f"WHERE p.store_id = {ph}" + (" AND p.is_active = 1" if active_only else "")
     order = (
         "ORDER BY p.is_active DESC, COALESCE(c.name, p.category, 'Outros'), p.name;"
         if not active_only
         else "ORDER BY COALESCE(c.name, p.category, 'Outros'), p.name;"
     )
-    rows = db_execute(
-        db,
-        f"""
-        SELECT p.*, c.name AS category_name
+    return f"""
+        SELECT p.id, p.name, p.description, p.price_cents, p.promo_price_cents, p.is_promo,
+               p.image_url, p.category, p.category_id, p.is_active,
+               c.name AS category_name, p.image_placeholder
         FROM products p
         LEFT JOIN categories c ON c.id = p.category_id
         {where}
         {order}
         """
-    ).fetchall()
 
-    out = []
-    for r in rows:
-        cat = r["category_name"] or r["category"] or "Outros"
-        base_cents = int(r["price_cents"] or 0)
-        promo_cents = int(r["promo_price_cents"] or 0) if r["promo_price_cents"] is not None else 0
-        is_promo_ok = bool(r["is_promo"]) and promo_cents > 0
-        effective_cents = promo_cents if is_promo_ok else base_cents
 
-        final_image_url = r["image_url"] or ""
-        try:
-            if r["image_blob"] is not None:
-                final_image_url = f"/img/{r['id']}.webp"
-        except Exception:
-            pass
+def product_from_row(r) -> dict:
+    """
+    Linha de products_query() -> dict usado nos templates (tupla do Postgres,
+    sqlite3.Row ou linha do driver assíncrono do asgi.py).
+    """
+    (
+        pid, name, desc, price_cents, promo_price_cents, is_promo, image_url,
+        category, category_id, is_active, category_name, image_placeholder,
+    ) = tuple(r)
+    cat = category_name or category or "Outros"
+    base_cents = int(price_cents or 0)
+    promo_cents = int(promo_price_cents or 0) if promo_price_cents is not None else 0
+    is_promo_ok = bool(is_promo) and promo_cents > 0
+    effective_cents = promo_cents if is_promo_ok else base_cents
+
+    # save_image_to_db grava image_url=/img/<id>.webp junto com o blob,
+    # então não precisa ler image_blob aqui
+    final_image_url = image_url or ""
+
+    return dict(
+        id=pid,
+        name=name,
+        description=desc or "",
+        price_cents=base_cents,
+        price=money_br(base_cents),
+        promo_price_cents=(promo_cents if promo_cents > 0 else None),
+        promo_price=(money_br(promo_cents) if promo_cents > 0 else ""),
+        is_promo=is_promo_ok,
+        effective_price_cents=effective_cents,
+        effective_price=money_br(effective_cents),
+        image_url=final_image_url,
+        image_placeholder=(image_placeholder or "") if final_image_url else "",
+        category=cat,
+        category_id=category_id,
+        is_active=bool(is_active),
+        # preenchidos por apply_promotions quando há promoção agendada valendo
+        promo_name="",
+        promo_until="",
+    )
+
+
+def fetch_products(active_only=True):
+    db = get_read_db()
+    ph = "%s" if using_postgres() else "?"
+    rows = db_fetchall(db_execute(db, products_query(active_only, ph), (current_store_id(),)))
+    return apply_promotions([product_from_row(r) for r in rows], promotion_schedule())
+
+
+# =========================
+# PROMOÇÕES AGENDADAS
+# =========================
+# Regras com início/fim (epoch em segundos) para um produto ou uma categoria
+# inteira: preço fixo ("price", em centavos) ou desconto ("percent"). O
+# cronograma carregado guarda só as regras valendo agora, já separadas por
+# produto/categoria, e a próxima fronteira (o início ou fim mais próximo):
+# até ela nenhum preço muda, então nada é reavaliado por request. Passou da
+# fronteira, o cronograma é recarregado (e o snapshot do catálogo, publicado
+# de novo). A promoção manual (is_promo) continua valendo; ganha a mais barata.
+# Cada loja tem as suas promoções e o seu cronograma.
+STORE_TIMEZONE = os.getenv("STORE_TIMEZONE") or "America/Sao_Paulo"
+# escrita fora do admin (importador, outro servidor) aparece em até:
+PROMO_RELOAD_SECONDS = float(os.getenv("PROMO_RELOAD_SECONDS") or "60")
+PROMO_KINDS = ("price", "percent")
+
+
+def store_timezone():
+    """
+    Fuso das datas do admin (datetime-local vem sem fuso). Sem a base de
+    fusos do sistema (tzdata), usa UTC-3.
+    """
+    try:
+        from zoneinfo import ZoneInfo
+
+        return ZoneInfo(STORE_TIMEZONE)
+    except Exception:
+        return timezone(timedelta(hours=-3))
+
+
+def promotions_query(ph: str) -> str:
+    """
+    Regras ativas da loja que ainda não terminaram (valendo ou futuras).
+    Parâmetros: store_id, agora.
+    """
+    return f"""
+        SELECT id, name, product_id, category_id, kind, value, starts_at, ends_at
+        FROM promotions
+        WHERE store_id = {ph} AND is_active = 1 AND ends_at > {ph}
+        ORDER BY starts_at, id;
+        """
+
+
+def promo_price_cents(kind: str, value: int, base_cents: int) -> int:
+    if kind == "percent":
+        return base_cents - (base_cents * value + 50) // 100
+    return value
+
+
+class PromotionSchedule:
+    """
+    Regras valendo em `now` (por produto e por categoria) e `valid_until`:
+    a próxima fronteira, ou None se não há nada agendado.
+    """
+
+    def __init__(self, rows, now: float):
+        self.loaded_at = now
+        self.by_product = {}
+        self.by_category = {}
+        boundaries = []
+        for r in rows:
+            _, name, product_id, category_id, kind, value, starts_at, ends_at = tuple(r)
+            starts_at, ends_at = int(starts_at), int(ends_at)
+            if ends_at <= now:
+                continue
+            if starts_at > now:
+                boundaries.append(starts_at)
+                continue
+            boundaries.append(ends_at)
+            rule = (kind, int(value), name or "", ends_at)
+            if product_id is not None:
+                self.by_product.setdefault(int(product_id), []).append(rule)
+            elif category_id is not None:
+                self.by_category.setdefault(int(category_id), []).append(rule)
+        self.valid_until = min(boundaries) if boundaries else None
+
+    def __bool__(self):
+        return bool(self.by_product or self.by_category)
+
+    def expired(self, now: float) -> bool:
+        return self.valid_until is not None and now >= self.valid_until
+
+    def best(self, product_id, category_id, base_cents: int):
+        """
+        (centavos, regra) da regra mais barata para o produto, ou None.
+        """
+        best = None
+        for rule in self.by_product.get(product_id, []) + self.by_category.get(category_id, []):
+            cents = promo_price_cents(rule[0], rule[1], base_cents)
+            if best is None or cents < best[0]:
+                best = (cents, rule)
+        return best
+
+
+def load_promotion_schedule(db, now: float) -> PromotionSchedule:
+    ph = "%s" if using_postgres() else "?"
+    rows = db_fetchall(db_execute(db, promotions_query(ph), (current_store_id(), int(now))))
+    return PromotionSchedule(rows, now)
+
+
+def promotion_schedule() -> PromotionSchedule:
+    """
+    Cronograma da loja atual, guardado por processo até a próxima fronteira
+    (ou PROMO_RELOAD_SECONDS; o admin invalida na hora).
+    """
+    now = time.time()
+    schedules = current_app.extensions.setdefault("promotion_schedules", {})
+    key = (db_key(), current_store_id())
+    schedule = schedules.get(key)
+    if schedule is None or schedule.expired(now) or now - schedule.loaded_at > PROMO_RELOAD_SECONDS:
+        schedule = load_promotion_schedule(get_read_db(), now)
+        schedules[key] = schedule
+    return schedule
+
+
+def promotions_changed():
+    current_app.extensions.get("promotion_schedules", {}).pop((db_key(), current_store_id()), None)
+    catalog_changed()
+
+
+def apply_promotions(products: list, schedule: PromotionSchedule) -> list:
+    """
+    Aplica as promoções valendo (in place) nos dicts de product_from_row.
+    """
+    if not schedule:
+        return products
+    tz = store_timezone()
+    until = {}
+    for p in products:
+        found = schedule.best(p["id"], p["category_id"], p["price_cents"])
+        if found is None:
+            continue
+        cents, (_, _, name, ends_at) = found
+        if not 0 < cents < p["effective_price_cents"]:
+            continue  # a promoção manual já é mais barata (ou a regra não baixa o preço)
+        if ends_at not in until:
+            until[ends_at] = datetime.fromtimestamp(ends_at, tz).strftime("%d/%m %H:%M")
+        p.update(
+            promo_price_cents=cents,
+            promo_price=money_br(cents),
+            is_promo=True,
+            effective_price_cents=cents,
+            effective_price=money_br(cents),
+            promo_name=name,
+            promo_until=until[ends_at],
+        )
+    return products
+
+
+ADMIN_PER_PAGE = 50
 
+
+def admin_product_filters(q: str = "", category_id=None, status: str = "", promo: str = ""):
+    """
+    WHERE (e parâmetros) dos filtros do admin sobre `products p` da loja atual.
+    """
+    pg = using_postgres()
+    ph = "%s" if pg else "?"
+
+    conds = [f"p.store_id = {ph}"]
+    params = [current_store_id()]
+    q = (q or "").strip()
+    if q:
+        like_op = "ILIKE" if pg else "LIKE"
+        search = [f"p.name {like_op} {ph}", f"p.description {like_op} {ph}"]
+        params += [f"%{q}%", f"%{q}%"]
+        if q.isdigit():
+            search.append(f"p.id = {ph}")
+            params.append(int(q))
+        conds.append("(" + " OR ".join(search) + ")")
+    if category_id == "none":
+        conds.append("p.category_id IS NULL")
+    elif category_id is not None:
+        conds.append(f"p.category_id = {ph}")
+        params.append(int(category_id))
+    if status in ("1", "0"):
+        conds.append(f"p.is_active = {ph}")
+        params.append(int(status))
+    if promo in ("1", "0"):
+        conds.append(f"p.is_promo = {ph}")
+        params.append(int(promo))
+    return "WHERE " + " AND ".join(conds), params
+
+
+def fetch_products_page(q: str = "", category_id=None, status: str = "", promo: str = "", page: int = 1, per_page: int = ADMIN_PER_PAGE):
+    """
+    Página da lista do admin (filtros + LIMIT/OFFSET). Não lê image_blob.
+    Retorna (produtos, total).
+    """
+    db = get_db()
+    ph = "%s" if using_postgres() else "?"
+    where, params = admin_product_filters(q, category_id, status, promo)
+
+    cur = db_execute(db, f"SELECT COUNT(*) FROM products p {where};", tuple(params))
+    total = int(db_fetchone(cur)[0])
+
+    page = max(1, int(page or 1))
+    offset = (page - 1) * per_page
+    cur = db_execute(
+        db,
+        f"""
+        SELECT p.id, p.name, p.description, p.price_cents, p.promo_price_cents, p.is_promo,
+               p.category, p.category_id, p.is_active, c.name AS category_name
+        FROM products p
+        LEFT JOIN categories c ON c.id = p.category_id
+        {where}
+        ORDER BY p.is_active DESC, p.name, p.id
+        LIMIT {ph} OFFSET {ph};
+        """,
+        tuple(params) + (per_page, offset),
+    )
+
+    out = []
+    for r in db_fetchall(cur):
+        pid, name, desc, price_cents, promo_price_cents, is_promo, category, cat_id, is_active, category_name = tuple(r)
+        base_cents = int(price_cents or 0)
+        promo_cents = int(promo_price_cents or 0) if promo_price_cents is not None else 0
+        is_promo_ok = bool(is_promo) and promo_cents > 0
+        effective_cents = promo_cents if is_promo_ok else base_cents
         out.append(
             dict(
-                id=r["id"],
-                name=r["name"],
-                description=r["description"] or "",
+                id=pid,
+                name=name,
+                description=desc or "",
                 price_cents=base_cents,
                 price=money_br(base_cents),
                 promo_price_cents=(promo_cents if promo_cents > 0 else None),
@@ -489,19 +2105,51 @@ def fetch_products(active_only=True):
                 is_promo=is_promo_ok,
                 effective_price_cents=effective_cents,
                 effective_price=money_br(effective_cents),
-                image_url=final_image_url,
-                category=cat,
-                category_id=r["category_id"],
-                is_active=bool(r["is_active"]),
+                category=category_name or category or "Outros",
+                category_id=cat_id,
+                is_active=bool(is_active),
             )
         )
-    return out
+    return out, total
+
+
+PRODUCT_SEARCH_LIMIT = 20
 
 
-def process_image_to_webp_bytes(file_storage) -> Tuple[bytes, str, str]:
+def search_products(q: str, limit: int = PRODUCT_SEARCH_LIMIT) -> list:
     """
-    Retorna: (webp_bytes, mime, original_name)
+    Busca do seletor de produto (promoções): mesmos critérios da busca do
+    admin (nome, descrição ou código), só as primeiras `limit`, sem COUNT.
     """
+    q = (q or "").strip()
+    if not q:
+        return []
+    ph = "%s" if using_postgres() else "?"
+    where, params = admin_product_filters(q)
+    cur = db_execute(
+        get_db(),
+        f"SELECT p.id, p.name, p.price_cents, p.is_active FROM products p {where} "
+        f"ORDER BY p.is_active DESC, p.name, p.id LIMIT {ph};",
+        tuple(params) + (limit,),
+    )
+    return [
+        dict(id=int(r[0]), name=r[1], price=money_br(int(r[2] or 0)), is_active=bool(r[3]))
+        for r in db_fetchall(cur)
+    ]
+
+
+def process_image_to_webp_bytes(file_storage) -> Tuple[bytes, str, str, str]:
+    """
+    Retorna: (webp_bytes, mime, original_name, placeholder)
+    """
+    if metrics_enabled():
+        with IMAGE_PROCESSING.time():
+            return _process_image_to_webp_bytes(file_storage)
+    return _process_image_to_webp_bytes(file_storage)
+
+
+def _process_image_to_webp_bytes(file_storage) -> Tuple[bytes, str, str, str]:
+    Image, ImageOps = load_pillow()
     if not Image:
         raise RuntimeError("Pillow não está instalado. Rode: pip install pillow")
 
@@ -530,140 +2178,1443 @@ def process_image_to_webp_bytes(file_storage) -> Tuple[bytes, str, str]:
 
     out = BytesIO()
     img.save(out, "WEBP", quality=82, method=6)
-    return out.getvalue(), "image/webp", (file_storage.filename or "imagem")
+    return out.getvalue(), "image/webp", (file_storage.filename or "imagem"), image_placeholder(img)
+
+
+# placeholder (LQIP): a foto reduzida a 16x16 vai inline no card (~150 bytes
+# em base64) e o navegador estica com suavização -> borrão com as cores certas
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 40
+
+
+def image_placeholder(img) -> str:
+    """
+    Imagem Pillow (já recortada/tratada) -> data URI WEBP minúsculo.
+    """
+    Image, _ = load_pillow()
+    tiny = img.convert("RGB").resize((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.BOX)
+    out = BytesIO()
+    tiny.save(out, "WEBP", quality=PLACEHOLDER_QUALITY, method=6)
+    return "data:image/webp;base64," + base64.b64encode(out.getvalue()).decode("ascii")
+
 
+def product_image_url(product_id: int, webp_bytes: bytes) -> str:
+    # ?v= muda junto com a imagem: navegador e service worker guardam sem revalidar
+    return f"/img/{product_id}.webp?v={hashlib.sha1(webp_bytes).hexdigest()[:10]}"
 
-def save_image_to_db(product_id: int, webp_bytes: bytes, mime: str, original_name: str):
+
+def save_image_to_db(product_id: int, webp_bytes: bytes, mime: str, original_name: str, placeholder: str = ""):
     db = get_db()
+    image_url = product_image_url(product_id, webp_bytes)
     if using_postgres():
         db_execute(
             db,
             """
             UPDATE products
-            SET image_blob=%s, image_mime=%s, image_name=%s, image_url=%s
+            SET image_blob=%s, image_mime=%s, image_name=%s, image_url=%s, image_placeholder=%s
             WHERE id=%s;
             """,
-            (webp_bytes, mime, original_name, f"/img/{product_id}.webp", product_id),
+            (webp_bytes, mime, original_name, image_url, placeholder or None, product_id),
         )
     else:
         db_execute(
             db,
             """
             UPDATE products
-            SET image_blob=?, image_mime=?, image_name=?, image_url=?
+            SET image_blob=?, image_mime=?, image_name=?, image_url=?, image_placeholder=?
             WHERE id=?;
             """,
-            (webp_bytes, mime, original_name, f"/img/{product_id}.webp", product_id),
+            (webp_bytes, mime, original_name, image_url, placeholder or None, product_id),
+        )
+    db_commit(db)
+
+
+# =========================
+# ASSETS ESTÁTICOS (gerados por gerar_assets.py)
+# =========================
+# gerar_assets.py grava em static/dist arquivos com hash no nome (+ .gz/.br) e
+# um manifest.json "nome lógico -> arquivo". Sem o manifest (ou sem uma
+# entrada), asset_url cai no que está aqui: CDN ou o arquivo original em static/.
+ASSETS_DIR = os.path.join(BASE_DIR, "static", "dist")
+ASSET_FALLBACKS = {
+    "vendor/bootstrap.min.css": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css",
+    "vendor/bootstrap.bundle.min.js": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js",
+    "vendor/bootstrap-icons.css": "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.min.css",
+    "vendor/poppins.css": "https://fonts.googleapis.com/css2?family=Poppins:wght@600;700;800&display=swap",
+    "brand/logo-96.webp": "brand/logo.png",
+    "brand/logo-192.webp": "brand/logo.png",
+    "brand/logo-512.webp": "brand/logo.png",
+}
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+mimetypes.add_type("font/woff2", ".woff2")
+mimetypes.add_type("image/webp", ".webp")
+
+
+def asset_manifest() -> dict:
+    manifest = current_app.extensions.get("asset_manifest")
+    if manifest is None:
+        try:
+            with open(os.path.join(ASSETS_DIR, "manifest.json"), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        current_app.extensions["asset_manifest"] = manifest
+    return manifest
+
+
+@bp.app_template_global()
+def asset_url(name: str) -> str:
+    built = asset_manifest().get(name)
+    if built:
+        return url_for("main.asset", filename=built)
+    fallback = ASSET_FALLBACKS.get(name, name)
+    if fallback.startswith("https://"):
+        return fallback
+    return url_for("static", filename=fallback)
+
+
+@bp.get("/assets/<path:filename>")
+def asset(filename: str):
+    # nome tem hash do conteúdo: o navegador nunca precisa revalidar
+    mime = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    resp = None
+    for encoding, ext in (("br", ".br"), ("gzip", ".gz")):
+        path = safe_join(ASSETS_DIR, filename + ext)
+        if request.accept_encodings[encoding] and path and os.path.isfile(path):
+            resp = send_from_directory(ASSETS_DIR, filename + ext, mimetype=mime)
+            resp.headers["Content-Encoding"] = encoding
+            break
+    if resp is None:
+        resp = send_from_directory(ASSETS_DIR, filename, mimetype=mime)
+    resp.headers["Cache-Control"] = ASSET_CACHE_CONTROL
+    resp.headers["Vary"] = "Accept-Encoding"
+    return resp
+
+
+# =========================
+# SERVIR IMAGEM DO BANCO
+# =========================
+@bp.get("/img/<int:pid>.webp")
+def product_image(pid: int):
+    db = get_read_db()
+    if using_postgres():
+        cur = db_execute(db, "SELECT image_blob, image_mime FROM products WHERE id=%s;", (pid,))
+        row = db_fetchone(cur)
+        if not row:
+            abort(404)
+        blob, mime = row[0], row[1]
+    else:
+        row = db_execute(db, "SELECT image_blob, image_mime FROM products WHERE id=?;", (pid,)).fetchone()
+        if not row:
+            abort(404)
+        blob, mime = row["image_blob"], row["image_mime"]
+
+    if blob is None:
+        abort(404)
+
+    # com ?v= (versão da imagem) a URL nunca muda de conteúdo
+    cache_control = ASSET_CACHE_CONTROL if request.args.get("v") else "public, max-age=86400"
+    return Response(blob, mimetype=(mime or "image/webp"), headers={"Cache-Control": cache_control})
+
+
+# =========================
+# CACHE DE FRAGMENTOS (card / linha de produto)
+# =========================
+# A "revisão" de um produto é a tupla dos campos que fetch_products devolve:
+# qualquer escrita (admin, edição em massa, importador) muda a chave sem
+# precisar avisar o cache, e só os cards que mudaram são renderizados de novo.
+FRAGMENT_CACHE_MAX = int(os.getenv("FRAGMENT_CACHE_MAX") or "20000")
+
+
+class FragmentCache:
+    """
+    HTML já renderizado por (template, id, revisão, prefixo da URL). Cheio,
+    é esvaziado inteiro (revisões velhas saem junto); um cache por loja, por
+    processo. O prefixo (script_root) entra na chave porque os fragmentos
+    têm url_for: a mesma loja pelo Host e por /s/<slug>/ gera links diferentes.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data = {}
+
+    def __len__(self):
+        return len(self._data)
+
+    def render(self, template_name: str, p: dict) -> Markup:
+        script_root = request.script_root if has_request_context() else ""
+        key = (template_name, p["id"], script_root, tuple(p.values()))
+        html = self._data.get(key)
+        if html is not None:
+            self.hits += 1
+            return html
+        self.misses += 1
+        html = Markup(current_app.jinja_env.get_template(template_name).render(p=p))
+        if len(self._data) >= self.max_entries:
+            self._data.clear()
+        self._data[key] = html
+        return html
+
+
+@bp.app_template_global()
+def product_fragment(template_name: str, p: dict) -> Markup:
+    cache = current_app.extensions.get("fragment_cache")
+    if cache is None:
+        return Markup(current_app.jinja_env.get_template(template_name).render(p=p))
+    return cache.get().render(template_name, p)
+
+
+# =========================
+# SNAPSHOT DO CATÁLOGO (arquivo compartilhado entre workers)
+# =========================
+# Cada escrita do admin publica (numa thread, depois da resposta) um arquivo
+# imutável e versionado com o catálogo ativo e os settings da loja (um arquivo por loja: a publicação
+# de uma filial não invalida as outras); todos os workers leem o mesmo arquivo via
+# mmap (uma cópia só, no page cache do SO) e a vitrine/checkout não fazem
+# query. Publicação: arquivo temporário + os.replace (atômico); quem já
+# estava lendo a versão anterior continua com ela até terminar.
+#
+# Layout (little-endian):
+#   cabeçalho  SNAPSHOT_HEADER: magic, versão, gerado_em, nº produtos,
+#              bytes do meta, bytes dos registros
+#   meta       JSON {"settings": {key: value}, "fields": [campos do produto],
+#              "revision": hash do conteúdo (igual em todo servidor),
+#              "valid_until": próxima fronteira de promoção ou null}
+#   índice     nº produtos x SNAPSHOT_INDEX_ENTRY (id, offset, tamanho),
+#              ordenado por id -> busca binária para o checkout
+#   registros  array JSON com os valores de cada produto (dict de
+#              product_from_row, na ordem de "fields"), na ordem da vitrine;
+#              cada registro é um trecho JSON válido sozinho
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR") or os.path.join(tempfile.gettempdir(), "nc_catalog")
+# escrita fora do admin (outro servidor, SQL direto) aparece em até (uma
+# thread confere o banco e só grava se mudou; o mtime do arquivo marca a
+# última conferência para todos os workers):
+SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("SNAPSHOT_MAX_AGE_SECONDS") or "60")
+SNAPSHOT_MAGIC = b"NCCAT\x00\x00\x01"
+SNAPSHOT_HEADER = struct.Struct("<8sQdIII")
+SNAPSHOT_INDEX_ENTRY = struct.Struct("<qII")
+
+
+class CatalogView:
+    """
+    Uma versão publicada do snapshot, aberta via mmap (somente leitura).
+    """
+
+    def __init__(self, path: str, key):
+        self.key = key
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self.built_at, self.count, meta_len, records_len = SNAPSHOT_HEADER.unpack_from(self._mm, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"snapshot do catálogo inválido: {path}")
+        start = SNAPSHOT_HEADER.size
+        meta = json.loads(self._mm[start : start + meta_len])
+        self.settings = meta["settings"]
+        self.fields = meta["fields"]
+        self.revision = meta["revision"]
+        self.valid_until = meta.get("valid_until")
+        self._index_start = start + meta_len
+        self._records_start = self._index_start + self.count * SNAPSHOT_INDEX_ENTRY.size
+        self._records_end = self._records_start + records_len
+
+    def products(self) -> list:
+        fields = self.fields
+        return [dict(zip(fields, values)) for values in json.loads(self._mm[self._records_start : self._records_end])]
+
+    def product(self, pid: int):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_id, offset, length = SNAPSHOT_INDEX_ENTRY.unpack_from(self._mm, self._index_start + mid * SNAPSHOT_INDEX_ENTRY.size)
+            if mid_id == pid:
+                start = self._records_start + offset
+                return dict(zip(self.fields, json.loads(self._mm[start : start + length])))
+            if mid_id < pid:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def setting(self, key: str, default: str = "") -> str:
+        value = self.settings.get(key)
+        return default if value is None else str(value)
+
+
+def encode_catalog_snapshot(version: int, settings: dict, products: list, valid_until=None) -> bytes:
+    fields = list(products[0]) if products else []
+    records, index, offset = [], [], 1  # 1 = depois do "["
+    for p in products:
+        rec = json.dumps([p[f] for f in fields], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        index.append((int(p["id"]), offset, len(rec)))
+        records.append(rec)
+        offset += len(rec) + 1  # + a vírgula
+    index.sort()
+    records_bytes = b"[" + b",".join(records) + b"]"
+    settings_bytes = json.dumps(settings, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    revision = hashlib.sha256(settings_bytes + b"\x00" + records_bytes).hexdigest()[:16]
+    meta = dict(settings=settings, fields=fields, revision=revision, valid_until=valid_until)
+    meta_bytes = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return b"".join(
+        [
+            SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, version, time.time(), len(products), len(meta_bytes), len(records_bytes)),
+            meta_bytes,
+            b"".join(SNAPSHOT_INDEX_ENTRY.pack(*e) for e in index),
+            records_bytes,
+        ]
+    )
+
+
+def load_catalog_snapshot_data():
+    """
+    (settings, produtos ativos com as promoções valendo, próxima fronteira)
+    direto do primário: o snapshot nunca pode nascer mais velho que a
+    escrita que o publicou.
+    """
+    db = get_db()
+    ph = "%s" if using_postgres() else "?"
+    rows = db_fetchall(db_execute(db, products_query(True, ph), (current_store_id(),)))
+    settings = store_settings(db)
+    schedule = load_promotion_schedule(db, time.time())
+    return settings, apply_promotions([product_from_row(r) for r in rows], schedule), schedule.valid_until
+
+
+class CatalogSnapshot:
+    """
+    Publica e abre o snapshot de um banco, um arquivo por loja (a loja
+    atual). Um por app; a versão aberta fica guardada por processo e só é
+    trocada quando o arquivo muda (os.stat por request).
+    """
+
+    def __init__(self, directory: str, max_age: float):
+        self.directory = directory
+        self.max_age = max_age
+        self._views = {}
+        self._lock = threading.Lock()
+        self._refreshing = {}  # caminho -> outra volta pedida durante a publicação
+        self._refreshing_pid = os.getpid()  # thread não atravessa fork
+
+    def path(self, store_id=None) -> str:
+        digest = hashlib.sha1(db_key().encode("utf-8")).hexdigest()[:12]
+        store_id = current_store_id() if store_id is None else store_id
+        return os.path.join(self.directory, f"catalog-{digest}-{store_id}.bin")
+
+    def _flock(self, path: str, blocking: bool):
+        f = open(path + ".lock", "a+b")
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                f.close()
+                return None
+        return f
+
+    def publish(self, blocking: bool = True, replaces=None, missing_only: bool = False, refresh: bool = False) -> bool:
+        """
+        Gera uma versão nova a partir do banco. Com blocking=False desiste
+        (False) se outro processo já estiver publicando; com replaces=N, se
+        a versão publicada já não for mais a N (outro processo trocou); com
+        missing_only, se o arquivo já existir (outro publicou enquanto este
+        esperava o lock). refresh (revisão periódica): desiste se outro
+        processo conferiu há menos de max_age e, se o conteúdo não mudou, só
+        marca a conferência (mtime do arquivo) em vez de gravar.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path()
+        lock = self._flock(path, blocking)
+        if lock is None:
+            return False
+        try:
+            last = last_meta = None
+            try:
+                with open(path, "rb") as f:
+                    magic, last, _, _, meta_len, _ = SNAPSHOT_HEADER.unpack(f.read(SNAPSHOT_HEADER.size))
+                    if magic == SNAPSHOT_MAGIC and refresh:
+                        last_meta = json.loads(f.read(meta_len))
+                if magic != SNAPSHOT_MAGIC:
+                    last = None
+            except (OSError, struct.error, ValueError):
+                pass
+            if replaces is not None and last != replaces:
+                return False
+            if missing_only and last is not None:
+                return False
+            if refresh and last is not None and time.time() - os.stat(path).st_mtime < self.max_age:
+                return False
+            version = 1 if last is None else last + 1
+            # lido sob o lock: a última publicação sempre vê a última escrita
+            settings, products, valid_until = load_catalog_snapshot_data()
+            data = encode_catalog_snapshot(version, settings, products, valid_until)
+            if last_meta is not None:
+                meta_len = SNAPSHOT_HEADER.unpack_from(data, 0)[4]
+                meta = json.loads(data[SNAPSHOT_HEADER.size : SNAPSHOT_HEADER.size + meta_len])
+                if (meta["revision"], meta["valid_until"]) == (last_meta.get("revision"), last_meta.get("valid_until")):
+                    os.utime(path)  # nada mudou: os outros workers não conferem de novo
+                    return False
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+            return True
+        finally:
+            lock.close()
+
+    def discard(self, store_id=None):
+        # publicação falhou: melhor a vitrine ir ao banco do que servir catálogo velho
+        try:
+            os.remove(self.path(store_id))
+        except OSError:
+            pass
+
+    def discard_all(self):
+        # dado compartilhado (categorias) mudou: cada loja republica no próximo acesso
+        for store_id in store_directory().by_id:
+            self.discard(store_id)
+
+    def publish_later(self, refresh: bool = False):
+        """
+        Publica a loja atual numa thread, fora da request (a versão atual
+        segue servida até a nova entrar). Uma por loja por processo; pedido
+        no meio de uma publicação faz mais uma volta quando ela termina.
+        """
+        path = self.path()
+        with self._lock:
+            if self._refreshing_pid != os.getpid():
+                self._refreshing, self._refreshing_pid = {}, os.getpid()
+            if path in self._refreshing:
+                self._refreshing[path] = self._refreshing[path] or not refresh
+                return
+            self._refreshing[path] = False
+        app = current_app._get_current_object()
+        threading.Thread(
+            target=self._publish_thread, args=(app, current_store(), path, refresh), name="catalog-snapshot", daemon=True
+        ).start()
+
+    def _publish_thread(self, app, store, path: str, refresh: bool):
+        while True:
+            with app.app_context():
+                g.store = store
+                try:
+                    self.publish(refresh=refresh)
+                except Exception:
+                    app.logger.exception("falha ao publicar o snapshot do catálogo")
+                    if not refresh:
+                        self.discard()
+            with self._lock:
+                if not self._refreshing.get(path):
+                    del self._refreshing[path]
+                    return
+                self._refreshing[path] = False
+                refresh = False
+
+    def wait_published(self, timeout: float = 30.0):
+        """
+        Espera as publicações em segundo plano deste processo (scripts e benches).
+        """
+        deadline = time.time() + timeout
+        while self._refreshing and time.time() < deadline:
+            time.sleep(0.01)
+
+    def current(self):
+        """
+        Versão atual (CatalogView), publicando a primeira se não existir.
+        Passou de max_age sem ninguém conferir: uma thread confere o banco e
+        republica se mudou; a request segue com a atual.
+        Passou da fronteira de uma promoção: ninguém serve o preço velho, um
+        worker republica e os outros esperam por ele (lock do arquivo).
+        """
+        view, checked_at = self._open()
+        for _ in range(2):  # a versão de outro worker pode ter nascido antes da fronteira
+            if view.valid_until is None or time.time() < view.valid_until:
+                break
+            self.publish(replaces=view.version)
+            view, checked_at = self._open()
+        if self.max_age > 0 and time.time() - checked_at > self.max_age:
+            self.publish_later(refresh=True)
+        return view
+
+    def _open(self):
+        """
+        (CatalogView, última conferência com o banco: o mtime do arquivo).
+        """
+        path = self.path()
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.publish(missing_only=True)
+            st = os.stat(path)
+        key = (st.st_dev, st.st_ino, st.st_size)
+        view = self._views.get(path)
+        if view is None or view.key != key:
+            with self._lock:
+                view = self._views.get(path)
+                if view is None or view.key != key:
+                    # a versão anterior é liberada quando a última request que a usa termina
+                    try:
+                        view = CatalogView(path, key)
+                    except (ValueError, KeyError, struct.error):
+                        # layout de outro deploy (ou arquivo estragado): publica de novo
+                        self.publish()
+                        st = os.stat(path)
+                        view = CatalogView(path, (st.st_dev, st.st_ino, st.st_size))
+                    self._views[path] = view
+        return view, st.st_mtime
+
+
+def catalog_view():
+    """
+    Snapshot atual do catálogo, ou None (desligado ou indisponível: quem
+    chamou lê do banco como antes).
+    """
+    snapshot = current_app.extensions.get("catalog_snapshot")
+    if snapshot is None:
+        return None
+    try:
+        return snapshot.current()
+    except Exception:
+        current_app.logger.exception("snapshot do catálogo indisponível; lendo do banco")
+        return None
+
+
+def catalog_changed(all_stores: bool = False):
+    """
+    Marca a request: no fim dela o snapshot da loja é republicado numa
+    thread (a resposta do admin não espera a leitura do catálogo inteiro; a
+    vitrine mostra a mudança assim que a publicação termina). all_stores: a
+    mudança vale para todas as lojas (categorias); as outras republicam no
+    próximo acesso.
+    """
+    g.catalog_changed = True
+    g.catalog_changed_all = g.get("catalog_changed_all", False) or all_stores
+
+
+@bp.after_app_request
+def _publish_catalog_snapshot(response):
+    if g.pop("catalog_changed", False):
+        snapshot = current_app.extensions.get("catalog_snapshot")
+        if snapshot is not None:
+            if g.pop("catalog_changed_all", False):
+                snapshot.discard_all()
+            snapshot.publish_later()
+    return response
+
+
+# =========================
+# ROTAS (CATÁLOGO / CHECKOUT)
+# =========================
+def prefetched(key: str, loader):
+    """
+    No modo ASGI (asgi.py) os dados destas rotas já chegam buscados de forma
+    assíncrona no scope (se forem da mesma loja); no WSGI, `loader()` busca agora.
+    """
+    data = (request.environ.get("asgi.scope") or {}).get("nc.prefetched") or {}
+    if key in data and data.get("store_id") == current_store_id():
+        return data[key]
+    return loader()
+
+
+@bp.get("/")
+@rate_limited("index", max_concurrent="INDEX_MAX_CONCURRENT")
+def index():
+    view = catalog_view()
+    if view is not None:
+        products = view.products()
+    else:
+        products = prefetched("products", lambda: fetch_products(active_only=True))
+    grouped = {}
+    for p in products:
+        grouped.setdefault(p["category"], []).append(p)
+    # página "de visitante" (sem admin, sem flash) pode ir para o cache do service worker
+    cacheable = not is_admin_logged_in() and not session.get("_flashes")
+    resp = current_app.make_response(render_template("index.html", app_name=current_store()["name"], grouped=grouped, is_admin=is_admin_logged_in()))
+    if cacheable:
+        resp.headers["X-Catalog-Revision"] = catalog_revision(view)
+    return resp
+
+
+@bp.get("/checkout")
+def checkout():
+    view = catalog_view()
+    if view is not None:
+        store_number = view.setting("whatsapp_number", STORE_WHATSAPP_NUMBER)
+    else:
+        store_number = prefetched("whatsapp_number", lambda: get_setting("whatsapp_number", STORE_WHATSAPP_NUMBER))
+    return render_template("checkout.html", app_name=current_store()["name"], store_whatsapp=store_number, is_admin=is_admin_logged_in())
+
+
+def _cart_int(value):
+    # número vindo do carrinho (JSON do navegador): o que não for inteiro vira None
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+@bp.post("/api/whatsapp_link")
+@rate_limited("api_whatsapp_link", per_ip=(20, 10), total=(600, 100), max_concurrent=8)
+def api_whatsapp_link():
+    data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Dados incompletos."}), 400
+    customer_name = str(data.get("customer_name") or "").strip()
+    address = str(data.get("address") or "").strip()
+    phone = str(data.get("phone") or "").strip()
+    payment_method = str(data.get("payment_method") or "").strip()
+    change_for = str(data.get("change_for") or "").strip()
+    items = data.get("items") or []
+
+    if not customer_name or not address or not phone or not payment_method or not items or not isinstance(items, list):
+        return jsonify({"error": "Dados incompletos."}), 400
+
+    # com snapshot, preço e nome vêm do catálogo (não do carrinho do navegador)
+    view = catalog_view()
+    total_cents = 0
+    lines = []
+    for it in items:
+        if not isinstance(it, dict):
+            continue
+        # item com qty/id/preço que não é número: pulado, como o de qty 0
+        qty = _cart_int(it.get("qty"))
+        if qty is None or qty <= 0:
+            continue
+        if view is not None:
+            pid = _cart_int(it.get("id"))
+            p = view.product(pid) if pid is not None else None
+            if p is None:
+                continue  # removido ou desativado
+            price_cents, name = p["effective_price_cents"], p["name"]
+        else:
+            price_cents = _cart_int(it.get("price_cents") or 0)
+            if price_cents is None or price_cents < 0:
+                continue
+            name = str(it.get("name") or "Item").strip()
+        subtotal = qty * price_cents
+        total_cents += subtotal
+        lines.append(f"• {qty}x {name} — {money_br(subtotal)}")
+
+    if not lines:
+        return jsonify({"error": "Carrinho vazio."}), 400
+
+    pay_line = payment_method
+    if payment_method.lower() == "dinheiro" and change_for:
+        pay_line += f" (troco para {change_for})"
+
+    msg = (
+        f"🛒 *Pedido — {current_store()['name']}*\n\n"
+        f"👤 *Nome:* {customer_name}\n"
+        f"📍 *Endereço:* {address}\n"
+        f"📞 *WhatsApp/Telefone:* {phone}\n"
+        f"💳 *Pagamento:* {pay_line}\n\n"
+        f"📦 *Itens:*\n" + "\n".join(lines) + "\n\n"
+        f"💰 *Total:* {money_br(total_cents)}\n\n"
+        f"✅ Pedido confirmado."
+    )
+
+    if view is not None:
+        store_number = view.setting("whatsapp_number", STORE_WHATSAPP_NUMBER)
+    else:
+        store_number = prefetched("whatsapp_number", lambda: get_setting("whatsapp_number", STORE_WHATSAPP_NUMBER))
+    link = f"https://wa.me/{store_number}?text={quote(msg)}"
+    return jsonify({"link": link})
+
+
+# =========================
+# PWA (manifest + service worker)
+# =========================
+# templates/sw.js guarda o "shell" (CSS/JS/ícones, checkout), serve a
+# vitrine do cache na hora e confere a revisão do catálogo em segundo plano;
+# imagens de produto ficam em stale-while-revalidate pela URL com ?v=.
+PWA_PRECACHE_ASSETS = (
+    "vendor/bootstrap.min.css",
+    "vendor/bootstrap-icons.css",
+    "vendor/bootstrap.bundle.min.js",
+    "vendor/poppins.css",
+    "css/base.css",
+    "css/index.css",
+    "css/checkout.css",
+    "brand/logo-96.webp",
+    "brand/logo-192.webp",
+)
+
+
+def shell_revision() -> str:
+    """
+    Hash dos templates + manifest dos assets: muda a cada deploy que mexe
+    no layout (o service worker troca o cache do shell).
+    """
+    revision = current_app.extensions.get("shell_revision")
+    if revision is None:
+        digest = hashlib.sha256(json.dumps(asset_manifest(), sort_keys=True).encode("utf-8"))
+        folder = os.path.join(current_app.root_path, current_app.template_folder)
+        for name in sorted(current_app.jinja_env.list_templates()):
+            with open(os.path.join(folder, name), "rb") as f:
+                digest.update(name.encode("utf-8") + b"\x00" + f.read())
+        revision = digest.hexdigest()[:16]
+        current_app.extensions["shell_revision"] = revision
+    return revision
+
+
+def catalog_revision(view=None) -> str:
+    if view is not None:
+        catalog = view.revision
+    else:
+        data = dict(
+            products=fetch_products(active_only=True),
+            whatsapp=get_setting("whatsapp_number", STORE_WHATSAPP_NUMBER),
+        )
+        catalog = hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{catalog}:{shell_revision()}".encode("utf-8")).hexdigest()[:16]
+
+
+@bp.get("/api/catalog/revision")
+def api_catalog_revision():
+    # admin logado: null -> o service worker descarta a vitrine guardada
+    revision = None if is_admin_logged_in() else catalog_revision(catalog_view())
+    resp = jsonify({"revision": revision})
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@bp.get("/manifest.webmanifest")
+def web_manifest():
+    icons = []
+    for name, size in (("brand/logo-192.webp", 192), ("brand/logo-512.webp", 512)):
+        url = asset_url(name)
+        icons.append(
+            dict(
+                src=url,
+                sizes=f"{size}x{size}",
+                type=mimetypes.guess_type(url.split("?")[0])[0] or "image/png",
+                purpose="any",
+            )
+        )
+    store = current_store()
+    manifest = dict(
+        name=store["name"],
+        # filiais instaladas lado a lado no celular precisam de nomes diferentes
+        short_name="Nova Cidade" if store["id"] == DEFAULT_STORE_ID else store["name"],
+        lang="pt-BR",
+        start_url=url_for("main.index"),
+        scope=url_for("main.index"),
+        display="standalone",
+        background_color="#fff3b0",
+        theme_color="#2b6cb0",
+        icons=icons,
+    )
+    resp = Response(json.dumps(manifest, ensure_ascii=False), mimetype="application/manifest+json")
+    resp.headers["Cache-Control"] = "public, max-age=3600"
+    return resp
+
+
+@bp.get("/sw.js")
+def service_worker():
+    # servido da raiz da loja (/ ou /s/<slug>/) para controlar a loja inteira;
+    # sem cache HTTP para o navegador pegar a versão nova do worker a cada deploy
+    precache = [url_for("main.checkout"), url_for("main.web_manifest")]
+    precache += [u for u in (asset_url(name) for name in PWA_PRECACHE_ASSETS) if u.startswith("/")]
+    # sem o build dos assets vários nomes caem no mesmo arquivo; addAll recusa repetidos
+    precache = list(dict.fromkeys(precache))
+    body = render_template(
+        "sw.js",
+        shell_revision=shell_revision(),
+        precache=precache,
+        urls=dict(
+            index=url_for("main.index"),
+            checkout=url_for("main.checkout"),
+            revision=url_for("main.api_catalog_revision"),
+            assets=url_for("main.asset", filename="x")[:-1],
+        ),
+    )
+    resp = Response(body, mimetype="text/javascript")
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+# =========================
+# BACKUP DO CATÁLOGO (export/restore)
+# =========================
+# Um arquivo zip ou tar com as tabelas em pedaços JSONL e cada imagem como
+# um membro próprio, nesta ordem:
+#   manifest.json
+#   <tabela>/00000.jsonl, 00001.jsonl, ...   (BACKUP_CHUNK_ROWS linhas cada)
+#   images/<id>.webp
+#   end.json   (contagens por tabela e de imagens; sem ele o arquivo foi cortado)
+# O export lê tudo numa transação só (retrato consistente), por cursor no
+# servidor no Postgres, e escreve cada imagem assim que ela chega: a memória
+# não cresce com o tamanho do catálogo. Funciona igual em SQLite e Postgres
+# (dá pra levar o catálogo de um para o outro).
+BACKUP_FORMAT = "nc-catalog-backup"
+BACKUP_VERSION = 2  # 2: end.json no fim
+BACKUP_CHUNK_ROWS = 1000
+BACKUP_IMAGE_FETCH = 16  # imagens por ida ao banco no cursor do servidor
+BACKUP_FLUSH_BYTES = 256 * 1024
+BACKUP_MIMETYPES = {"zip": "application/zip", "tar": "application/x-tar"}
+
+# (tabela, colunas, ORDER BY), na ordem de restauração (chaves estrangeiras)
+BACKUP_TABLES = (
+    ("settings", ("key", "value"), "key"),
+    ("stores", ("id", "slug", "name", "host", "is_active"), "id"),
+    ("store_settings", ("store_id", "key", "value"), "store_id, key"),
+    ("categories", ("id", "name", "is_active"), "id"),
+    (
+        "products",
+        (
+            "id", "name", "description", "price_cents", "image_url", "category_id", "category",
+            "is_active", "is_promo", "promo_price_cents", "image_mime", "image_name",
+            "image_placeholder", "store_id", "deactivated_by_sync",
+        ),
+        "id",
+    ),
+    (
+        "promotions",
+        ("id", "name", "product_id", "category_id", "kind", "value", "starts_at", "ends_at", "is_active", "store_id"),
+        "id",
+    ),
+)
+# tabelas com SERIAL: a sequence precisa ir para depois dos ids restaurados
+BACKUP_SERIAL_TABLES = ("stores", "categories", "products", "promotions")
+
+
+class BackupError(ValueError):
+    pass
+
+
+class _StreamSink(RawIOBase):
+    """
+    Destino sem seek para o zipfile/tarfile: guarda o que foi escrito até
+    alguém buscar com drain().
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self.pending = 0
+        self.total = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.pending += len(data)
+        self.total += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.total
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self.pending = 0
+        return data
+
+
+class BackupWriter:
+    """
+    zip ou tar escrito em sequência: cada membro entra inteiro e já pode
+    sair do buffer. No zip as imagens (webp) vão sem recompressão.
+    """
+
+    def __init__(self, fileobj, fmt: str):
+        if fmt not in BACKUP_MIMETYPES:
+            raise BackupError(f"formato desconhecido: {fmt!r} (use zip ou tar)")
+        self.mtime = time.time()
+        self._zip = zipfile.ZipFile(fileobj, "w", allowZip64=True) if fmt == "zip" else None
+        self._tar = tarfile.open(fileobj=fileobj, mode="w|", format=tarfile.PAX_FORMAT) if fmt == "tar" else None
+
+    def add(self, name: str, data: bytes, compress: bool = True):
+        if self._zip is not None:
+            info = zipfile.ZipInfo(name, date_time=time.localtime(self.mtime)[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            self._zip.writestr(info, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(self.mtime)
+            self._tar.addfile(info, BytesIO(data))
+
+    def close(self):
+        (self._zip or self._tar).close()
+
+
+def open_backup_connection():
+    """
+    Conexão só do export (fora do g.db e da réplica): uma leitura longa e
+    consistente não prende a conexão da request.
+    """
+    if using_postgres():
+        psycopg = load_psycopg()
+        if psycopg is None:
+            raise RuntimeError("psycopg não instalado. Adicione psycopg[binary]==3.2.6 no requirements.txt")
+        conn = psycopg.connect(database_url())
+        conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY;")
+        return conn
+    conn = sqlite3.connect(sqlite_path())
+    conn.execute("BEGIN;")  # em WAL, o retrato vale até o fim do export
+    return conn
+
+
+def iter_backup_rows(conn, name: str, sql: str, itersize: int = BACKUP_CHUNK_ROWS):
+    # Postgres: cursor nomeado (no servidor) traz itersize linhas por vez
+    if using_postgres():
+        with conn.cursor(name=name) as cur:
+            cur.itersize = itersize
+            cur.execute(sql)
+            yield from cur
+    else:
+        yield from conn.execute(sql)
+
+
+def iter_catalog_backup(fmt: str = "zip", stats=None):
+    """
+    Gera os bytes do backup aos pedaços (para uma Response ou um arquivo).
+    stats (dict), se passado, recebe as linhas por tabela, imagens e bytes.
+    """
+    stats = {} if stats is None else stats
+    sink = _StreamSink()
+    writer = BackupWriter(sink, fmt)
+    conn = open_backup_connection()
+    try:
+        manifest = dict(
+            format=BACKUP_FORMAT,
+            version=BACKUP_VERSION,
+            created_at=int(writer.mtime),
+            backend="postgres" if using_postgres() else "sqlite",
+        )
+        writer.add("manifest.json", json.dumps(manifest).encode("utf-8"))
+
+        for table, columns, order in BACKUP_TABLES:
+            rows = iter_backup_rows(conn, f"backup_{table}", f"SELECT {', '.join(columns)} FROM {table} ORDER BY {order};")
+            count = 0
+            for n in itertools.count():
+                chunk = list(itertools.islice(rows, BACKUP_CHUNK_ROWS))
+                if not chunk:
+                    break
+                lines = "".join(json.dumps(dict(zip(columns, r)), ensure_ascii=False) + "\n" for r in chunk)
+                writer.add(f"{table}/{n:05d}.jsonl", lines.encode("utf-8"))
+                count += len(chunk)
+                if sink.pending >= BACKUP_FLUSH_BYTES:
+                    yield sink.drain()
+            stats[table] = count
+
+        images = image_bytes = 0
+        rows = iter_backup_rows(
+            conn,
+            "backup_images",
+            "SELECT id, image_mime, image_blob FROM products WHERE image_blob IS NOT NULL ORDER BY id;",
+            BACKUP_IMAGE_FETCH,
         )
+        for pid, mime, blob in rows:
+            ext = mimetypes.guess_extension(mime or "image/webp") or ".bin"
+            writer.add(f"images/{pid}{ext}", bytes(blob), compress=False)
+            images += 1
+            image_bytes += len(blob)
+            if sink.pending >= BACKUP_FLUSH_BYTES:
+                yield sink.drain()
+
+        counts = {table: stats[table] for table, _, _ in BACKUP_TABLES}
+        writer.add("end.json", json.dumps(dict(counts, images=images)).encode("utf-8"))
+        writer.close()
+        yield sink.drain()
+        stats.update(images=images, image_bytes=image_bytes, bytes=sink.total)
+    finally:
+        try:
+            conn.rollback()
+        finally:
+            conn.close()
+
+
+def iter_backup_members(path: str):
+    """
+    (nome, bytes) de cada membro, na ordem em que foram gravados. O tar é
+    lido em sequência (aceita .tar.gz); só um membro por vez na memória.
+    Arquivo estragado ou cortado no meio de um membro: BackupError.
+    """
+    try:
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as zf:
+                for info in zf.infolist():
+                    if not info.is_dir():
+                        with zf.open(info) as f:
+                            yield info.filename, f.read()
+            return
+        try:
+            tf = tarfile.open(path, "r|*")
+        except tarfile.TarError:
+            raise BackupError("arquivo não é zip nem tar")
+        with tf:
+            for member in tf:
+                if member.isfile():
+                    yield member.name, tf.extractfile(member).read()
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, zlib.error) as e:
+        raise BackupError(f"arquivo estragado ou incompleto: {e}")
+
+
+def _backup_json(name: str, data: bytes):
+    try:
+        return json.loads(data)
+    except ValueError:
+        raise BackupError(f"{name}: JSON inválido")
+
+
+def _backup_rows(name: str, data: bytes) -> list:
+    try:
+        lines = data.decode("utf-8").splitlines()
+    except UnicodeDecodeError:
+        raise BackupError(f"{name}: não é UTF-8")
+    rows = []
+    for n, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        row = _backup_json(f"{name}, linha {n}", line)
+        if not isinstance(row, dict):
+            raise BackupError(f"{name}, linha {n}: esperado um objeto JSON")
+        rows.append(row)
+    return rows
+
+
+def check_catalog_backup(path: str) -> dict:
+    """
+    Lê o backup inteiro sem gravar nada: manifest, cada linha das tabelas,
+    nomes das imagens e (versão 2+) as contagens do end.json. Levanta
+    BackupError no primeiro problema; retorna as contagens.
+    """
+    known = {table for table, _, _ in BACKUP_TABLES}
+    members = iter_backup_members(path)
+    name, data = next(members, (None, None))
+    manifest = _backup_json(name, data) if name == "manifest.json" else {}
+    if not isinstance(manifest, dict) or manifest.get("format") != BACKUP_FORMAT:
+        raise BackupError("arquivo não é um backup do catálogo (sem manifest.json)")
+    version = int(manifest.get("version") or 0)
+    if version > BACKUP_VERSION:
+        raise BackupError(f"backup da versão {manifest.get('version')}: atualize o app antes de restaurar")
+
+    counts = {table: 0 for table in known}
+    counts["images"] = 0
+    end = None
+    for name, data in members:
+        folder, _, filename = name.partition("/")
+        if name == "end.json":
+            end = _backup_json(name, data)
+        elif folder in known:
+            counts[folder] += len(_backup_rows(name, data))
+        elif folder == "images":
+            if not filename.split(".", 1)[0].isdigit():
+                raise BackupError(f"{name}: nome de imagem inválido")
+            counts["images"] += 1
+
+    if version >= 2:
+        if not isinstance(end, dict):
+            raise BackupError("arquivo incompleto (sem end.json): o backup foi cortado")
+        if any(int(end.get(k, -1)) != v for k, v in counts.items()):
+            raise BackupError("arquivo incompleto: as contagens não batem com o end.json")
+    return counts
+
+
+def restore_catalog_backup(path: str, replace: bool = False, batch: int = 500) -> dict:
+    """
+    Carrega no banco atual um backup gerado por iter_catalog_backup (precisa
+    de app context). Lê o arquivo duas vezes: a primeira confere tudo sem
+    gravar (check_catalog_backup); a segunda apaga o catálogo (todas as
+    lojas) e grava tudo numa transação só, desfeita inteira se qualquer coisa
+    falhar: o catálogo atual só some se o do backup entrar completo. `batch`:
+    linhas por executemany. Com produtos já cadastrados só roda com
+    replace=True. Retorna as contagens por tabela e de imagens.
+    """
+    db = get_db()
+    pg = using_postgres()
+    ph = "%s" if pg else "?"
+    batch = max(1, batch)
+    known = {table: columns for table, columns, _ in BACKUP_TABLES}
+
+    expected = check_catalog_backup(path)
+    if not replace and db_fetchone(db_execute(db, "SELECT 1 FROM products LIMIT 1;")) is not None:
+        raise BackupError("o banco já tem produtos: use replace para substituir o catálogo")
+
+    stats = {table: 0 for table in known}
+    stats["images"] = 0
+    try:
+        for table, _, _ in reversed(BACKUP_TABLES):
+            db_execute(db, f"DELETE FROM {table};")
+
+        members = iter_backup_members(path)
+        next(members)  # manifest.json, já conferido
+        for name, data in members:
+            folder, _, filename = name.partition("/")
+            if folder in known:
+                rows = _backup_rows(name, data)
+                if not rows:
+                    continue
+                # backup antigo pode não ter colunas novas: ficam com o DEFAULT
+                columns = [c for c in known[folder] if c in rows[0]]
+                sql = f"INSERT INTO {folder} ({', '.join(columns)}) VALUES ({', '.join([ph] * len(columns))});"
+                for start in range(0, len(rows), batch):
+                    params = [tuple(r.get(c) for c in columns) for r in rows[start : start + batch]]
+                    if pg:
+                        with db.cursor() as cur:
+                            cur.executemany(sql, params)
+                    else:
+                        db.executemany(sql, params)
+                stats[folder] += len(rows)
+            elif folder == "images":
+                pid = int(filename.split(".", 1)[0])
+                db_execute(db, f"UPDATE products SET image_blob={ph} WHERE id={ph};", (data, pid))
+                stats["images"] += 1
+
+        if stats != expected:
+            raise BackupError("o arquivo mudou durante a restauração")
+        db_commit(db)
+    except Exception:
+        db.rollback()
+        raise
+
+    if pg:
+        # setval não volta com rollback: só depois do commit
+        for table in BACKUP_SERIAL_TABLES:
+            db_execute(
+                db,
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), GREATEST((SELECT MAX(id) FROM {table}), 1));",
+            )
+        db_commit(db)
+
+    # caches deste processo; os outros recarregam pelo TTL / snapshot apagado
+    stores_changed()
+    current_app.extensions.get("promotion_schedules", {}).clear()
+    snapshot = current_app.extensions.get("catalog_snapshot")
+    if snapshot is not None:
+        snapshot.discard_all()
+    return stats
+
+
+# =========================
+# MANUTENÇÃO (agendador em segundo plano)
+# =========================
+# Cada processo tem uma thread que acorda a cada MAINTENANCE_TICK_SECONDS e,
+# dentro da janela de pouco movimento (MAINTENANCE_WINDOW, no fuso da loja),
+# roda as tarefas vencidas. Um lock (advisory lock no Postgres, flock num
+# arquivo ao lado do SQLite) deixa um processo por vez; o histórico na tabela
+# maintenance_runs diz o que já rodou, então os outros workers (e servidores,
+# no Postgres) não repetem a tarefa.
+# Desligado por padrão (scripts, benches e o importador também chamam
+# create_app); o gunicorn.conf.py liga com MAINTENANCE=1 nos workers.
+MAINTENANCE = (os.getenv("MAINTENANCE") or "").strip() == "1"
+MAINTENANCE_WINDOW = (os.getenv("MAINTENANCE_WINDOW") or "03:00-06:00").strip()  # "" = qualquer hora
+MAINTENANCE_TICK_SECONDS = float(os.getenv("MAINTENANCE_TICK_SECONDS") or "60")
+MAINTENANCE_LOCK_KEY = 4_150_126  # pg_try_advisory_lock
+MAINTENANCE_HISTORY = 50  # execuções mostradas no admin
+MAINTENANCE_KEEP_RUNS = 1000  # linhas guardadas em maintenance_runs
+# incremental_vacuum: páginas devolvidas ao disco por execução; SQLite sem
+# auto_vacuum é convertido (VACUUM completo) quando passa disso de espaço livre
+MAINTENANCE_VACUUM_PAGES = int(os.getenv("MAINTENANCE_VACUUM_PAGES") or "25600")
+MAINTENANCE_VACUUM_CONVERT_RATIO = 0.2
+# arquivos de UPLOAD_FOLDER que nenhum produto usa: por padrão só lista
+MAINTENANCE_DELETE_UPLOADS = (os.getenv("MAINTENANCE_DELETE_UPLOADS") or "").strip() == "1"
+# blob guardado de produto cuja image_url virou link externo: por padrão só
+# conta (é a única cópia da foto, se o link sair do ar o admin volta para ela)
+MAINTENANCE_DROP_UNUSED_BLOBS = (os.getenv("MAINTENANCE_DROP_UNUSED_BLOBS") or "").strip() == "1"
+MAINTENANCE_UPLOAD_GRACE_DAYS = 7
+_MAINTENANCE_WINDOW_RE = re.compile(r"^([01]\d|2[0-3]):([0-5]\d)-([01]\d|2[0-3]):([0-5]\d)$")
+
+
+def in_maintenance_window(window: str, now=None) -> bool:
+    """
+    "HH:MM-HH:MM" no fuso da loja (pode virar a meia-noite: "23:00-05:00").
+    Janela vazia = qualquer hora; inválida = nunca (e avisa no log).
+    """
+    if not window:
+        return True
+    m = _MAINTENANCE_WINDOW_RE.match(window)
+    if m is None:
+        current_app.logger.warning("MAINTENANCE_WINDOW inválida: %r (use HH:MM-HH:MM)", window)
+        return False
+    start = int(m.group(1)) * 60 + int(m.group(2))
+    end = int(m.group(3)) * 60 + int(m.group(4))
+    t = datetime.fromtimestamp(time.time() if now is None else now, store_timezone())
+    minute = t.hour * 60 + t.minute
+    return start <= minute < end if start <= end else (minute >= start or minute < end)
+
+
+def maintenance_analyze(db) -> str:
+    if using_postgres():
+        db_execute(db, "ANALYZE;")
+        db_commit(db)
+        return "ANALYZE em todas as tabelas"
+    # analysis_limit: amostra cada índice em vez de ler a tabela inteira (e os blobs).
+    # ANALYZE em vez de PRAGMA optimize: numa conexão nova o optimize (antes do
+    # SQLite 3.46) só olha as tabelas que ela usou, ou seja, nenhuma
+    db_execute(db, "PRAGMA analysis_limit=1000;")
+    db_execute(db, "ANALYZE;")
     db_commit(db)
+    return "ANALYZE (amostra de até 1000 linhas por índice)"
 
 
-# =========================
-# SERVIR IMAGEM DO BANCO
-# =========================
-@app.get("/img/<int:pid>.webp")
-def product_image(pid: int):
-    db = get_db()
+def maintenance_vacuum(db) -> str:
     if using_postgres():
-        cur = db_execute(db, "SELECT image_blob, image_mime FROM products WHERE id=%s;", (pid,))
-        row = db_fetchone(cur)
-        if not row:
-            abort(404)
-        blob, mime = row[0], row[1]
+        row = db_fetchone(db_execute(db, "SELECT n_dead_tup FROM pg_stat_user_tables WHERE relname = 'products';"))
+        dead = int(row[0] or 0) if row else 0
+        db_commit(db)
+        # VACUUM não roda dentro de transação; o TOAST (imagens) vai junto
+        db.autocommit = True
+        try:
+            db_execute(db, "VACUUM products;")
+            db_execute(db, "VACUUM promotions;")
+        finally:
+            db.autocommit = False
+        return f"VACUUM em products e promotions ({dead} linhas mortas em products antes)"
+
+    page_size = int(db_fetchone(db_execute(db, "PRAGMA page_size;"))[0])
+    pages = int(db_fetchone(db_execute(db, "PRAGMA page_count;"))[0])
+    free = int(db_fetchone(db_execute(db, "PRAGMA freelist_count;"))[0])
+    mode = int(db_fetchone(db_execute(db, "PRAGMA auto_vacuum;"))[0])
+    db_commit(db)
+    free_mb = free * page_size / 1048576
+    if mode == 2:  # INCREMENTAL
+        n = min(free, MAINTENANCE_VACUUM_PAGES)
+        if n:
+            # pelo execute() o sqlite3 dá um passo só (uma página); o executescript
+            # roda o pragma até o fim
+            db.executescript(f"PRAGMA incremental_vacuum({n});")
+        return f"incremental_vacuum: {n * page_size / 1048576:.1f} MB devolvidos ao disco ({free_mb:.1f} MB livres antes)"
+    if pages and free / pages >= MAINTENANCE_VACUUM_CONVERT_RATIO:
+        # uma vez só: reescreve o arquivo e liga o auto_vacuum incremental
+        db_execute(db, "PRAGMA auto_vacuum=INCREMENTAL;")
+        db_execute(db, "VACUUM;")
+        return f"VACUUM completo ({free_mb:.1f} MB livres); auto_vacuum=INCREMENTAL daqui em diante"
+    return f"{free_mb:.1f} MB livres ({free * 100 // max(pages, 1)}% do arquivo): abaixo do limite, nada a fazer"
+
+
+def maintenance_gc_images(db) -> str:
+    """
+    Imagens que ninguém mais pede: blob de produto cuja image_url aponta para
+    outro lugar, e arquivos antigos de UPLOAD_FOLDER sem produto. Nos dois
+    casos só relata, a não ser que o apagar esteja ligado
+    (MAINTENANCE_DROP_UNUSED_BLOBS / MAINTENANCE_DELETE_UPLOADS).
+    Blob de produto removido sai junto com a linha e foto trocada é
+    sobrescrita no lugar, então não há blob órfão de verdade neste esquema.
+    """
+    unused = "image_blob IS NOT NULL AND image_url <> '' AND image_url NOT LIKE '/img/%'"
+    length = "octet_length" if using_postgres() else "length"
+    row = db_fetchone(db_execute(db, f"SELECT COUNT(*), COALESCE(SUM({length}(image_blob)), 0) FROM products WHERE {unused};"))
+    blobs, blob_mb = int(row[0]), int(row[1]) / 1048576
+    if blobs and MAINTENANCE_DROP_UNUSED_BLOBS:
+        db_execute(db, f"UPDATE products SET image_blob = NULL, image_mime = NULL, image_name = NULL WHERE {unused};")
+        db_commit(db)
+        # /img/<id>.webp de quem perdeu o blob muda: as lojas republicam
+        snapshot = current_app.extensions.get("catalog_snapshot")
+        if snapshot is not None:
+            snapshot.discard_all()
+        stored = f"{blobs} blob(s) de imagem externa apagado(s) ({blob_mb:.1f} MB)"
+    elif blobs:
+        stored = f"{blobs} blob(s) guardado(s) de imagem externa ({blob_mb:.1f} MB; apague com MAINTENANCE_DROP_UNUSED_BLOBS=1)"
     else:
-        row = db_execute(db, "SELECT image_blob, image_mime FROM products WHERE id=?;", (pid,)).fetchone()
-        if not row:
-            abort(404)
-        blob, mime = row["image_blob"], row["image_mime"]
-
-    if blob is None:
-        abort(404)
+        stored = "nenhum blob sem uso"
+
+    folder = current_app.config.get("UPLOAD_FOLDER") or UPLOAD_FOLDER
+    if not os.path.isdir(folder):
+        return stored
+    rows = db_fetchall(db_execute(db, "SELECT image_url FROM products WHERE image_url LIKE '%/uploads/%';"))
+    referenced = {os.path.basename(unquote((r[0] or "").split("?", 1)[0])) for r in rows}
+    cutoff = time.time() - MAINTENANCE_UPLOAD_GRACE_DAYS * 86400
+    orphans = []
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.name not in referenced and entry.stat().st_mtime < cutoff:
+            orphans.append(entry)
+    orphan_mb = sum(e.stat().st_size for e in orphans) / 1048576
+    if orphans and MAINTENANCE_DELETE_UPLOADS:
+        for entry in orphans:
+            os.remove(entry.path)
+        files = f"{len(orphans)} arquivo(s) sem produto apagado(s) de {folder} ({orphan_mb:.1f} MB)"
+    elif orphans:
+        files = f"{len(orphans)} arquivo(s) sem produto em {folder} ({orphan_mb:.1f} MB; apague com MAINTENANCE_DELETE_UPLOADS=1)"
+    else:
+        files = "nenhum arquivo sem produto"
+    return f"{stored}; {files}"
 
-    return Response(blob, mimetype=(mime or "image/webp"), headers={"Cache-Control": "public, max-age=86400"})
 
+def maintenance_warm_up(db) -> str:
+    """
+    Deixa o dia começar quente: catálogo de cada loja lido (páginas no cache
+    do banco/SO) e snapshot republicado (vale para todos os workers).
+    """
+    snapshot = current_app.extensions.get("catalog_snapshot")
+    stores = [s for s in store_directory().by_id.values() if s["is_active"]]
+    previous = g.get("store")
+    try:
+        for store in stores:
+            g.store = store
+            fetch_products(active_only=True)
+            if snapshot is not None:
+                snapshot.publish(blocking=False)
+    finally:
+        g.store = previous
+    return f"{len(stores)} loja(s): catálogo lido" + (" e snapshot republicado" if snapshot is not None else "")
+
+
+def _maintenance_hours(name: str, default: str) -> float:
+    return float(os.getenv(name) or default) * 3600.0
+
+
+# na ordem em que rodam: a limpeza libera espaço, o vacuum devolve ao disco,
+# as estatísticas saem do estado final e o warm-up vem por último
+MAINTENANCE_TASKS = OrderedDict(
+    [
+        ("gc_images", dict(label="Limpeza de imagens sem uso", interval=_maintenance_hours("MAINTENANCE_GC_HOURS", "24"), run=maintenance_gc_images)),
+        ("vacuum", dict(label="Vacuum (espaço de imagens trocadas e produtos removidos)", interval=_maintenance_hours("MAINTENANCE_VACUUM_HOURS", "168"), run=maintenance_vacuum)),
+        ("analyze", dict(label="Estatísticas do planejador (ANALYZE)", interval=_maintenance_hours("MAINTENANCE_ANALYZE_HOURS", "24"), run=maintenance_analyze)),
+        ("warm_up", dict(label="Aquecimento do catálogo", interval=_maintenance_hours("MAINTENANCE_WARM_HOURS", "24"), run=maintenance_warm_up)),
+    ]
+)
 
-# =========================
-# ROTAS (CATÁLOGO / CHECKOUT)
-# =========================
-@app.get("/")
-def index():
-    products = fetch_products(active_only=True)
-    grouped = {}
-    for p in products:
-        grouped.setdefault(p["category"], []).append(p)
-    return render_template("index.html", app_name=APP_NAME, grouped=grouped, is_admin=is_admin_logged_in())
 
+def _maintenance_lock(db):
+    """
+    Lock de "um processo por vez" (não bloqueia). None = outro está rodando.
+    """
+    if using_postgres():
+        row = db_fetchone(db_execute(db, "SELECT pg_try_advisory_lock(%s);", (MAINTENANCE_LOCK_KEY,)))
+        db_commit(db)
+        return True if row and row[0] else None
+    f = open(sqlite_path() + ".maintenance.lock", "a+b")
+    if fcntl is not None:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+    return f
 
-@app.get("/checkout")
-def checkout():
-    store_number = get_setting("whatsapp_number", STORE_WHATSAPP_NUMBER)
-    return render_template("checkout.html", app_name=APP_NAME, store_whatsapp=store_number, is_admin=is_admin_logged_in())
 
+def _maintenance_unlock(db, lock):
+    if using_postgres():
+        db_execute(db, "SELECT pg_advisory_unlock(%s);", (MAINTENANCE_LOCK_KEY,))
+        db_commit(db)
+    else:
+        lock.close()  # fechar solta o flock
 
-@app.post("/api/whatsapp_link")
-def api_whatsapp_link():
-    data = request.get_json(force=True)
-    customer_name = (data.get("customer_name") or "").strip()
-    address = (data.get("address") or "").strip()
-    phone = (data.get("phone") or "").strip()
-    payment_method = (data.get("payment_method") or "").strip()
-    change_for = (data.get("change_for") or "").strip()
-    items = data.get("items") or []
 
-    if not customer_name or not address or not phone or not payment_method or not items:
-        return jsonify({"error": "Dados incompletos."}), 400
+def last_maintenance_runs(db) -> dict:
+    """
+    {tarefa: início da última execução (epoch)}.
+    """
+    cur = db_execute(db, "SELECT task, MAX(started_at) FROM maintenance_runs GROUP BY task;")
+    return {r[0]: float(r[1]) for r in db_fetchall(cur)}
 
-    total_cents = 0
-    lines = []
-    for it in items:
-        qty = int(it.get("qty") or 0)
-        if qty <= 0:
-            continue
-        price_cents = int(it.get("price_cents") or 0)
-        name = (it.get("name") or "Item").strip()
-        subtotal = qty * price_cents
-        total_cents += subtotal
-        lines.append(f"• {qty}x {name} — {money_br(subtotal)}")
 
-    if not lines:
-        return jsonify({"error": "Carrinho vazio."}), 400
+def run_maintenance(tasks=None, force: bool = False):
+    """
+    Roda as tarefas vencidas (com `tasks` e force=True, essas mesmo sem
+    vencer) e grava cada uma no histórico. Devolve [(tarefa, status, ms,
+    detalhe)], ou None se outro processo estiver com o lock.
+    """
+    db = get_db()
+    ph = "%s" if using_postgres() else "?"
+    lock = _maintenance_lock(db)
+    if lock is None:
+        return None
+    results = []
+    try:
+        # depois do lock: o que outro processo acabou de rodar já está aqui
+        last = last_maintenance_runs(db)
+        for name, task in MAINTENANCE_TASKS.items():
+            if tasks is not None and name not in tasks:
+                continue
+            started = time.time()
+            if not force and started - last.get(name, 0.0) < task["interval"]:
+                continue
+            t0 = time.perf_counter()
+            try:
+                status, detail = "ok", task["run"](db)
+            except Exception as e:
+                current_app.logger.exception("manutenção: %s falhou", name)
+                try:
+                    db.rollback()
+                except Exception:
+                    pass
+                status, detail = "error", f"{type(e).__name__}: {e}"
+            ms = int((time.perf_counter() - t0) * 1000)
+            db_execute(
+                db,
+                f"INSERT INTO maintenance_runs (task, started_at, duration_ms, status, detail) VALUES ({ph}, {ph}, {ph}, {ph}, {ph});",
+                (name, started, ms, status, (detail or "")[:1000]),
+            )
+            db_commit(db)
+            results.append((name, status, ms, detail))
+        if results:
+            db_execute(
+                db,
+                f"DELETE FROM maintenance_runs WHERE id <= (SELECT MAX(id) FROM maintenance_runs) - {MAINTENANCE_KEEP_RUNS};",
+            )
+            db_commit(db)
+    finally:
+        _maintenance_unlock(db, lock)
+    return results
 
-    pay_line = payment_method
-    if payment_method.lower() == "dinheiro" and change_for:
-        pay_line += f" (troco para {change_for})"
 
-    msg = (
-        f"🛒 *Pedido — {APP_NAME}*\n\n"
-        f"👤 *Nome:* {customer_name}\n"
-        f"📍 *Endereço:* {address}\n"
-        f"📞 *WhatsApp/Telefone:* {phone}\n"
-        f"💳 *Pagamento:* {pay_line}\n\n"
-        f"📦 *Itens:*\n" + "\n".join(lines) + "\n\n"
-        f"💰 *Total:* {money_br(total_cents)}\n\n"
-        f"✅ Pedido confirmado."
-    )
+class MaintenanceScheduler:
+    """
+    Thread de manutenção do processo. Sobe no primeiro request de cada
+    processo (depois do fork dos workers; thread não atravessa fork).
+    """
 
-    store_number = get_setting("whatsapp_number", STORE_WHATSAPP_NUMBER)
-    link = f"https://wa.me/{store_number}?text={quote(msg)}"
-    return jsonify({"link": link})
+    def __init__(self, app: Flask, tick: float):
+        self.app = app
+        self.tick = tick
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="maintenance", daemon=True).start()
+
+    def _run(self):
+        # primeira volta espalhada: os workers não acordam todos juntos
+        delay = self.tick * (0.5 + random.random())
+        while True:
+            time.sleep(delay)
+            delay = self.tick
+            try:
+                with self.app.app_context():
+                    if in_maintenance_window(self.app.config["MAINTENANCE_WINDOW"]):
+                        run_maintenance()
+            except Exception:
+                self.app.logger.exception("manutenção: falha no agendador")
+
+
+@bp.before_app_request
+def _start_maintenance():
+    scheduler = current_app.extensions.get("maintenance")
+    if scheduler is not None:
+        scheduler.ensure_started()
 
 
 # =========================
 # LOGIN / LOGOUT
 # =========================
-@app.get("/login")
+@bp.get("/login")
 def login():
     if is_admin_logged_in():
-        return redirect(url_for("admin"))
-    next_url = request.args.get("next") or url_for("admin")
-    return render_template("login.html", app_name=APP_NAME, next_url=next_url, is_admin=is_admin_logged_in())
+        return redirect(url_for("main.admin"))
+    next_url = request.args.get("next") or url_for("main.admin")
+    return render_template("login.html", app_name=current_store()["name"], next_url=next_url, is_admin=is_admin_logged_in())
 
 
-@app.post("/login")
+@bp.post("/login")
+@rate_limited("login_post", per_ip=(5, 5), total=(60, 20), max_concurrent=4)
 def login_post():
     username = (request.form.get("username") or "").strip()
     password = request.form.get("password") or ""
-    next_url = request.form.get("next") or url_for("admin")
+    next_url = request.form.get("next") or url_for("main.admin")
 
     if username == ADMIN_USER and password == ADMIN_PASSWORD:
         session["is_admin"] = True
@@ -672,64 +3623,196 @@ def login_post():
         return redirect(next_url)
 
     flash("Usuário ou senha inválidos.", "error")
-    return redirect(url_for("login", next=next_url))
+    return redirect(url_for("main.login", next=next_url))
 
 
-@app.get("/logout")
+@bp.get("/logout")
 def logout():
     session.clear()
     flash("Você saiu do admin.", "success")
-    return redirect(url_for("index"))
+    return redirect(url_for("main.index"))
 
 
 # =========================
 # ADMIN
 # =========================
-@app.get("/admin")
+@bp.get("/admin")
 @admin_required
 def admin():
-    products = fetch_products(active_only=False)
+    q = (request.args.get("q") or "").strip()
+    category_raw = (request.args.get("category_id") or "").strip()
+    status = (request.args.get("status") or "").strip()
+    promo = (request.args.get("promo") or "").strip()
+    try:
+        page = max(1, int(request.args.get("page") or 1))
+    except ValueError:
+        page = 1
+
+    category_id = None
+    if category_raw == "none":
+        category_id = "none"
+    elif category_raw.isdigit():
+        category_id = int(category_raw)
+
+    products, total = fetch_products_page(q=q, category_id=category_id, status=status, promo=promo, page=page)
+    pages = max(1, (total + ADMIN_PER_PAGE - 1) // ADMIN_PER_PAGE)
+
+    filters = dict(q=q, category_id=category_raw, status=status, promo=promo)
     categories = fetch_categories(active_only=True)
     store_number = get_setting("whatsapp_number", STORE_WHATSAPP_NUMBER)
     return render_template(
         "admin.html",
-        app_name=APP_NAME,
+        app_name=current_store()["name"],
         products=products,
         categories=categories,
         store_whatsapp=store_number,
+        filters=filters,
+        filter_args={k: v for k, v in filters.items() if v},
+        page=min(page, pages),
+        pages=pages,
+        total=total,
         is_admin=is_admin_logged_in(),
     )
 
 
-@app.post("/admin/settings/whatsapp")
+@bp.post("/admin/settings/whatsapp")
 @admin_required
 def admin_update_whatsapp():
     raw = (request.form.get("store_whatsapp") or "").strip()
     digits = normalize_whatsapp(raw)
     if not digits:
         flash("Informe um número válido (somente números). Ex: 5531999999999", "error")
-        return redirect(url_for("admin"))
+        return redirect(url_for("main.admin"))
     set_setting("whatsapp_number", digits)
+    catalog_changed()
     flash("WhatsApp da loja atualizado!", "success")
-    return redirect(url_for("admin"))
+    return redirect(url_for("main.admin"))
+
+
+# ---- PERFIS (profiler) ----
+@bp.get("/admin/profiles")
+@admin_required
+def admin_profiles():
+    return render_template(
+        "profiles.html",
+        app_name=current_store()["name"],
+        profiles=list_profiles(),
+        sample_every=PROFILE_SAMPLE_EVERY,
+        is_admin=is_admin_logged_in(),
+    )
+
+
+@bp.get("/admin/profiles/<name>.txt")
+@admin_required
+def admin_profile_download(name):
+    if not _PROFILE_NAME_RE.match(name):
+        abort(404)
+    path = os.path.join(PROFILE_DIR, name + ".txt")
+    if not os.path.exists(path):
+        abort(404)
+    with open(path, encoding="utf-8") as f:
+        data = f.read()
+    return Response(
+        data,
+        mimetype="text/plain",
+        headers={"Content-Disposition": f"attachment; filename=profile-{name}.collapsed.txt"},
+    )
+
+
+# ---- BACKUP ----
+@bp.get("/admin/backup.<fmt>")
+@admin_required
+def admin_backup(fmt):
+    if fmt not in BACKUP_MIMETYPES:
+        abort(404)
+    filename = f"catalogo-{datetime.now().strftime('%Y%m%d-%H%M')}.{fmt}"
+    return Response(
+        stream_with_context(iter_catalog_backup(fmt)),
+        mimetype=BACKUP_MIMETYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename={filename}", "Cache-Control": "no-store"},
+    )
+
+
+# ---- MANUTENÇÃO ----
+@bp.get("/admin/maintenance")
+@admin_required
+def admin_maintenance():
+    db = get_db()
+    tz = store_timezone()
+
+    def fmt(ts):
+        return datetime.fromtimestamp(ts, tz).strftime("%d/%m/%Y %H:%M") if ts else "—"
+
+    last = last_maintenance_runs(db)
+    tasks = [
+        dict(
+            name=name,
+            label=task["label"],
+            every=f"{task['interval'] / 3600:g} h",
+            last=fmt(last.get(name)),
+            next=fmt(last.get(name, 0.0) + task["interval"]) if name in last else "na próxima janela",
+        )
+        for name, task in MAINTENANCE_TASKS.items()
+    ]
+    cur = db_execute(
+        db,
+        f"SELECT task, started_at, duration_ms, status, detail FROM maintenance_runs ORDER BY id DESC LIMIT {MAINTENANCE_HISTORY};",
+    )
+    runs = [
+        dict(
+            label=MAINTENANCE_TASKS[r[0]]["label"] if r[0] in MAINTENANCE_TASKS else r[0],
+            started=fmt(float(r[1])),
+            duration=f"{int(r[2]) / 1000:.1f} s",
+            status=r[3],
+            detail=r[4] or "",
+        )
+        for r in db_fetchall(cur)
+    ]
+    return render_template(
+        "maintenance.html",
+        app_name=current_store()["name"],
+        tasks=tasks,
+        runs=runs,
+        window=current_app.config["MAINTENANCE_WINDOW"],
+        timezone_name=STORE_TIMEZONE,
+        enabled="maintenance" in current_app.extensions,
+        is_admin=is_admin_logged_in(),
+    )
+
+
+@bp.post("/admin/maintenance/run/<task>")
+@admin_required
+def admin_maintenance_run(task):
+    if task not in MAINTENANCE_TASKS:
+        abort(404)
+    results = run_maintenance([task], force=True)
+    if results is None:
+        flash("Outra manutenção está rodando agora. Tente de novo em instantes.", "error")
+    else:
+        _, status, ms, detail = results[0]
+        if status == "ok":
+            flash(f"{MAINTENANCE_TASKS[task]['label']}: {detail} ({ms / 1000:.1f} s)", "success")
+        else:
+            flash(f"{MAINTENANCE_TASKS[task]['label']} falhou: {detail}", "error")
+    return redirect(url_for("main.admin_maintenance"))
 
 
 # ---- CATEGORIAS ----
-@app.get("/admin/categories")
+@bp.get("/admin/categories")
 @admin_required
 def admin_categories():
     categories = fetch_categories(active_only=False)
-    return render_template("categories.html", app_name=APP_NAME, categories=categories, is_admin=is_admin_logged_in())
+    return render_template("categories.html", app_name=current_store()["name"], categories=categories, is_admin=is_admin_logged_in())
 
 
-@app.post("/admin/categories/add")
+@bp.post("/admin/categories/add")
 @admin_required
 def admin_categories_add():
     name = (request.form.get("name") or "").strip()
     is_active = 1 if request.form.get("is_active") == "on" else 0
     if not name:
         flash("Nome da categoria é obrigatório.", "error")
-        return redirect(url_for("admin_categories"))
+        return redirect(url_for("main.admin_categories"))
 
     db = get_db()
     try:
@@ -738,14 +3821,15 @@ def admin_categories_add():
         else:
             db_execute(db, "INSERT OR IGNORE INTO categories (name, is_active) VALUES (?, ?);", (name, is_active))
         db_commit(db)
+        catalog_changed()
         flash("Categoria adicionada!", "success")
     except Exception:
         flash("Não foi possível adicionar a categoria.", "error")
 
-    return redirect(url_for("admin_categories"))
+    return redirect(url_for("main.admin_categories"))
 
 
-@app.post("/admin/categories/toggle/<int:cid>")
+@bp.post("/admin/categories/toggle/<int:cid>")
 @admin_required
 def admin_categories_toggle(cid):
     db = get_db()
@@ -754,23 +3838,24 @@ def admin_categories_toggle(cid):
         row = db_fetchone(cur)
         if not row:
             flash("Categoria não encontrada.", "error")
-            return redirect(url_for("admin_categories"))
+            return redirect(url_for("main.admin_categories"))
         new_val = 0 if int(row[0]) == 1 else 1
         db_execute(db, "UPDATE categories SET is_active=%s WHERE id=%s;", (new_val, cid))
     else:
         row = db_execute(db, "SELECT is_active FROM categories WHERE id=?;", (cid,)).fetchone()
         if not row:
             flash("Categoria não encontrada.", "error")
-            return redirect(url_for("admin_categories"))
+            return redirect(url_for("main.admin_categories"))
         new_val = 0 if int(row["is_active"]) == 1 else 1
         db_execute(db, "UPDATE categories SET is_active=? WHERE id=?;", (new_val, cid))
 
     db_commit(db)
+    catalog_changed(all_stores=True)
     flash("Status da categoria atualizado!", "success")
-    return redirect(url_for("admin_categories"))
+    return redirect(url_for("main.admin_categories"))
 
 
-@app.post("/admin/categories/delete/<int:cid>")
+@bp.post("/admin/categories/delete/<int:cid>")
 @admin_required
 def admin_categories_delete(cid):
     db = get_db()
@@ -781,15 +3866,272 @@ def admin_categories_delete(cid):
         else:
             db_execute(db, "UPDATE products SET category_id=NULL WHERE category_id=?;", (cid,))
             db_execute(db, "DELETE FROM categories WHERE id=?;", (cid,))
+            # no Postgres a FK remove as promoções junto (ON DELETE CASCADE)
+            db_execute(db, "DELETE FROM promotions WHERE category_id=?;", (cid,))
         db_commit(db)
+        catalog_changed(all_stores=True)
         flash("Categoria removida.", "success")
     except Exception:
         flash("Não foi possível remover a categoria.", "error")
-    return redirect(url_for("admin_categories"))
+    return redirect(url_for("main.admin_categories"))
+
+
+# ---- LOJAS ----
+@bp.get("/admin/stores")
+@admin_required
+def admin_stores():
+    stores = [dict(s, base_path=f"/s/{s['slug']}/") for s in sorted(store_directory().by_id.values(), key=lambda s: s["id"])]
+    return render_template(
+        "stores.html",
+        app_name=current_store()["name"],
+        stores=stores,
+        default_store_id=DEFAULT_STORE_ID,
+        is_admin=is_admin_logged_in(),
+    )
+
+
+@bp.post("/admin/stores/add")
+@admin_required
+def admin_stores_add():
+    name = (request.form.get("name") or "").strip()
+    slug = (request.form.get("slug") or "").strip().lower()
+    host = (request.form.get("host") or "").strip().lower()
+    host = host.split("://")[-1].split("/")[0].split(":")[0] or None
+    whatsapp = normalize_whatsapp(request.form.get("store_whatsapp") or "")
+
+    if not name:
+        flash("Nome da loja é obrigatório.", "error")
+        return redirect(url_for("main.admin_stores"))
+    if not STORE_SLUG_RE.match(slug):
+        flash("Endereço inválido: use letras minúsculas, números e hífen. Ex: centro", "error")
+        return redirect(url_for("main.admin_stores"))
+
+    db = get_db()
+    try:
+        if using_postgres():
+            cur = db_execute(
+                db, "INSERT INTO stores (slug, name, host) VALUES (%s, %s, %s) RETURNING id;", (slug, name, host)
+            )
+            store_id = db_fetchone(cur)[0]
+            if whatsapp:
+                db_execute(
+                    db,
+                    "INSERT INTO store_settings (store_id, key, value) VALUES (%s, %s, %s);",
+                    (store_id, "whatsapp_number", whatsapp),
+                )
+        else:
+            db_execute(db, "INSERT INTO stores (slug, name, host) VALUES (?, ?, ?);", (slug, name, host))
+            store_id = int(db_execute(db, "SELECT last_insert_rowid();").fetchone()[0])
+            if whatsapp:
+                db_execute(
+                    db,
+                    "INSERT INTO store_settings (store_id, key, value) VALUES (?, ?, ?);",
+                    (store_id, "whatsapp_number", whatsapp),
+                )
+        db_commit(db)
+    except Exception:
+        db.rollback()
+        flash("Não foi possível criar a loja (endereço ou domínio já usado?).", "error")
+        return redirect(url_for("main.admin_stores"))
+
+    stores_changed()
+    flash("Loja criada!", "success")
+    return redirect(url_for("main.admin_stores"))
+
+
+@bp.post("/admin/stores/toggle/<int:store_id>")
+@admin_required
+def admin_stores_toggle(store_id):
+    if store_id == DEFAULT_STORE_ID:
+        flash("A loja principal não pode ser desativada.", "error")
+        return redirect(url_for("main.admin_stores"))
+    ph = "%s" if using_postgres() else "?"
+    db = get_db()
+    row = db_fetchone(db_execute(db, f"SELECT is_active FROM stores WHERE id={ph};", (store_id,)))
+    if not row:
+        flash("Loja não encontrada.", "error")
+        return redirect(url_for("main.admin_stores"))
+    new_val = 0 if int(row[0]) == 1 else 1
+    db_execute(db, f"UPDATE stores SET is_active={ph} WHERE id={ph};", (new_val, store_id))
+    db_commit(db)
+    stores_changed()
+    flash("Status da loja atualizado!", "success")
+    return redirect(url_for("main.admin_stores"))
+
+
+# ---- PROMOÇÕES ----
+def parse_store_datetime(raw: str) -> int:
+    # <input type="datetime-local"> -> epoch, no fuso da loja
+    dt = datetime.strptime((raw or "").strip(), "%Y-%m-%dT%H:%M")
+    return int(dt.replace(tzinfo=store_timezone()).timestamp())
+
+
+def fetch_promotions():
+    db = get_db()
+    ph = "%s" if using_postgres() else "?"
+    cur = db_execute(
+        db,
+        f"""
+        SELECT pr.id, pr.name, pr.kind, pr.value, pr.starts_at, pr.ends_at, pr.is_active,
+               p.name AS product_name, c.name AS category_name
+        FROM promotions pr
+        LEFT JOIN products p ON p.id = pr.product_id
+        LEFT JOIN categories c ON c.id = pr.category_id
+        WHERE pr.store_id = {ph}
+        ORDER BY pr.ends_at DESC, pr.id DESC
+        LIMIT 200;
+        """,
+        (current_store_id(),),
+    )
+    now = time.time()
+    tz = store_timezone()
+    promotions = []
+    for r in db_fetchall(cur):
+        pid, name, kind, value, starts_at, ends_at, is_active, product_name, category_name = tuple(r)
+        if not is_active:
+            status = "inactive"
+        elif ends_at <= now:
+            status = "ended"
+        elif starts_at > now:
+            status = "scheduled"
+        else:
+            status = "running"
+        promotions.append(
+            dict(
+                id=pid,
+                name=name,
+                target=(product_name or (f"Categoria {category_name}" if category_name else "—")),
+                rule=(f"{value}% off" if kind == "percent" else money_br(value)),
+                starts_at=datetime.fromtimestamp(starts_at, tz).strftime("%d/%m/%Y %H:%M"),
+                ends_at=datetime.fromtimestamp(ends_at, tz).strftime("%d/%m/%Y %H:%M"),
+                status=status,
+            )
+        )
+    return promotions
+
+
+@bp.get("/admin/promotions")
+@admin_required
+def admin_promotions():
+    # produtos não vão na página (catálogo grande): o formulário busca em /admin/products/search
+    return render_template(
+        "promotions.html",
+        app_name=current_store()["name"],
+        promotions=fetch_promotions(),
+        categories=fetch_categories(active_only=False),
+        timezone_name=STORE_TIMEZONE,
+        is_admin=is_admin_logged_in(),
+    )
+
+
+@bp.get("/admin/products/search")
+@admin_required
+def admin_products_search():
+    return jsonify({"products": search_products(request.args.get("q") or "")})
+
+
+@bp.post("/admin/promotions/add")
+@admin_required
+def admin_promotions_add():
+    name = (request.form.get("name") or "").strip()
+    target = (request.form.get("target") or "").strip()
+    kind = request.form.get("kind") or "price"
+    value_raw = (request.form.get("value") or "").strip()
+
+    if not name:
+        flash("Nome da promoção é obrigatório.", "error")
+        return redirect(url_for("main.admin_promotions"))
+    if kind not in PROMO_KINDS:
+        flash("Tipo de promoção inválido.", "error")
+        return redirect(url_for("main.admin_promotions"))
+
+    product_id = category_id = None
+    target_type, _, target_id = target.partition(":")
+    if not target_id.isdigit() or target_type not in ("product", "category"):
+        flash("Escolha o produto ou a categoria da promoção.", "error")
+        return redirect(url_for("main.admin_promotions"))
+    ph = "%s" if using_postgres() else "?"
+    db = get_db()
+    if target_type == "product":
+        product_id = int(target_id)
+        owned = db_execute(db, f"SELECT 1 FROM products WHERE id={ph} AND store_id={ph};", (product_id, current_store_id()))
+        if db_fetchone(owned) is None:
+            flash("Produto não encontrado.", "error")
+            return redirect(url_for("main.admin_promotions"))
+    else:
+        category_id = int(target_id)
+
+    try:
+        if kind == "percent":
+            value = int(value_raw.replace("%", "").strip())
+            if not 0 < value < 100:
+                raise ValueError(value_raw)
+        else:
+            value = parse_price_to_cents(value_raw)
+            if value <= 0:
+                raise ValueError(value_raw)
+    except ValueError:
+        flash("Valor da promoção inválido (preço em R$ ou desconto de 1 a 99%).", "error")
+        return redirect(url_for("main.admin_promotions"))
+
+    try:
+        starts_at = parse_store_datetime(request.form.get("starts_at"))
+        ends_at = parse_store_datetime(request.form.get("ends_at"))
+    except ValueError:
+        flash("Informe início e fim da promoção.", "error")
+        return redirect(url_for("main.admin_promotions"))
+    if ends_at <= starts_at:
+        flash("O fim da promoção precisa ser depois do início.", "error")
+        return redirect(url_for("main.admin_promotions"))
+
+    db_execute(
+        db,
+        f"INSERT INTO promotions (name, product_id, category_id, kind, value, starts_at, ends_at, is_active, store_id) "
+        f"VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, 1, {ph});",
+        (name, product_id, category_id, kind, value, starts_at, ends_at, current_store_id()),
+    )
+    db_commit(db)
+    promotions_changed()
+    flash("Promoção agendada!", "success")
+    return redirect(url_for("main.admin_promotions"))
+
+
+@bp.post("/admin/promotions/toggle/<int:promo_id>")
+@admin_required
+def admin_promotions_toggle(promo_id):
+    ph = "%s" if using_postgres() else "?"
+    db = get_db()
+    row = db_fetchone(
+        db_execute(db, f"SELECT is_active FROM promotions WHERE id={ph} AND store_id={ph};", (promo_id, current_store_id()))
+    )
+    if not row:
+        flash("Promoção não encontrada.", "error")
+        return redirect(url_for("main.admin_promotions"))
+    new_val = 0 if int(row[0]) == 1 else 1
+    db_execute(db, f"UPDATE promotions SET is_active={ph} WHERE id={ph};", (new_val, promo_id))
+    db_commit(db)
+    promotions_changed()
+    flash("Status da promoção atualizado!", "success")
+    return redirect(url_for("main.admin_promotions"))
+
+
+@bp.post("/admin/promotions/delete/<int:promo_id>")
+@admin_required
+def admin_promotions_delete(promo_id):
+    ph = "%s" if using_postgres() else "?"
+    db = get_db()
+    try:
+        db_execute(db, f"DELETE FROM promotions WHERE id={ph} AND store_id={ph};", (promo_id, current_store_id()))
+        db_commit(db)
+        promotions_changed()
+        flash("Promoção removida.", "success")
+    except Exception:
+        flash("Não foi possível remover a promoção.", "error")
+    return redirect(url_for("main.admin_promotions"))
 
 
 # ---- PRODUTOS ----
-@app.post("/admin/add")
+@bp.post("/admin/add")
 @admin_required
 def admin_add():
     name = (request.form.get("name") or "").strip()
@@ -803,13 +4145,13 @@ def admin_add():
 
     if not name:
         flash("Nome do produto é obrigatório.", "error")
-        return redirect(url_for("admin"))
+        return redirect(url_for("main.admin"))
 
     try:
         price_cents = parse_price_to_cents(price_raw)
     except Exception:
         flash("Preço inválido.", "error")
-        return redirect(url_for("admin"))
+        return redirect(url_for("main.admin"))
 
     promo_price_cents = None
     if is_promo and promo_price_raw:
@@ -817,7 +4159,7 @@ def admin_add():
             promo_price_cents = parse_price_to_cents(promo_price_raw)
         except Exception:
             flash("Preço promocional inválido.", "error")
-            return redirect(url_for("admin"))
+            return redirect(url_for("main.admin"))
 
     category_id = None
     try:
@@ -831,41 +4173,42 @@ def admin_add():
         cur = db_execute(
             db,
             """
-            INSERT INTO products (name, description, price_cents, image_url, category_id, is_active, is_promo, promo_price_cents)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+            INSERT INTO products (name, description, price_cents, image_url, category_id, is_active, is_promo, promo_price_cents, store_id)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
             RETURNING id;
             """,
-            (name, description, price_cents, "", category_id, is_active, is_promo, promo_price_cents),
+            (name, description, price_cents, "", category_id, is_active, is_promo, promo_price_cents, current_store_id()),
         )
         pid = db_fetchone(cur)[0]
     else:
         db_execute(
             db,
             """
-            INSERT INTO products (name, description, price_cents, image_url, category_id, is_active, is_promo, promo_price_cents)
-            VALUES (?,?,?,?,?,?,?,?);
+            INSERT INTO products (name, description, price_cents, image_url, category_id, is_active, is_promo, promo_price_cents, store_id)
+            VALUES (?,?,?,?,?,?,?,?,?);
             """,
-            (name, description, price_cents, "", category_id, is_active, is_promo, promo_price_cents),
+            (name, description, price_cents, "", category_id, is_active, is_promo, promo_price_cents, current_store_id()),
         )
         pid = int(db_execute(db, "SELECT last_insert_rowid();").fetchone()[0])
 
     db_commit(db)
+    catalog_changed()
 
     # Agora processa e salva imagem NO BANCO (se enviada)
     file = request.files.get("image_file")
     if file and file.filename:
         try:
-            webp_bytes, mime, original_name = process_image_to_webp_bytes(file)
-            save_image_to_db(pid, webp_bytes, mime, original_name)
+            webp_bytes, mime, original_name, placeholder = process_image_to_webp_bytes(file)
+            save_image_to_db(pid, webp_bytes, mime, original_name, placeholder)
         except Exception as e:
             flash(f"Produto criado, mas falha ao processar imagem: {e}", "error")
-            return redirect(url_for("admin"))
+            return redirect(url_for("main.admin"))
 
     flash("Produto adicionado!", "success")
-    return redirect(url_for("admin"))
+    return redirect(url_for("main.admin"))
 
 
-@app.get("/admin/edit/<int:pid>")
+@bp.get("/admin/edit/<int:pid>")
 @admin_required
 def admin_edit(pid):
     db = get_db()
@@ -878,14 +4221,14 @@ def admin_edit(pid):
             SELECT p.id, p.name, p.description, p.price_cents, p.image_url,
                    p.category_id, p.is_active, p.is_promo, p.promo_price_cents,
                    p.image_blob
-            FROM products p WHERE p.id=%s;
+            FROM products p WHERE p.id=%s AND p.store_id=%s;
             """,
-            (pid,),
+            (pid, current_store_id()),
         )
         row = db_fetchone(cur)
         if not row:
             flash("Produto não encontrado.", "error")
-            return redirect(url_for("admin"))
+            return redirect(url_for("main.admin"))
         image_url = row[4] or ""
         if row[9] is not None:
             image_url = f"/img/{pid}.webp"
@@ -901,10 +4244,10 @@ def admin_edit(pid):
             promo_price_cents=(int(row[8]) if row[8] is not None else None),
         )
     else:
-        row = db_execute(db, "SELECT * FROM products WHERE id=?;", (pid,)).fetchone()
+        row = db_execute(db, "SELECT * FROM products WHERE id=? AND store_id=?;", (pid, current_store_id())).fetchone()
         if not row:
             flash("Produto não encontrado.", "error")
-            return redirect(url_for("admin"))
+            return redirect(url_for("main.admin"))
         promo = int(row["promo_price_cents"] or 0) if row["promo_price_cents"] is not None else 0
         image_url = row["image_url"] or ""
         try:
@@ -924,10 +4267,10 @@ def admin_edit(pid):
             promo_price_cents=(promo if promo > 0 else None),
         )
 
-    return render_template("edit.html", app_name=APP_NAME, p=p, categories=categories, is_admin=is_admin_logged_in())
+    return render_template("edit.html", app_name=current_store()["name"], p=p, categories=categories, is_admin=is_admin_logged_in())
 
 
-@app.post("/admin/edit/<int:pid>")
+@bp.post("/admin/edit/<int:pid>")
 @admin_required
 def admin_edit_post(pid):
     name = (request.form.get("name") or "").strip()
@@ -941,13 +4284,13 @@ def admin_edit_post(pid):
 
     if not name:
         flash("Nome é obrigatório.", "error")
-        return redirect(url_for("admin_edit", pid=pid))
+        return redirect(url_for("main.admin_edit", pid=pid))
 
     try:
         price_cents = parse_price_to_cents(price_raw)
     except Exception:
         flash("Preço inválido.", "error")
-        return redirect(url_for("admin_edit", pid=pid))
+        return redirect(url_for("main.admin_edit", pid=pid))
 
     promo_price_cents = None
     if is_promo and promo_price_raw:
@@ -955,7 +4298,7 @@ def admin_edit_post(pid):
             promo_price_cents = parse_price_to_cents(promo_price_raw)
         except Exception:
             flash("Preço promocional inválido.", "error")
-            return redirect(url_for("admin_edit", pid=pid))
+            return redirect(url_for("main.admin_edit", pid=pid))
 
     category_id = None
     try:
@@ -965,56 +4308,350 @@ def admin_edit_post(pid):
 
     db = get_db()
     if using_postgres():
-        db_execute(
+        cur = db_execute(
             db,
             """
             UPDATE products
             SET name=%s, description=%s, price_cents=%s, category_id=%s,
-                is_active=%s, is_promo=%s, promo_price_cents=%s
-            WHERE id=%s;
+                is_active=%s, is_promo=%s, promo_price_cents=%s,
+                deactivated_by_sync = CASE WHEN is_active = %s THEN deactivated_by_sync ELSE 0 END
+            WHERE id=%s AND store_id=%s;
             """,
-            (name, description, price_cents, category_id, is_active, is_promo, promo_price_cents, pid),
+            (name, description, price_cents, category_id, is_active, is_promo, promo_price_cents, is_active, pid, current_store_id()),
         )
     else:
-        db_execute(
+        cur = db_execute(
             db,
             """
             UPDATE products
             SET name=?, description=?, price_cents=?, category_id=?,
-                is_active=?, is_promo=?, promo_price_cents=?
-            WHERE id=?;
+                is_active=?, is_promo=?, promo_price_cents=?,
+                deactivated_by_sync = CASE WHEN is_active = ? THEN deactivated_by_sync ELSE 0 END
+            WHERE id=? AND store_id=?;
             """,
-            (name, description, price_cents, category_id, is_active, is_promo, promo_price_cents, pid),
+            (name, description, price_cents, category_id, is_active, is_promo, promo_price_cents, is_active, pid, current_store_id()),
         )
+    if cur.rowcount == 0:
+        # produto de outra loja (ou removido): nem o campo nem a imagem são gravados
+        db.rollback()
+        flash("Produto não encontrado.", "error")
+        return redirect(url_for("main.admin"))
     db_commit(db)
+    catalog_changed()
 
     file = request.files.get("image_file")
     if file and file.filename:
         try:
-            webp_bytes, mime, original_name = process_image_to_webp_bytes(file)
-            save_image_to_db(pid, webp_bytes, mime, original_name)
+            webp_bytes, mime, original_name, placeholder = process_image_to_webp_bytes(file)
+            save_image_to_db(pid, webp_bytes, mime, original_name, placeholder)
         except Exception as e:
             flash(f"Produto atualizado, mas falha ao processar imagem: {e}", "error")
-            return redirect(url_for("admin_edit", pid=pid))
+            return redirect(url_for("main.admin_edit", pid=pid))
 
     flash("Produto atualizado!", "success")
-    return redirect(url_for("admin"))
+    return redirect(url_for("main.admin"))
+
+
+# ---- EDIÇÃO EM LOTE ----
+BULK_UPDATE_SQL_PG = """
+    UPDATE products SET
+        price_cents = COALESCE(%s::integer, price_cents),
+        promo_price_cents = CASE WHEN %s = 1 THEN %s::integer ELSE promo_price_cents END,
+        is_promo = COALESCE(%s::integer, is_promo),
+        is_active = COALESCE(%s::integer, is_active),
+        deactivated_by_sync = CASE WHEN COALESCE(%s::integer, is_active) = is_active THEN deactivated_by_sync ELSE 0 END,
+        category_id = CASE WHEN %s = 1 THEN %s::integer ELSE category_id END
+    WHERE id = %s AND store_id = %s;
+"""
+
+BULK_UPDATE_SQL_SQLITE = """
+    UPDATE products SET
+        price_cents = COALESCE(?, price_cents),
+        promo_price_cents = CASE WHEN ? = 1 THEN ? ELSE promo_price_cents END,
+        is_promo = COALESCE(?, is_promo),
+        is_active = COALESCE(?, is_active),
+        deactivated_by_sync = CASE WHEN COALESCE(?, is_active) = is_active THEN deactivated_by_sync ELSE 0 END,
+        category_id = CASE WHEN ? = 1 THEN ? ELSE category_id END
+    WHERE id = ? AND store_id = ?;
+"""
+
+
+def parse_bulk_change(raw: dict) -> dict:
+    """
+    Converte uma alteração crua ({"price": "9,99", "is_promo": "on", ...}) no
+    formato aplicado por apply_bulk_changes. Campo ausente/vazio = não mexe.
+    Levanta ValueError com mensagem amigável se algo estiver inválido.
+    """
+
+    def flag(v):
+        if v is None or v == "":
+            return None
+        if isinstance(v, bool):
+            return 1 if v else 0
+        s = str(v).strip().lower()
+        if s in ("1", "on", "true", "sim"):
+            return 1
+        if s in ("0", "off", "false", "nao", "não"):
+            return 0
+        raise ValueError(f"Valor inválido: {v}")
+
+    change = dict(
+        price_cents=None,
+        set_promo_price=0,
+        promo_price_cents=None,
+        is_promo=flag(raw.get("is_promo")),
+        is_active=flag(raw.get("is_active")),
+        set_category=0,
+        category_id=None,
+    )
+
+    price_raw = str(raw.get("price") or "").strip()
+    if price_raw:
+        try:
+            change["price_cents"] = parse_price_to_cents(price_raw)
+        except Exception:
+            raise ValueError("Preço inválido.")
+
+    if "promo_price" in raw and raw.get("promo_price") is not None:
+        promo_raw = str(raw.get("promo_price")).strip()
+        if promo_raw:
+            try:
+                change["promo_price_cents"] = parse_price_to_cents(promo_raw)
+            except Exception:
+                raise ValueError("Preço promocional inválido.")
+            change["set_promo_price"] = 1
+        elif change["is_promo"] == 0:
+            # desligou a promoção sem informar preço: limpa o preço promocional
+            change["set_promo_price"] = 1
+
+    category_raw = str(raw.get("category_id") or "").strip()
+    if category_raw:
+        change["set_category"] = 1
+        if category_raw != "none":
+            try:
+                change["category_id"] = int(category_raw)
+            except Exception:
+                raise ValueError("Categoria inválida.")
+
+    return change
+
+
+def apply_bulk_changes(changes: dict) -> int:
+    """
+    Aplica {pid: change} com um único executemany e um único commit (só
+    nos produtos da loja atual).
+    """
+    if not changes:
+        return 0
+    store_id = current_store_id()
+
+    params = [
+        (
+            c["price_cents"],
+            c["set_promo_price"],
+            c["promo_price_cents"],
+            c["is_promo"],
+            c["is_active"],
+            c["is_active"],
+            c["set_category"],
+            c["category_id"],
+            pid,
+            store_id,
+        )
+        for pid, c in changes.items()
+    ]
+
+    db = get_db()
+    try:
+        if using_postgres():
+            with db.cursor() as cur:
+                cur.executemany(BULK_UPDATE_SQL_PG, params)
+        else:
+            db.executemany(BULK_UPDATE_SQL_SQLITE, params)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(params)
 
 
-@app.post("/admin/delete/<int:pid>")
+@bp.post("/admin/bulk")
+@admin_required
+def admin_bulk():
+    """
+    Edição em lote.
+    - Form (admin.html): ids marcados + um conjunto de alterações aplicado a todos.
+    - JSON: {"items": [{"id": 1, "price": "9,99", "is_promo": true, ...}, ...]}
+      com alterações diferentes por produto.
+    """
+    data = request.get_json(silent=True)
+    try:
+        if data is not None:
+            changes = {}
+            for it in data.get("items") or []:
+                changes[int(it["id"])] = parse_bulk_change(it)
+        else:
+            ids = {int(x) for x in request.form.getlist("ids") if str(x).strip().isdigit()}
+            change = parse_bulk_change(request.form)
+            changes = {pid: change for pid in ids}
+    except (ValueError, KeyError, TypeError) as e:
+        msg = str(e) if isinstance(e, ValueError) else "Dados inválidos."
+        if data is not None:
+            return jsonify({"error": msg}), 400
+        flash(msg, "error")
+        return redirect(url_for("main.admin"))
+
+    if not changes:
+        if data is not None:
+            return jsonify({"error": "Nenhum produto selecionado."}), 400
+        flash("Selecione ao menos um produto.", "error")
+        return redirect(url_for("main.admin"))
+
+    try:
+        updated = apply_bulk_changes(changes)
+    except Exception:
+        if data is not None:
+            return jsonify({"error": "Não foi possível aplicar as alterações."}), 500
+        flash("Não foi possível aplicar as alterações.", "error")
+        return redirect(url_for("main.admin"))
+
+    catalog_changed()
+    if data is not None:
+        return jsonify({"updated": updated})
+    flash(f"{updated} produto(s) atualizado(s)!", "success")
+    next_url = request.form.get("next") or ""
+    if not next_url.startswith("/admin"):
+        return redirect(url_for("main.admin"))
+    # full_path do form não tem o /s/<slug> da loja
+    return redirect(request.script_root + next_url)
+
+
+@bp.post("/admin/delete/<int:pid>")
 @admin_required
 def admin_delete(pid):
     db = get_db()
     try:
         if using_postgres():
-            db_execute(db, "DELETE FROM products WHERE id=%s;", (pid,))
+            db_execute(db, "DELETE FROM products WHERE id=%s AND store_id=%s;", (pid, current_store_id()))
         else:
-            db_execute(db, "DELETE FROM products WHERE id=?;", (pid,))
+            cur = db_execute(db, "DELETE FROM products WHERE id=? AND store_id=?;", (pid, current_store_id()))
+            if cur.rowcount:
+                db_execute(db, "DELETE FROM promotions WHERE product_id=?;", (pid,))
         db_commit(db)
+        catalog_changed()
         flash("Produto removido.", "success")
     except Exception:
         flash("Não foi possível remover.", "error")
-    return redirect(url_for("admin"))
+    return redirect(url_for("main.admin"))
+
+
+# =========================
+# APP
+# =========================
+def create_app(config=None) -> Flask:
+    """
+    Monta um app novo. `config` sobrescreve o que vem do ambiente, ex.:
+    create_app({"SQLITE_PATH": "/tmp/teste.sqlite3", "SERVER_TIMING": False}).
+    """
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY=os.getenv("FLASK_SECRET_KEY", "dev-secret-key-change-me"),
+        DATABASE_URL=DATABASE_URL,
+        SQLITE_PATH=DB_PATH,
+        SQLITE_PROFILE=SQLITE_PROFILE,
+        UPLOAD_FOLDER=UPLOAD_FOLDER,
+        MAX_CONTENT_LENGTH=12 * 1024 * 1024,  # 12MB
+        SERVER_TIMING=(os.getenv("SERVER_TIMING") or "1").strip() != "0",
+        SLOW_REQUEST_MS=float(os.getenv("SLOW_REQUEST_MS") or "500"),
+        # "" = pasta temporária padrão do Jinja; "0" desliga
+        JINJA_CACHE_DIR=(os.getenv("JINJA_CACHE_DIR") or "").strip(),
+        # caches por loja: os limites valem para cada filial
+        FRAGMENT_CACHE_MAX=FRAGMENT_CACHE_MAX,
+        # br 5 / gzip 6: bom tamanho sem pesar na CPU (assets estáticos usam o máximo no build)
+        COMPRESSION=(os.getenv("COMPRESSION") or "1").strip() != "0",
+        COMPRESSION_BR_QUALITY=int(os.getenv("COMPRESSION_BR_QUALITY") or "5"),
+        COMPRESSION_GZIP_LEVEL=int(os.getenv("COMPRESSION_GZIP_LEVEL") or "6"),
+        COMPRESSION_CACHE_BYTES=int(os.getenv("COMPRESSION_CACHE_BYTES") or str(8 * 1024 * 1024)),
+        RATE_LIMIT=(os.getenv("RATE_LIMIT") or "1").strip() != "0",
+        RATE_LIMIT_STORAGE=(os.getenv("RATE_LIMIT_STORAGE") or "").strip(),
+        # teto de requests simultâneas na vitrine por processo e loja; 0 = sem teto
+        INDEX_MAX_CONCURRENT=int(os.getenv("INDEX_MAX_CONCURRENT") or "0"),
+        # atrás de proxy (Railway: 1, o gunicorn.conf.py já põe) o IP do cliente vem do X-Forwarded-For
+        PROXY_HOPS=int(os.getenv("PROXY_HOPS") or "0"),
+        DATABASE_READ_URL=DATABASE_READ_URL,
+        REPLICA_MAX_LAG_SECONDS=REPLICA_MAX_LAG_SECONDS,
+        REPLICA_POOL_MAX=REPLICA_POOL_MAX,
+        # "0" desliga o snapshot (vitrine volta a ler do banco a cada request)
+        SNAPSHOT_DIR=SNAPSHOT_DIR,
+        SNAPSHOT_MAX_AGE_SECONDS=SNAPSHOT_MAX_AGE_SECONDS,
+        # "1" liga o agendador de manutenção (o gunicorn.conf.py liga); "" na janela = qualquer hora
+        MAINTENANCE=MAINTENANCE,
+        MAINTENANCE_WINDOW=MAINTENANCE_WINDOW,
+    )
+    if config:
+        app.config.update(config)
+    app.config["DATABASE_URL"] = normalize_database_url(app.config["DATABASE_URL"])
+    app.config["DATABASE_READ_URL"] = normalize_database_url(app.config["DATABASE_READ_URL"])
+
+    # bytecode dos templates em disco: worker novo não recompila nada
+    cache_dir = app.config["JINJA_CACHE_DIR"]
+    if cache_dir != "0":
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir or None)
+    if app.config["FRAGMENT_CACHE_MAX"] > 0:
+        app.extensions["fragment_cache"] = PerStore(lambda: FragmentCache(app.config["FRAGMENT_CACHE_MAX"]))
+    if app.config["COMPRESSION_CACHE_BYTES"] > 0:
+        app.extensions["compression_cache"] = PerStore(lambda: CompressionCache(app.config["COMPRESSION_CACHE_BYTES"]))
+    if app.config["RATE_LIMIT"]:
+        app.extensions["rate_limiter"] = RateLimiter(app.config["RATE_LIMIT_STORAGE"])
+    if app.config["SNAPSHOT_DIR"] != "0":
+        app.extensions["catalog_snapshot"] = CatalogSnapshot(app.config["SNAPSHOT_DIR"], app.config["SNAPSHOT_MAX_AGE_SECONDS"])
+    if app.config["DATABASE_READ_URL"]:
+        if app.config["DATABASE_URL"]:
+            app.extensions["read_replica"] = ReadReplica(
+                app.config["DATABASE_READ_URL"],
+                app.config["REPLICA_MAX_LAG_SECONDS"],
+                app.config["REPLICA_POOL_MAX"],
+            )
+        else:
+            app.logger.warning("DATABASE_READ_URL ignorado: réplica de leitura só vale com DATABASE_URL (Postgres)")
+    if app.config["MAINTENANCE"]:
+        app.extensions["maintenance"] = MaintenanceScheduler(app, MAINTENANCE_TICK_SECONDS)
+    app.wsgi_app = StorePathPrefix(app.wsgi_app)
+    if app.config["PROXY_HOPS"] > 0:
+        hops = app.config["PROXY_HOPS"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
+
+    app.register_blueprint(bp)
+    app.teardown_appcontext(close_db)
+    return app
+
+
+def warm_up(app: Flask):
+    """
+    Aquecimento antes do fork dos workers (gunicorn com PRELOAD_WARMUP=1):
+    schema e índices prontos, templates compilados e as páginas quentes do
+    banco no cache do SO. Os workers herdam tudo isso do processo master.
+    """
+    with app.app_context():
+        init_db()
+        _schema_ready.add(db_key())
+        fetch_products(active_only=True)
+        fetch_categories(active_only=True)
+        get_setting("whatsapp_number", STORE_WHATSAPP_NUMBER)
+        snapshot = app.extensions.get("catalog_snapshot")
+        if snapshot is not None:
+            snapshot.publish()
+        for name in app.jinja_env.list_templates():
+            if name.endswith(".html"):
+                app.jinja_env.get_template(name)
+    # conexão SQLite não pode ir para o filho no fork
+    close_sqlite_connection()
+
+
+# gunicorn app:app
+app = create_app()
 
 
 if __name__ == "__main__":
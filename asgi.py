@@ -0,0 +1,204 @@
+# asgi.py
+# -*- coding: utf-8 -*-
+"""
+Modo ASGI (opcional), para picos de acesso na vitrine:
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT --workers 2
+
+Com DATABASE_URL (Postgres), as rotas de leitura não prendem thread
+enquanto esperam o banco:
+- /img/<id>.webp é respondida inteira aqui, com o driver assíncrono;
+- só com o snapshot do catálogo desligado (SNAPSHOT_DIR=0): /, /checkout e
+  /api/whatsapp_link buscam os dados no pool assíncrono e entregam para a
+  view Flask de sempre (rodando em thread via a2wsgi) só montar a resposta.
+  Sessão, flash, rate limit, compressão e Server-Timing continuam os mesmos;
+  veja prefetched() no app.py.
+Na configuração padrão (snapshot ligado) essas três rotas já não vão ao banco
+(o catálogo e os settings vêm do snapshot, as lojas do cache do app): não há
+o que buscar e elas vão direto para o Flask. Ou seja, o ganho do modo ASGI
+fica no /img.
+O resto (admin, login, ...) roda inteiro no Flask. Sem Postgres (ou sem
+psycopg_pool) tudo vai direto para o Flask.
+
+O que o caminho assíncrono NÃO faz: não usa a réplica de leitura
+(DATABASE_READ_URL; o /img e o prefetch leem sempre do primário) nem o
+Server-Timing/log de request lenta do /img. As métricas do Prometheus do
+/img (latência, status, destino da leitura) são gravadas aqui, com os mesmos
+nomes do caminho Flask.
+
+Pool: ASYNC_POOL_MIN / ASYNC_POOL_MAX conexões por processo.
+Threads para o Flask: ASGI_WSGI_THREADS por processo.
+"""
+
+import asyncio
+import os
+import re
+import time
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+
+import app as store
+
+# Pool assíncrono do psycopg (opcional)
+try:
+    from psycopg_pool import AsyncConnectionPool
+except Exception:
+    AsyncConnectionPool = None
+
+ASYNC_POOL_MIN = int(os.getenv("ASYNC_POOL_MIN") or "2")
+ASYNC_POOL_MAX = int(os.getenv("ASYNC_POOL_MAX") or "20")
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS") or "16")
+
+IMAGE_PATH_RE = re.compile(r"^/img/([0-9]+)\.webp$")
+SETTING_ROUTES = {("GET", "/checkout"), ("POST", "/api/whatsapp_link")}
+
+
+class AsyncStore:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS)
+        self.pool = None
+        self.db_key = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] != "http" or self.pool is None:
+            return await self.wsgi(scope, receive, send)
+
+        method, path = scope["method"], scope["path"]
+        m = IMAGE_PATH_RE.match(path)
+        if m and method in ("GET", "HEAD"):
+            versioned = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("v")
+            return await self.product_image(int(m.group(1)), send, method, versioned=bool(versioned))
+
+        if "catalog_snapshot" in self.flask_app.extensions:
+            return await self.wsgi(scope, receive, send)
+        # /s/<slug>/... não passa por aqui: só a loja do Host (ou a padrão)
+        if method == "GET" and path == "/":
+            store_id = await self.store_id(scope)
+            data = dict(store_id=store_id, products=await self.fetch_products(store_id))
+        elif (method, path) in SETTING_ROUTES:
+            store_id = await self.store_id(scope)
+            whatsapp = await self.get_setting(store_id, "whatsapp_number", store.STORE_WHATSAPP_NUMBER)
+            data = dict(store_id=store_id, whatsapp_number=whatsapp)
+        else:
+            return await self.wsgi(scope, receive, send)
+        return await self.wsgi(dict(scope, **{"nc.prefetched": data}), receive, send)
+
+    # ---- ciclo de vida ----
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.pool is not None:
+                    await self.pool.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def startup(self):
+        # schema/índices prontos antes da primeira query assíncrona
+        await asyncio.to_thread(store.warm_up, self.flask_app)
+        url = self.flask_app.config["DATABASE_URL"]
+        if not url:
+            return
+        if AsyncConnectionPool is None:
+            self.flask_app.logger.warning("psycopg_pool não instalado: modo ASGI sem acesso assíncrono ao banco")
+            return
+        with self.flask_app.app_context():
+            self.db_key = store.db_key()
+        self.pool = AsyncConnectionPool(url, min_size=ASYNC_POOL_MIN, max_size=ASYNC_POOL_MAX, open=False)
+        await self.pool.open()
+
+    # ---- banco ----
+    async def store_id(self, scope) -> int:
+        # o Flask confere: se resolver outra loja (ex.: X-Forwarded-Host), busca de novo
+        host = dict(scope.get("headers") or []).get(b"host", b"").decode("latin-1")
+        # o mesmo cache de lojas do app (store_directory); vencido, recarrega numa thread
+        directory = self.flask_app.extensions.get("store_directories", {}).get(self.db_key)
+        if directory is None or time.time() - directory.loaded_at > store.STORES_RELOAD_SECONDS:
+            directory = await asyncio.to_thread(self.load_store_directory)
+        return directory.resolve(host)["id"]
+
+    def load_store_directory(self):
+        with self.flask_app.app_context():
+            return store.store_directory()
+
+    async def fetch_products(self, store_id: int) -> list:
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(store.products_query(True, "%s"), (store_id,))
+            rows = await cur.fetchall()
+            now = time.time()
+            cur = await conn.execute(store.promotions_query("%s"), (store_id, int(now)))
+            schedule = store.PromotionSchedule(await cur.fetchall(), now)
+        return store.apply_promotions([store.product_from_row(r) for r in rows], schedule)
+
+    async def get_setting(self, store_id: int, key: str, default: str = "") -> str:
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(
+                """
+                SELECT COALESCE(
+                    (SELECT value FROM store_settings WHERE store_id = %s AND key = %s),
+                    (SELECT value FROM settings WHERE key = %s)
+                );
+                """,
+                (store_id, key, key),
+            )
+            row = await cur.fetchone()
+        if not row or row[0] is None:
+            return default
+        return str(row[0])
+
+    async def product_image(self, pid: int, send, method: str = "GET", versioned: bool = False):
+        metrics = store.metrics_enabled()
+        if metrics:
+            store.HTTP_IN_FLIGHT.inc()
+            store.DB_READ_ROUTING.labels("primary", "asgi").inc()
+        started = time.perf_counter()
+        status = 500
+        try:
+            sql = "SELECT image_blob, image_mime FROM products WHERE id=%s;"
+            async with self.pool.connection() as conn:
+                cur = await conn.execute(sql, (pid,))
+                row = await cur.fetchone()
+            store.observe_db_query(sql, time.perf_counter() - started)
+            if not row or row[0] is None:
+                status = 404
+                return await respond(send, 404, b"Not Found", "text/plain; charset=utf-8")
+            # mesma regra da view product_image: com ?v= a URL é imutável
+            cache_control = store.ASSET_CACHE_CONTROL if versioned else "public, max-age=86400"
+            headers = [(b"cache-control", cache_control.encode("latin-1"))]
+            status = 200
+            await respond(send, 200, bytes(row[0]), row[1] or "image/webp", headers, method == "HEAD")
+        finally:
+            if metrics:
+                # mesmos rótulos do caminho Flask (endpoint sem o "main.")
+                store.HTTP_LATENCY.labels("product_image", method).observe(time.perf_counter() - started)
+                store.HTTP_REQUESTS.labels("product_image", method, str(status)).inc()
+                store.HTTP_IN_FLIGHT.dec()
+
+
+async def respond(send, status: int, body: bytes, content_type: str, headers=(), head: bool = False):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type.encode("latin-1")),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                *headers,
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": b"" if head else body})
+
+
+app = AsyncStore(store.app)
@@ -0,0 +1,133 @@
+# backup_catalogo.py
+# -*- coding: utf-8 -*-
+"""
+Backup do catálogo (produtos, categorias, lojas, promoções, settings e todas
+as imagens) num zip ou tar, e a restauração a partir dele.
+
+Uso:
+    python backup_catalogo.py export [arquivo.zip|arquivo.tar]
+    python backup_catalogo.py restore arquivo.zip [--replace] [--batch 500]
+
+O export lê o banco por cursor e grava cada imagem assim que ela chega, então
+a memória fica constante mesmo com gigas de imagens; o arquivo é escrito como
+.part e só ganha o nome final no fim. O mesmo arquivo sai no admin em
+/admin/backup.zip (ou .tar).
+
+O restore primeiro lê o arquivo inteiro conferindo tudo (sem gravar nada) e
+depois grava numa transação só: arquivo cortado ou estragado, ou erro no
+meio, deixa o catálogo atual como estava. Em banco com produtos só roda com
+--replace, que troca o catálogo atual (todas as lojas) pelo do backup. Serve também para levar o catálogo do SQLite para o Postgres (e vice-
+versa): rode com DATABASE_URL apontando para o destino.
+
+No fim mostra o tempo e o pico de memória (RSS) do processo.
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+try:
+    import resource  # pico de RSS (não existe no Windows)
+except ImportError:
+    resource = None
+
+import app as store
+
+
+def peak_rss_mb():
+    # VmHWM (Linux) é só deste programa; o ru_maxrss herda o pico do processo
+    # que o lançou (exec não zera)
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux em KB, macOS em bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def export(app, path: str, fmt: str) -> dict:
+    stats = {}
+    tmp = path + ".part"
+    with app.app_context():
+        with open(tmp, "wb") as f:
+            for chunk in store.iter_catalog_backup(fmt, stats):
+                f.write(chunk)
+    os.replace(tmp, path)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backup/restauração do catálogo com imagens.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="gera o backup")
+    p_export.add_argument("arquivo", nargs="?", default=None, help="destino (padrão: catalogo-AAAAMMDD-HHMM.zip)")
+    p_export.add_argument("--format", choices=sorted(store.BACKUP_MIMETYPES), default=None,
+                          help="zip ou tar (padrão: pela extensão do arquivo, ou zip)")
+
+    p_restore = sub.add_parser("restore", help="carrega um backup no banco")
+    p_restore.add_argument("arquivo")
+    p_restore.add_argument("--replace", action="store_true", help="troca o catálogo atual pelo do backup")
+    p_restore.add_argument("--batch", type=int, default=500, help="linhas por lote (a restauração é uma transação só)")
+    args = parser.parse_args(argv)
+
+    app = store.create_app()
+    db_label = "Postgres (DATABASE_URL)" if store.using_postgres() else store.DB_PATH
+    started = time.perf_counter()
+
+    if args.command == "export":
+        fmt = args.format
+        path = args.arquivo
+        if fmt is None:
+            ext = os.path.splitext(path or "")[1].lstrip(".").lower()
+            fmt = ext if ext in store.BACKUP_MIMETYPES else "zip"
+        if path is None:
+            path = f"catalogo-{datetime.now().strftime('%Y%m%d-%H%M')}.{fmt}"
+        try:
+            stats = export(app, path, fmt)
+        except Exception:
+            try:
+                os.remove(path + ".part")
+            except OSError:
+                pass
+            raise
+        print(
+            f"OK! {stats['products']} produtos, {stats['categories']} categorias, {stats['stores']} lojas, "
+            f"{stats['promotions']} promoções, {stats['images']} imagens "
+            f"({stats['image_bytes'] / 1048576:.1f} MB)"
+        )
+        print(f"Arquivo: {path} ({stats['bytes'] / 1048576:.1f} MB)")
+    else:
+        if not os.path.exists(args.arquivo):
+            print(f"Arquivo não encontrado: {args.arquivo}", file=sys.stderr)
+            return 1
+        try:
+            with app.app_context():
+                store.init_db()
+                stats = store.restore_catalog_backup(args.arquivo, replace=args.replace, batch=args.batch)
+        except store.BackupError as e:
+            print(str(e), file=sys.stderr)
+            return 1
+        print(
+            f"OK! Restaurados {stats['products']} produtos, {stats['categories']} categorias, {stats['stores']} lojas, "
+            f"{stats['promotions']} promoções, {stats['images']} imagens"
+        )
+        print(f"Arquivo: {args.arquivo}")
+
+    elapsed = time.perf_counter() - started
+    rss = peak_rss_mb()
+    print(f"Banco usado: {db_label}")
+    print(f"Tempo: {elapsed:.1f}s" + (f", pico de memória: {rss:.0f} MB" if rss is not None else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
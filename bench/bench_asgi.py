@@ -0,0 +1,124 @@
+# bench/bench_asgi.py
+# -*- coding: utf-8 -*-
+"""
+WSGI (gunicorn gthread) x ASGI (uvicorn asgi:app) com muitas conexões
+simultâneas em / e /img/<id>.webp.
+
+O ganho do modo ASGI vem de não prender uma thread por request enquanto o
+Postgres responde, então o cenário que interessa é com BENCH_DATABASE_URL.
+Sem ele roda em SQLite só como verificação: ali o asgi.py entrega tudo ao
+Flask e os dois servidores devem ficar parecidos.
+
+Uso:
+    BENCH_DATABASE_URL=postgresql://... python bench/bench_asgi.py \\
+        [--products 2000] [--connections 50,200,500] [--seconds 5] \\
+        [--workers 2] [--threads 8]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store  # noqa: E402
+from bench.loadtest import free_port, git_revision, peak_rss_kb, run_route, start_server  # noqa: E402
+from bench.seed import reset_postgres, seed_catalog  # noqa: E402
+
+SERVERS = ("gunicorn", "uvicorn")
+
+
+def routes(products: int) -> list:
+    return [
+        ("index", lambda rnd: ("GET", "/", None, {})),
+        ("product_image", lambda rnd: ("GET", f"/img/{rnd.randint(1, products)}.webp", None, {})),
+    ]
+
+
+def run_server(kind: str, env: dict, args) -> dict:
+    port = free_port()
+    proc = start_server(kind, port, env, args.workers, args.threads)
+    try:
+        result = {}
+        for name, make_request in routes(args.products):
+            run_route(port, make_request, 1, 1.0)  # aquecimento
+            result[name] = {}
+            for conns in args.connections:
+                stats = run_route(port, make_request, conns, args.seconds)
+                result[name][str(conns)] = stats
+                print(f"  {kind:8s} {name:14s} conns={conns:4d} {stats}", file=sys.stderr)
+        result["server_peak_rss_kb"] = peak_rss_kb(proc.pid)
+        return result
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WSGI x ASGI com muitas conexões simultâneas.")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--connections", default="50,200,500")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=2, help="processos por servidor")
+    parser.add_argument("--threads", type=int, default=8, help="threads por processo (gthread / a2wsgi)")
+    parser.add_argument("--output", default="", help="grava o JSON neste arquivo (além do stdout)")
+    args = parser.parse_args(argv)
+    args.connections = [int(c) for c in args.connections.split(",") if c.strip()]
+
+    env = dict(os.environ)
+    env.pop("DATABASE_URL", None)
+    env["SERVER_TIMING"] = "0"
+    env["RATE_LIMIT"] = "0"  # a carga vem toda do mesmo IP
+    tmp_path = None
+
+    if os.getenv("BENCH_DATABASE_URL"):
+        backend = "postgres"
+        env["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"]
+        app = store.create_app({"DATABASE_URL": env["DATABASE_URL"]})
+        reset_postgres(app)
+    else:
+        backend = "sqlite"
+        fd, tmp_path = tempfile.mkstemp(prefix="asgi_", suffix=".sqlite3")
+        os.close(fd)
+        env["SQLITE_PATH"] = tmp_path
+        app = store.create_app({"DATABASE_URL": "", "SQLITE_PATH": tmp_path})
+        print("BENCH_DATABASE_URL não definido: rodando em SQLite (asgi.py delega tudo ao Flask)", file=sys.stderr)
+
+    try:
+        seed_catalog(app, args.products, with_images=True)
+        report = dict(
+            git=git_revision(),
+            backend=backend,
+            params=dict(
+                products=args.products,
+                connections=args.connections,
+                seconds=args.seconds,
+                workers=args.workers,
+                threads=args.threads,
+            ),
+            servers={kind: run_server(kind, env, args) for kind in SERVERS},
+        )
+    finally:
+        if tmp_path:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(tmp_path + suffix)
+                except OSError:
+                    pass
+
+    out = json.dumps(report, indent=2)
+    print(out)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(out + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+# bench/bench_backup.py
+# -*- coding: utf-8 -*-
+"""
+Backup do catálogo (backup_catalogo.py): tempo e pico de memória.
+
+Monta num diretório temporário um catálogo com `--products` produtos, cada
+um com uma imagem própria de `--image-kb` KB (bytes aleatórios: o export não
+olha o conteúdo), e roda o CLI em subprocessos:
+  - export em zip e em tar: tempo, tamanho do arquivo, pico de RSS;
+  - restore do zip num banco vazio: tempo, pico de RSS, e se as linhas e
+    as imagens voltaram iguais.
+O pico de RSS não deve mudar com --image-kb (memória constante).
+
+Uso:
+    python bench/bench_backup.py [--products 5000] [--image-kb 420]   (~2 GB de imagens)
+    python bench/bench_backup.py --products 5000 --image-kb 40        (rodada rápida)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app as store  # noqa: E402
+from bench.seed import seed_catalog  # noqa: E402
+
+
+def run_cli(args, sqlite_path: str, snap_dir: str) -> dict:
+    """
+    Roda backup_catalogo.py num processo novo; devolve o tempo e o pico de
+    RSS que o próprio CLI mede e imprime.
+    """
+    env = dict(os.environ, DATABASE_URL="", SQLITE_PATH=sqlite_path, SNAPSHOT_DIR=snap_dir)
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "backup_catalogo.py"), *args],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"backup_catalogo.py {' '.join(args)} falhou:\n{proc.stdout}{proc.stderr}")
+    rss_mb = None
+    for line in proc.stdout.splitlines():
+        if "pico de memória:" in line:
+            rss_mb = float(line.rsplit(":", 1)[1].split()[0])
+    return dict(seconds=round(elapsed, 2), peak_rss_mb=rss_mb)
+
+
+def catalog_digest(path: str) -> str:
+    h = hashlib.sha256()
+    conn = sqlite3.connect(path)
+    try:
+        for table, columns, order in store.BACKUP_TABLES:
+            for row in conn.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY {order};"):
+                h.update(repr(tuple(row)).encode("utf-8"))
+        for row in conn.execute("SELECT id, image_blob FROM products ORDER BY id;"):
+            h.update(repr(row[0]).encode("utf-8"))
+            h.update(row[1] or b"")
+    finally:
+        conn.close()
+    return h.hexdigest()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede export/restore do catálogo com imagens.")
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--image-kb", type=int, default=420, help="tamanho de cada imagem (KB)")
+    parser.add_argument("--output", default="", help="grava o JSON neste arquivo (além do stdout)")
+    args = parser.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="backup_bench_")
+    try:
+        src = os.path.join(work, "src.sqlite3")
+        dst = os.path.join(work, "dst.sqlite3")
+        snap_dir = os.path.join(work, "snap")
+
+        app = store.create_app({"DATABASE_URL": "", "SQLITE_PATH": src, "SNAPSHOT_DIR": snap_dir})
+        seed_catalog(app, args.products)
+        with app.app_context():
+            db = store.get_db()
+            # uma imagem diferente por produto (sem dedupe em lugar nenhum)
+            db.execute("UPDATE products SET image_blob = randomblob(?), image_mime = 'image/webp';", (args.image_kb * 1024,))
+            db.commit()
+            db.execute("VACUUM;")
+
+        result = dict(
+            products=args.products,
+            image_mb=round(args.products * args.image_kb / 1024.0, 1),
+            database_mb=round(os.path.getsize(src) / 1048576, 1),
+        )
+        for fmt in ("zip", "tar"):
+            archive = os.path.join(work, f"catalogo.{fmt}")
+            stats = run_cli(["export", archive], src, snap_dir)
+            stats["archive_mb"] = round(os.path.getsize(archive) / 1048576, 1)
+            stats["mb_per_s"] = round(stats["archive_mb"] / max(stats["seconds"], 1e-6), 1)
+            result[f"export_{fmt}"] = stats
+            if fmt == "tar":
+                os.remove(archive)  # o disco do bench: só o zip segue para o restore
+
+        result["restore_zip"] = run_cli(["restore", os.path.join(work, "catalogo.zip")], dst, os.path.join(work, "snap2"))
+        result["roundtrip_equal"] = catalog_digest(src) == catalog_digest(dst)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    out = json.dumps(result, indent=2)
+    print(out)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out + "\n")
+    return 0 if result.get("roundtrip_equal") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
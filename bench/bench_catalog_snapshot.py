@@ -0,0 +1,152 @@
+# bench/bench_catalog_snapshot.py
+# -*- coding: utf-8 -*-
+"""
+Snapshot do catálogo (arquivo via mmap) x leitura do banco.
+
+No processo:
+  - produtos da vitrine: snapshot.products() x fetch_products()
+  - um produto por id (checkout): snapshot.product() x SELECT
+  - tempo de publicação e tamanho do arquivo
+Com gunicorn (--workers processos):
+  - vazão de GET / com e sem snapshot
+  - edição no admin: tempo da resposta (a publicação roda numa thread),
+    quanto demora até a vitrine mostrar o preço novo e, daí em diante,
+    quantas GET / (caindo em qualquer worker) mostram
+
+Uso:
+    python bench/bench_catalog_snapshot.py [--products 5000] [--workers 4]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store  # noqa: E402
+from bench.loadtest import free_port, login_cookie, run_route, start_server  # noqa: E402
+from bench.seed import seed_catalog  # noqa: E402
+
+
+def median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return round(statistics.median(samples), 3)
+
+
+def in_process(app, repeat: int) -> dict:
+    snapshot = app.extensions["catalog_snapshot"]
+    with app.test_request_context("/"):
+        view = snapshot.current()
+        ids = [p["id"] for p in view.products()][:: max(1, view.count // 200)]
+        db = store.get_db()
+        sql = "SELECT id, name, price_cents, promo_price_cents, is_promo FROM products WHERE id=%s;"
+        if not store.using_postgres():
+            sql = sql.replace("%s", "?")
+        return dict(
+            products=view.count,
+            file_bytes=os.path.getsize(snapshot.path()),
+            publish_ms=median_ms(snapshot.publish, max(3, repeat // 4)),
+            catalog_ms=dict(
+                snapshot=median_ms(lambda: snapshot.current().products(), repeat),
+                db=median_ms(lambda: store.fetch_products(active_only=True), repeat),
+            ),
+            lookup_200_ids_ms=dict(
+                snapshot=median_ms(lambda: [view.product(i) for i in ids], repeat),
+                db=median_ms(lambda: [store.db_fetchone(store.db_execute(db, sql, (i,))) for i in ids], repeat),
+            ),
+        )
+
+
+def get(port: int, path: str, headers=None, method="GET", body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    conn.request(method, path, body=body, headers=headers or {})
+    resp = conn.getresponse()
+    data = resp.read()
+    conn.close()
+    return resp.status, data
+
+
+def across_workers(env: dict, args, snapshot_on: bool) -> dict:
+    env = dict(env, SNAPSHOT_DIR=(tempfile.mkdtemp(prefix="snap_") if snapshot_on else "0"))
+    port = free_port()
+    proc = start_server("gunicorn", port, env, args.workers, args.threads)
+    try:
+        cookie = login_cookie(port)
+        run_route(port, lambda rnd: ("GET", "/", None, {}), args.workers * 2, 2.0)  # aquece todos os workers
+        stats = run_route(port, lambda rnd: ("GET", "/", None, {}), args.workers * 2, args.seconds)
+
+        # edição no admin -> a vitrine mostra o preço novo assim que a publicação termina
+        app = store.create_app({"DATABASE_URL": "", "SQLITE_PATH": env["SQLITE_PATH"]})
+        with app.app_context():
+            pid = store.fetch_products(active_only=True)[0]["id"]
+        price = "%d,%02d" % (divmod(int(time.time()) % 100000 + 1000, 100))
+        body = json.dumps({"items": [{"id": pid, "price": price}]})
+        started = time.perf_counter()
+        get(port, "/admin/bulk", {"Cookie": cookie, "Content-Type": "application/json"}, "POST", body)
+        edit_ms = round((time.perf_counter() - started) * 1000.0, 1)
+        marker = ("R$ " + price).encode()
+        while marker not in get(port, "/")[1] and time.perf_counter() - started < 30:
+            time.sleep(0.01)
+        visible_ms = round((time.perf_counter() - started) * 1000.0, 1)
+        fresh = sum(marker in get(port, "/")[1] for _ in range(args.workers * 10))
+
+        return dict(
+            index=stats,
+            edit_ms=edit_ms,
+            visible_after_edit_ms=visible_ms,
+            fresh_after_edit=f"{fresh}/{args.workers * 10}",
+        )
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshot do catálogo x banco.")
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    fd, path = tempfile.mkstemp(prefix="snapshot_", suffix=".sqlite3")
+    os.close(fd)
+    snap_dir = tempfile.mkdtemp(prefix="snap_")
+    try:
+        app = store.create_app({"DATABASE_URL": "", "SQLITE_PATH": path, "SNAPSHOT_DIR": snap_dir})
+        seed_catalog(app, args.products)
+        report = dict(params=vars(args), in_process=in_process(app, args.repeat))
+
+        env = dict(os.environ)
+        env.pop("DATABASE_URL", None)
+        env.update(SQLITE_PATH=path, SERVER_TIMING="0", RATE_LIMIT="0")
+        report["gunicorn"] = {
+            "snapshot": across_workers(env, args, True),
+            "db": across_workers(env, args, False),
+        }
+        print(json.dumps(report, indent=2))
+        return 0
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# bench/bench_render.py
+# -*- coding: utf-8 -*-
+"""
+Custo de renderização da vitrine (/) e do admin com um catálogo grande.
+
+Mede, pelo Server-Timing (tpl = tempo de template, total = request inteira):
+  - cold: primeira renderização (compila templates, cache de fragmentos vazio)
+  - warm: renderizações seguintes (mediana)
+  - one_change: depois de mudar o preço de UM produto (só o card dele é refeito)
+e o tempo para compilar todos os templates sem e com o cache de bytecode.
+
+Uso:
+    python bench/bench_render.py [--products 5000] [--repeat 10]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store  # noqa: E402
+from bench.seed import seed_catalog  # noqa: E402
+
+TIMING_RE = re.compile(r"(\w+);dur=([0-9.]+)")
+
+
+def server_timing(resp) -> dict:
+    return {k: float(v) for k, v in TIMING_RE.findall(resp.headers.get("Server-Timing", ""))}
+
+
+def measure(client, path: str, repeat: int) -> dict:
+    cold = server_timing(client.get(path))
+    warm = [server_timing(client.get(path)) for _ in range(repeat)]
+    return dict(
+        cold_tpl_ms=round(cold["tpl"], 1),
+        cold_total_ms=round(cold["total"], 1),
+        warm_tpl_ms=round(statistics.median(t["tpl"] for t in warm), 1),
+        warm_total_ms=round(statistics.median(t["total"] for t in warm), 1),
+    )
+
+
+def one_change(app, client, path: str) -> dict:
+    with app.app_context():
+        db = store.get_db()
+        store.db_execute(db, "UPDATE products SET price_cents = price_cents + 1 WHERE id = 1;")
+        db.commit()
+        # como uma escrita do admin: republica o snapshot do catálogo
+        snapshot = app.extensions.get("catalog_snapshot")
+        if snapshot is not None:
+            snapshot.publish()
+    t = server_timing(client.get(path))
+    return dict(tpl_ms=round(t["tpl"], 1), total_ms=round(t["total"], 1))
+
+
+def compile_templates(app) -> float:
+    env = app.jinja_env
+    names = [n for n in env.list_templates() if n.endswith(".html")]
+    started = time.perf_counter()
+    for name in names:
+        env.get_template(name)
+    return round((time.perf_counter() - started) * 1000.0, 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tempo de renderização com catálogo grande.")
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    fd, path = tempfile.mkstemp(prefix="render_", suffix=".sqlite3")
+    os.close(fd)
+    cache_dir = tempfile.mkdtemp(prefix="render_jinja_")
+    try:
+        app = store.create_app({"DATABASE_URL": "", "SQLITE_PATH": path, "SERVER_TIMING": True, "SLOW_REQUEST_MS": 1e9})
+        seed_catalog(app, args.products)
+
+        client = app.test_client()
+        client.post("/login", data=dict(username=store.ADMIN_USER, password=store.ADMIN_PASSWORD))
+
+        result = dict(params=vars(args))
+        result["index"] = measure(client, "/", args.repeat)
+        result["index"]["one_change"] = one_change(app, client, "/")
+        result["admin"] = measure(client, "/admin", args.repeat)
+        result["admin"]["one_change"] = one_change(app, client, "/admin")
+        cache = app.extensions.get("fragment_cache")
+        if cache is not None:
+            cache = cache.get(store.DEFAULT_STORE_ID)
+            result["fragment_cache"] = dict(entries=len(cache), hits=cache.hits, misses=cache.misses)
+
+        # compilação: app novo sem cache x app novo lendo o bytecode gravado por outro
+        cfg = {"DATABASE_URL": "", "SQLITE_PATH": path}
+        result["compile_ms"] = dict(
+            no_bytecode_cache=compile_templates(store.create_app(dict(cfg, JINJA_CACHE_DIR="0"))),
+            bytecode_cache_cold=compile_templates(store.create_app(dict(cfg, JINJA_CACHE_DIR=cache_dir))),
+            bytecode_cache_warm=compile_templates(store.create_app(dict(cfg, JINJA_CACHE_DIR=cache_dir))),
+        )
+        print(json.dumps(result, indent=2))
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+        for f in os.listdir(cache_dir):
+            os.remove(os.path.join(cache_dir, f))
+        os.rmdir(cache_dir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# bench/bench_sqlite_concurrency.py
+# -*- coding: utf-8 -*-
+"""
+Leitura/escrita concorrente no SQLite: perfil "default" (conexão por request,
+journal padrão) x "production" (WAL + pragmas + conexão por thread).
+
+Uso:
+    python bench/bench_sqlite_concurrency.py [--products 2000] [--readers 8] [--writers 2] [--seconds 5]
+
+Cada operação roda dentro de um app_context, como um request real:
+leitor = fetch_products(active_only=True); escritor = UPDATE de preço + commit.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store  # noqa: E402
+
+
+def seed(app, products: int):
+    with app.app_context():
+        store.init_db()
+        db = store.get_db()
+        cats = [r["id"] for r in db.execute("SELECT id FROM categories;").fetchall()]
+        db.executemany(
+            "INSERT INTO products (name, description, price_cents, image_url, category_id, is_active, is_promo) "
+            "VALUES (?, '', ?, '', ?, 1, 0);",
+            [(f"PRODUTO {i:06d}", random.randint(100, 10000), random.choice(cats)) for i in range(products)],
+        )
+        db.commit()
+
+
+def run_profile(profile: str, products: int, readers: int, writers: int, seconds: float) -> dict:
+    fd, path = tempfile.mkstemp(prefix=f"bench_{profile}_", suffix=".sqlite3")
+    os.close(fd)
+    app = store.create_app({"DATABASE_URL": "", "SQLITE_PATH": path, "SQLITE_PROFILE": profile})
+    try:
+        seed(app, products)
+
+        stop = threading.Event()
+        counts = {"reads": 0, "writes": 0, "errors": 0}
+        lock = threading.Lock()
+
+        def reader():
+            n = 0
+            while not stop.is_set():
+                try:
+                    with app.app_context():
+                        store.fetch_products(active_only=True)
+                    n += 1
+                except Exception:
+                    with lock:
+                        counts["errors"] += 1
+            with lock:
+                counts["reads"] += n
+
+        def writer():
+            n = 0
+            while not stop.is_set():
+                try:
+                    with app.app_context():
+                        db = store.get_db()
+                        db.execute(
+                            "UPDATE products SET price_cents=? WHERE id=?;",
+                            (random.randint(100, 10000), random.randint(1, products)),
+                        )
+                        db.commit()
+                    n += 1
+                except Exception:
+                    with lock:
+                        counts["errors"] += 1
+            with lock:
+                counts["writes"] += n
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        threads += [threading.Thread(target=writer) for _ in range(writers)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        return dict(
+            profile=profile,
+            reads_per_s=round(counts["reads"] / seconds, 1),
+            writes_per_s=round(counts["writes"] / seconds, 1),
+            errors=counts["errors"],
+        )
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    results = [
+        run_profile(profile, args.products, args.readers, args.writers, args.seconds)
+        for profile in ("default", "production")
+    ]
+    print(json.dumps(dict(params=vars(args), results=results), indent=2))
+
+
+if __name__ == "__main__":
+    main()
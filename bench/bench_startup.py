@@ -0,0 +1,124 @@
+# bench/bench_startup.py
+# -*- coding: utf-8 -*-
+"""
+Tempo de partida a frio: processo Python novo -> import do app -> primeira
+resposta de GET / (test client, sem servidor). Cada rodada é um processo
+separado, então nada fica em cache dentro do Python entre uma e outra.
+
+Uso:
+    python bench/bench_startup.py [--runs 10] [--products 500] [--warm-up]
+
+--warm-up chama warm_up(app) antes da primeira request (o que o gunicorn faz
+no master com PRELOAD_WARMUP=1) e mede as duas partes separadas.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HEAVY_MODULES = ("PIL.Image", "psycopg", "prometheus_client")
+
+
+def child(warm: bool):
+    t0 = time.perf_counter()
+    import app as store
+
+    t_import = time.perf_counter()
+    if warm:
+        store.warm_up(store.app)
+    t_warm = time.perf_counter()
+    resp = store.app.test_client().get("/")
+    t_first = time.perf_counter()
+
+    print(
+        json.dumps(
+            dict(
+                status=resp.status_code,
+                import_ms=(t_import - t0) * 1000.0,
+                warm_up_ms=(t_warm - t_import) * 1000.0,
+                first_response_ms=(t_first - t_warm) * 1000.0,
+                loaded=[m for m in HEAVY_MODULES if m in sys.modules],
+            )
+        )
+    )
+
+
+def summarize(values: list) -> dict:
+    values = sorted(values)
+    return dict(
+        median=round(statistics.median(values), 1),
+        min=round(values[0], 1),
+        max=round(values[-1], 1),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tempo do import do app até a primeira resposta.")
+    sub = parser.add_subparsers(dest="cmd")
+    run = sub.add_parser("child", help="(interno) uma rodada")
+    run.add_argument("--warm-up", action="store_true")
+
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--warm-up", action="store_true", help="roda warm_up(app) antes da primeira request")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "child":
+        child(args.warm_up)
+        return 0
+
+    import app as store
+    from bench.seed import seed_catalog
+
+    fd, path = tempfile.mkstemp(prefix="startup_", suffix=".sqlite3")
+    os.close(fd)
+    try:
+        seed_catalog(store.create_app({"DATABASE_URL": "", "SQLITE_PATH": path}), args.products)
+
+        env = dict(os.environ)
+        env.pop("DATABASE_URL", None)
+        env["SQLITE_PATH"] = path
+        env["SERVER_TIMING"] = "0"
+        cmd = [sys.executable, os.path.abspath(__file__), "child"] + (["--warm-up"] if args.warm_up else [])
+
+        runs = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            out = subprocess.check_output(cmd, cwd=ROOT, env=env)
+            total_ms = (time.perf_counter() - started) * 1000.0
+            result = json.loads(out.decode().strip().splitlines()[-1])
+            if result["status"] != 200:
+                raise RuntimeError(f"GET / respondeu {result['status']}")
+            result["process_ms"] = total_ms
+            runs.append(result)
+
+        report = dict(
+            params=dict(runs=args.runs, products=args.products, warm_up=args.warm_up),
+            python=sys.version.split()[0],
+            # process_ms inclui subir o interpretador e encerrar o processo
+            process_ms=summarize([r["process_ms"] for r in runs]),
+            import_ms=summarize([r["import_ms"] for r in runs]),
+            warm_up_ms=summarize([r["warm_up_ms"] for r in runs]),
+            first_response_ms=summarize([r["first_response_ms"] for r in runs]),
+            heavy_modules_loaded=runs[-1]["loaded"],
+        )
+        print(json.dumps(report, indent=2))
+        return 0
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+# bench/check_backup.py
+# -*- coding: utf-8 -*-
+"""
+Verificação do restore do backup do catálogo (restore_catalog_backup).
+
+Gera um backup de um catálogo "origem" e tenta restaurá-lo (replace=True)
+num banco "alvo" com outro catálogo, com arquivos estragados de propósito:
+  - zip cortado no meio;
+  - tar cortado no meio de uma imagem e tar cortado certinho antes do
+    end.json (o tar em si parece inteiro);
+  - linha JSON inválida numa tabela;
+  - id de produto repetido (o erro só aparece no INSERT, no meio da gravação).
+Em todos: BackupError (ou erro do banco) e o alvo continua exatamente como
+estava, inclusive na vitrine. Depois o backup bom entra inteiro, e um backup
+da versão 1 (sem end.json) continua restaurando.
+Sai com código 1 se alguma conferência falhar.
+
+Uso:
+    python bench/check_backup.py [--products 200]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store  # noqa: E402
+from bench.bench_backup import catalog_digest  # noqa: E402
+from bench.seed import seed_catalog  # noqa: E402
+
+failures = []
+
+
+def check(ok: bool, label: str):
+    print(("OK    " if ok else "FALHA ") + label)
+    if not ok:
+        failures.append(label)
+
+
+def export(app, path: str, fmt: str):
+    with app.app_context():
+        with open(path, "wb") as f:
+            for chunk in store.iter_catalog_backup(fmt):
+                f.write(chunk)
+
+
+def rewrite_zip(src: str, dst: str, edit):
+    """
+    Copia o zip passando cada membro por edit(nome, bytes) -> bytes (None tira o membro).
+    """
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(dst, "w") as zout:
+        for info in zin.infolist():
+            data = edit(info.filename, zin.read(info))
+            if data is not None:
+                zout.writestr(info.filename, data)
+
+
+def truncate(src: str, dst: str, size: int):
+    with open(src, "rb") as f:
+        data = f.read(size)
+    with open(dst, "wb") as f:
+        f.write(data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Confere que restore com arquivo ruim não mexe no catálogo.")
+    parser.add_argument("--products", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="backup_check_")
+    try:
+        src = os.path.join(work, "src.sqlite3")
+        dst = os.path.join(work, "dst.sqlite3")
+        source = store.create_app({"DATABASE_URL": "", "SQLITE_PATH": src, "SNAPSHOT_DIR": os.path.join(work, "snap1")})
+        seed_catalog(source, args.products, with_images=True)
+        target = store.create_app(
+            {"DATABASE_URL": "", "SQLITE_PATH": dst, "SNAPSHOT_DIR": os.path.join(work, "snap2"), "RATE_LIMIT": False}
+        )
+        seed_catalog(target, 30, with_images=True)
+        with target.app_context():
+            db = store.get_db()
+            db.execute("UPDATE products SET name = 'ALVO ' || name;")
+            db.commit()
+
+        good_zip = os.path.join(work, "ok.zip")
+        good_tar = os.path.join(work, "ok.tar")
+        export(source, good_zip, "zip")
+        export(source, good_tar, "tar")
+
+        bad = {}
+        bad["zip cortado"] = os.path.join(work, "cortado.zip")
+        truncate(good_zip, bad["zip cortado"], os.path.getsize(good_zip) // 2)
+
+        with tarfile.open(good_tar) as tf:
+            members = tf.getmembers()
+        image = next(m for m in members if m.name.startswith("images/"))
+        end = next(m for m in members if m.name == "end.json")
+        bad["tar cortado numa imagem"] = os.path.join(work, "cortado-imagem.tar")
+        truncate(good_tar, bad["tar cortado numa imagem"], image.offset_data + image.size // 2)
+        bad["tar cortado antes do end.json"] = os.path.join(work, "sem-end.tar")
+        truncate(good_tar, bad["tar cortado antes do end.json"], end.offset)
+
+        bad["JSON inválido"] = os.path.join(work, "json.zip")
+        rewrite_zip(
+            good_zip,
+            bad["JSON inválido"],
+            lambda n, d: d + b'{"id": 1, "name": \n' if n == "products/00000.jsonl" else d,
+        )
+
+        def duplicate(n, d):
+            # o mesmo produto duas vezes (e o end.json de acordo): passa na conferência, falha no INSERT
+            if n == "products/00000.jsonl":
+                return d + d.splitlines(keepends=True)[0]
+            if n == "end.json":
+                counts = json.loads(d)
+                counts["products"] += 1
+                return json.dumps(counts).encode("utf-8")
+            return d
+
+        bad["id repetido (erro no INSERT)"] = os.path.join(work, "dup.zip")
+        rewrite_zip(good_zip, bad["id repetido (erro no INSERT)"], duplicate)
+
+        client = target.test_client()
+        before = catalog_digest(dst)
+        check(b"ALVO PRODUTO" in client.get("/").data, "vitrine do alvo antes")
+        for label, path in bad.items():
+            with target.app_context():
+                try:
+                    store.restore_catalog_backup(path, replace=True)
+                    error = None
+                except Exception as e:  # noqa: BLE001 (BackupError ou erro do banco)
+                    error = e
+            check(error is not None, f"{label}: recusado ({type(error).__name__}: {error})")
+            check(catalog_digest(dst) == before, f"{label}: catálogo do alvo intacto")
+        page = client.get("/").data
+        check(b"ALVO PRODUTO" in page, "vitrine do alvo intacta depois das falhas")
+
+        with target.app_context():
+            stats = store.restore_catalog_backup(good_tar, replace=True)
+        check(catalog_digest(dst) == catalog_digest(src), f"tar bom: restaurado igual à origem ({stats['products']} produtos, {stats['images']} imagens)")
+        page = client.get("/").data
+        check(b"ALVO PRODUTO" not in page and b"PRODUTO" in page, "vitrine mostra o catálogo restaurado")
+
+        def as_v1(n, d):
+            if n == "end.json":
+                return None
+            if n == "manifest.json":
+                return json.dumps(dict(json.loads(d), version=1)).encode("utf-8")
+            return d
+
+        v1 = os.path.join(work, "v1.zip")
+        rewrite_zip(good_zip, v1, as_v1)
+        with target.app_context():
+            store.get_db().execute("DELETE FROM products WHERE id % 2 = 0;")
+            store.get_db().commit()
+            store.restore_catalog_backup(v1, replace=True)
+        check(catalog_digest(dst) == catalog_digest(src), "backup da versão 1 (sem end.json) ainda restaura")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    print("\n%d falha(s)" % len(failures) if failures else "\ntudo certo")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
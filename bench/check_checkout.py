@@ -0,0 +1,101 @@
+# bench/check_checkout.py
+# -*- coding: utf-8 -*-
+"""
+Verificação do /api/whatsapp_link com carrinhos malformados.
+
+O carrinho vem do navegador (localStorage), então pode chegar qualquer JSON.
+Num banco SQLite temporário, com o snapshot do catálogo ligado e desligado,
+confere que:
+  - id/qty/price_cents que não são número (ou item que não é objeto) não
+    derrubam a rota (nada de 500): o item é pulado (sem snapshot o id nem
+    é lido);
+  - se nenhum item sobrar, 400 "Carrinho vazio."; corpo que não é objeto
+    JSON (lista, texto) dá 400;
+  - os itens válidos do mesmo carrinho continuam no pedido.
+Sai com código 1 se alguma conferência falhar.
+
+Uso:
+    python bench/check_checkout.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store  # noqa: E402
+from bench.seed import seed_catalog  # noqa: E402
+
+CUSTOMER = dict(customer_name="Cliente", address="Rua A, 1", phone="31999999999", payment_method="Pix")
+
+failures = []
+
+
+def check(ok: bool, label: str):
+    print(("OK    " if ok else "FALHA ") + label)
+    if not ok:
+        failures.append(label)
+
+
+def main(argv=None):
+    work = tempfile.mkdtemp(prefix="checkout_")
+    try:
+        for snapshot_dir in (os.path.join(work, "snap"), "0"):
+            mode = "snapshot" if snapshot_dir != "0" else "sem snapshot"
+            path = os.path.join(work, f"c-{len(snapshot_dir)}.sqlite3")
+            app = store.create_app(
+                {"DATABASE_URL": "", "SQLITE_PATH": path, "SNAPSHOT_DIR": snapshot_dir, "RATE_LIMIT": False}
+            )
+            seed_catalog(app, 50)
+            with app.app_context():
+                p = store.fetch_products(active_only=True)[0]
+            client = app.test_client()
+
+            def order(items):
+                return client.post("/api/whatsapp_link", json=dict(CUSTOMER, items=items))
+
+            good = dict(id=p["id"], qty=2, price_cents=p["effective_price_cents"], name=p["name"])
+            bad_carts = {
+                'id "abc"': [dict(good, id="abc")],
+                'qty "abc"': [dict(good, qty="abc")],
+                "qty null": [dict(good, qty=None)],
+                "qty lista": [dict(good, qty=[1])],
+                'price_cents "x"': [dict(good, price_cents="x", id="abc")],
+                "item texto": ["abc"],
+                "item null": [None],
+            }
+            if snapshot_dir == "0":
+                # sem snapshot o id não é usado (preço e nome vêm do carrinho)
+                r = order(bad_carts.pop('id "abc"'))
+                check(r.status_code == 200, f'[{mode}] id "abc": ignorado, pedido sai (veio {r.status_code})')
+            for label, items in bad_carts.items():
+                r = order(items)
+                check(
+                    r.status_code == 400 and (r.get_json() or {}).get("error") == "Carrinho vazio.",
+                    f"[{mode}] {label}: 400 carrinho vazio (veio {r.status_code})",
+                )
+
+            r = order([dict(good, id="abc"), "lixo", good])
+            link = (r.get_json() or {}).get("link", "")
+            check(
+                r.status_code == 200 and store.quote(store.money_br(2 * p["effective_price_cents"])) in link,
+                f"[{mode}] item válido junto com lixo: pedido só com ele",
+            )
+
+            r = client.post("/api/whatsapp_link", json=[good])
+            check(r.status_code == 400, f"[{mode}] corpo lista: 400 (veio {r.status_code})")
+            r = client.post("/api/whatsapp_link", data="não é json", content_type="application/json")
+            check(r.status_code == 400, f"[{mode}] corpo inválido: 400 (veio {r.status_code})")
+            r = client.post("/api/whatsapp_link", json=dict(CUSTOMER, items="abc"))
+            check(r.status_code == 400, f"[{mode}] items texto: 400 (veio {r.status_code})")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    print("\n%d falha(s)" % len(failures) if failures else "\ntudo certo")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
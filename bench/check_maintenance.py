@@ -0,0 +1,162 @@
+# bench/check_maintenance.py
+# -*- coding: utf-8 -*-
+"""
+Verificação da manutenção em segundo plano (run_maintenance / maintenance_runs).
+
+Num banco SQLite temporário com imagens, simula o uso do admin (imagens
+trocadas no lugar, produtos removidos, imagem que passou a ser URL externa)
+e confere:
+  - com o lock na mão deste processo, outro processo não roda nada;
+  - rodando as tarefas, o arquivo encolhe (VACUUM / incremental_vacuum);
+  - blob de produto cuja imagem virou URL externa fica guardado (só é
+    contado) e só some com MAINTENANCE_DROP_UNUSED_BLOBS ligado;
+  - o agendador não sobe num create_app comum (só com MAINTENANCE=1);
+  - cada execução fica no histórico com a duração; logo depois, nada está
+    vencido (os outros workers não repetem);
+  - a janela "HH:MM-HH:MM" funciona, inclusive virando a meia-noite.
+Mostra a duração de cada tarefa e o tamanho do arquivo antes/depois.
+Sai com código 1 se alguma conferência falhar.
+
+Uso:
+    python bench/check_maintenance.py [--products 3000]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app as store  # noqa: E402
+from bench.seed import seed_catalog  # noqa: E402
+
+failures = []
+
+OTHER_WORKER = """
+import sys
+import app as store
+app = store.create_app({"DATABASE_URL": "", "SQLITE_PATH": sys.argv[1], "SNAPSHOT_DIR": sys.argv[2]})
+with app.app_context():
+    print(store.run_maintenance(force=True))
+"""
+
+
+def check(ok: bool, label: str):
+    print(("OK    " if ok else "FALHA ") + label)
+    if not ok:
+        failures.append(label)
+
+
+def file_mb(path: str) -> float:
+    return round(os.path.getsize(path) / 1048576, 1)
+
+
+def at(hour: int, minute: int) -> float:
+    return datetime(2026, 1, 15, hour, minute, tzinfo=store.store_timezone()).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Confere as tarefas e o lock da manutenção.")
+    parser.add_argument("--products", type=int, default=3000)
+    args = parser.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="maint_")
+    try:
+        path = os.path.join(work, "m.sqlite3")
+        snap_dir = os.path.join(work, "snap")
+        uploads = os.path.join(work, "uploads")
+        os.makedirs(uploads)
+        old = os.path.getmtime(ROOT) - (store.MAINTENANCE_UPLOAD_GRACE_DAYS + 1) * 86400
+        for name in ("usado.webp", "velho.webp"):
+            with open(os.path.join(uploads, name), "wb") as f:
+                f.write(b"x" * 1024)
+            os.utime(os.path.join(uploads, name), (old, old))
+        app = store.create_app({"DATABASE_URL": "", "SQLITE_PATH": path, "SNAPSHOT_DIR": snap_dir, "UPLOAD_FOLDER": uploads})
+        check("maintenance" not in app.extensions, "create_app sem MAINTENANCE=1 não sobe o agendador")
+        seed_catalog(app, args.products, with_images=True)
+
+        with app.app_context():
+            db = store.get_db()
+            # admin trocando metade das fotos, removendo um terço e uma foto virando URL externa
+            db.execute("UPDATE products SET image_blob = randomblob(length(image_blob)) WHERE id % 2 = 0;")
+            db.execute("DELETE FROM products WHERE id % 3 = 0;")
+            db.execute("UPDATE products SET image_url = 'https://cdn.exemplo.com/x.webp' WHERE id IN (1, 2);")
+            db.execute("UPDATE products SET image_url = '/static/uploads/usado.webp' WHERE id = 4;")
+            db.commit()
+            free_before = db.execute("PRAGMA freelist_count;").fetchone()[0]
+            size_before = file_mb(path)
+
+            # outro worker tentando enquanto este segura o lock
+            lock = store._maintenance_lock(db)
+            other = subprocess.run(
+                [sys.executable, "-c", OTHER_WORKER, path, snap_dir], cwd=ROOT, capture_output=True, text=True
+            )
+            store._maintenance_unlock(db, lock)
+            check(other.stdout.strip() == "None", "com o lock em outro processo, a manutenção não roda")
+
+            results = store.run_maintenance(force=True)
+            check(results is not None and [r[0] for r in results] == list(store.MAINTENANCE_TASKS), "todas as tarefas rodaram")
+            for name, status, ms, detail in results or []:
+                print(f"      {name:10s} {status:5s} {ms:6d} ms  {detail}")
+            check(all(r[1] == "ok" for r in results or []), "nenhuma tarefa falhou")
+
+            db = store.get_db()
+            size_after = file_mb(path)
+            free_after = db.execute("PRAGMA freelist_count;").fetchone()[0]
+            check(size_after < size_before, f"arquivo encolheu: {size_before} MB -> {size_after} MB")
+            check(free_after < free_before, f"páginas livres: {free_before} -> {free_after}")
+            check(db.execute("PRAGMA auto_vacuum;").fetchone()[0] == 2, "auto_vacuum incremental ligado")
+            external = "SELECT COUNT(*) FROM products WHERE id IN (1, 2, 4) AND image_blob IS NOT NULL;"
+            gc_detail = next((r[3] for r in results or [] if r[0] == "gc_images"), "")
+            check(db.execute(external).fetchone()[0] == 3 and "3 blob(s) guardado(s)" in gc_detail,
+                  "blob de produto com imagem externa guardado e contado (sem MAINTENANCE_DROP_UNUSED_BLOBS=1)")
+            check("1 arquivo(s) sem produto" in gc_detail and len(os.listdir(uploads)) == 2,
+                  "upload sem produto listado (e nada apagado sem MAINTENANCE_DELETE_UPLOADS=1)")
+
+            history = db.execute("SELECT COUNT(*) FROM maintenance_runs;").fetchone()[0]
+            check(history == len(store.MAINTENANCE_TASKS), "cada execução no histórico")
+            check(store.run_maintenance() == [], "logo depois, nada vencido")
+
+            store.MAINTENANCE_DROP_UNUSED_BLOBS = True
+            try:
+                detail = store.run_maintenance(["gc_images"], force=True)[0][3]
+            finally:
+                store.MAINTENANCE_DROP_UNUSED_BLOBS = False
+            db = store.get_db()
+            check(db.execute(external).fetchone()[0] == 0 and "3 blob(s) de imagem externa apagado(s)" in detail,
+                  "com MAINTENANCE_DROP_UNUSED_BLOBS=1 o blob sai")
+            check(db.execute("SELECT COUNT(*) FROM products WHERE image_blob IS NOT NULL;").fetchone()[0] > 0,
+                  "blobs em uso (/img/) continuam")
+
+            # já convertido: as próximas rodadas devolvem o espaço aos poucos
+            db.execute("DELETE FROM products WHERE id % 5 = 0;")
+            db.commit()
+            free_before = db.execute("PRAGMA freelist_count;").fetchone()[0]
+            results = store.run_maintenance(["vacuum"], force=True)
+            detail = results[0][3] if results else ""
+            print(f"      vacuum     {results[0][2] if results else 0:6d} ms  {detail}")
+            db = store.get_db()
+            free_after = db.execute("PRAGMA freelist_count;").fetchone()[0]
+            check(detail.startswith("incremental_vacuum") and free_after < free_before,
+                  f"incremental_vacuum: páginas livres {free_before} -> {free_after}")
+
+        with app.test_request_context("/"):
+            check(store.in_maintenance_window("03:00-06:00", at(4, 0)), "04:00 dentro de 03:00-06:00")
+            check(not store.in_maintenance_window("03:00-06:00", at(12, 0)), "12:00 fora de 03:00-06:00")
+            check(store.in_maintenance_window("23:00-05:00", at(1, 30)), "01:30 dentro de 23:00-05:00")
+            check(not store.in_maintenance_window("23:00-05:00", at(22, 0)), "22:00 fora de 23:00-05:00")
+            check(store.in_maintenance_window("", at(12, 0)), "janela vazia: qualquer hora")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    print("\n%d falha(s)" % len(failures) if failures else "\ntudo certo")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# bench/check_promotions.py
+# -*- coding: utf-8 -*-
+"""
+Verificação das promoções agendadas (tabela promotions).
+
+Agenda, num banco temporário, uma promoção de produto (preço fixo) e uma de
+categoria (percentual) que começam/terminam daqui a poucos segundos e
+confere:
+  - fetch_products() e a vitrine (snapshot do catálogo) mostram o preço da
+    promoção a partir do primeiro request depois do início, e o preço
+    normal a partir do primeiro request depois do fim;
+  - entre as fronteiras o cronograma fica em cache (nenhuma query em
+    promotions por request);
+  - a promoção manual mais barata continua ganhando.
+Também mede fetch_products() com e sem regras valendo.
+Sai com código 1 se alguma conferência falhar.
+
+Uso:
+    python bench/check_promotions.py [--products 2000] [--window 3]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store  # noqa: E402
+from bench.seed import seed_catalog  # noqa: E402
+
+failures = []
+
+
+def check(ok: bool, label: str):
+    print(("OK    " if ok else "FALHA ") + label)
+    if not ok:
+        failures.append(label)
+
+
+def median_ms(fn, repeat: int = 20) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return round(statistics.median(samples), 3)
+
+
+def wait_until(ts: float):
+    time.sleep(max(0.0, ts - time.time()))
+
+
+def product_price(app, pid: int) -> int:
+    with app.test_request_context("/"):
+        return next(p for p in store.fetch_products(active_only=True) if p["id"] == pid)["effective_price_cents"]
+
+
+def promotion_queries(app, pid: int) -> int:
+    # quantas vezes o cronograma vai ao banco em 20 fetch_products()
+    count = 0
+    original = store.db_execute
+
+    def counting_execute(db, sql, params=()):
+        nonlocal count
+        if "FROM promotions" in sql:
+            count += 1
+        return original(db, sql, params)
+
+    store.db_execute = counting_execute
+    try:
+        for _ in range(20):
+            product_price(app, pid)
+    finally:
+        store.db_execute = original
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Confere as fronteiras das promoções agendadas.")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--window", type=float, default=3.0, help="segundos até início/fim das promoções")
+    args = parser.parse_args(argv)
+
+    fd, path = tempfile.mkstemp(prefix="promos_", suffix=".sqlite3")
+    os.close(fd)
+    snap_dir = tempfile.mkdtemp(prefix="snap_")
+    try:
+        app = store.create_app(
+            {"DATABASE_URL": "", "SQLITE_PATH": path, "SNAPSHOT_DIR": snap_dir, "SERVER_TIMING": False, "RATE_LIMIT": False}
+        )
+        seed_catalog(app, args.products)
+        with app.app_context():
+            db = store.get_db()
+            # produto sem promoção manual e um outro (mesma categoria) com promoção manual
+            plain = store.db_fetchone(
+                store.db_execute(db, "SELECT id, price_cents, category_id FROM products WHERE is_active=1 AND is_promo=0 ORDER BY id LIMIT 1;")
+            )
+            manual = store.db_fetchone(
+                store.db_execute(
+                    db,
+                    "SELECT id, promo_price_cents FROM products WHERE is_active=1 AND is_promo=1 AND category_id=? ORDER BY id LIMIT 1;",
+                    (plain[2],),
+                )
+            )
+            pid, base_cents, category_id = int(plain[0]), int(plain[1]), int(plain[2])
+            promo_cents = max(1, base_cents // 2)
+            starts_at = int(time.time() + args.window) + 1
+            ends_at = starts_at + int(args.window) + 1
+            store.db_execute(
+                db,
+                "INSERT INTO promotions (name, product_id, kind, value, starts_at, ends_at) VALUES (?, ?, 'price', ?, ?, ?);",
+                ("produto", pid, promo_cents, starts_at, ends_at),
+            )
+            store.db_execute(
+                db,
+                "INSERT INTO promotions (name, category_id, kind, value, starts_at, ends_at) VALUES (?, ?, 'percent', 1, ?, ?);",
+                ("categoria", category_id, starts_at, ends_at),
+            )
+            store.db_commit(db)
+
+        client = app.test_client()
+        marker = store.money_br(promo_cents).encode()
+        no_rules_ms = median_ms(lambda: product_price(app, pid))
+
+        check(product_price(app, pid) == base_cents, "antes do início: preço normal")
+        check(marker not in client.get("/").data, "antes do início: vitrine sem o preço da promoção")
+
+        wait_until(starts_at)
+        check(marker in client.get("/").data, "primeiro request depois do início: vitrine com a promoção")
+        check(product_price(app, pid) == promo_cents, "fetch_products() com o preço da promoção")
+        if manual is not None:
+            manual_id, manual_cents = int(manual[0]), int(manual[1])
+            check(product_price(app, manual_id) == manual_cents, "promoção manual mais barata continua valendo")
+        check(promotion_queries(app, pid) == 0, "entre as fronteiras o cronograma não vai ao banco")
+        rules_ms = median_ms(lambda: product_price(app, pid))
+
+        wait_until(ends_at)
+        check(marker not in client.get("/").data, "primeiro request depois do fim: vitrine com o preço normal")
+        check(product_price(app, pid) == base_cents, "fetch_products() volta ao preço normal")
+
+        print(f"      fetch_products() ({args.products} produtos): {no_rules_ms} ms sem regra valendo, {rules_ms} ms com regras valendo")
+    finally:
+        shutil.rmtree(snap_dir, ignore_errors=True)
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+
+    print("\n%d falha(s)" % len(failures) if failures else "\ntudo certo")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
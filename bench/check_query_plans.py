@@ -0,0 +1,208 @@
+# bench/check_query_plans.py
+# -*- coding: utf-8 -*-
+"""
+Regressão de plano de execução das queries quentes.
+
+Semeia um catálogo sintético (50k produtos por padrão), passa pelas rotas
+(vitrine, checkout, imagem, admin com filtros, categorias, remoção de
+categoria) capturando cada SQL que sai de db_execute(), e roda EXPLAIN em
+cada uma. Sai com código 1 se alguma query cair em table scan, ou se ordenar
+em memória (sort em vez de ler na ordem do índice) sem estar em EXPECTED_SORTS.
+
+Uso:
+    python bench/check_query_plans.py [--products 50000] [--verbose]
+
+SQLite usa um arquivo temporário. Para checar o Postgres, aponte
+PLAN_CHECK_DATABASE_URL para um banco DESCARTÁVEL (vazio); lá o EXPLAIN roda
+com enable_seqscan=off, então um "Seq Scan" significa que não existe índice
+utilizável para a query.
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store  # noqa: E402
+from bench.seed import reset_postgres, seed_catalog  # noqa: E402
+
+EXPLAINABLE = re.compile(r"^\s*(SELECT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+SQLITE_TABLE_SCAN = re.compile(r"^SCAN (\w+)( AS \w+)?$")
+SQLITE_SORT = re.compile(r"^USE TEMP B-TREE FOR (RIGHT PART OF |LAST TERM OF )?ORDER BY$")
+# leituras que pegam a tabela inteira de propósito
+FULL_TABLE_READS = {
+    "SELECT key, value FROM settings;",  # snapshot do catálogo: settings tem poucas linhas
+    "SELECT id, slug, name, host, is_active FROM stores ORDER BY id;",  # diretório de lojas: poucas linhas, em cache
+    # histórico da manutenção: rowid de trás para frente com LIMIT, e a tabela é podada
+    "SELECT task, started_at, duration_ms, status, detail FROM maintenance_runs ORDER BY id DESC LIMIT 50;",
+    # total da busca do admin: LIKE '%termo%' em nome e descrição não usa btree
+    # (antes lia o índice da vitrine, que tinha a descrição; custo parecido)
+    "SELECT COUNT(*) FROM products p WHERE p.store_id = ? AND (p.name LIKE ? OR p.description LIKE ?);",
+}
+# queries que ordenam em memória de propósito (padrão -> motivo)
+EXPECTED_SORTS = {
+    # a ordem vem do nome da categoria (JOIN + COALESCE): nenhum índice de
+    # products entrega; a vitrine vem do snapshot do catálogo no dia a dia
+    r"FROM products p LEFT JOIN categories c ON c\.id = p\.category_id WHERE p\.store_id = \S+ AND p\.is_active = 1 "
+    r"ORDER BY COALESCE\(c\.name, p\.category, 'Outros'\), p\.name;$": "vitrine",
+    # só as regras valendo ou futuras de uma loja: poucas linhas
+    r"FROM promotions WHERE store_id = \S+ AND is_active = 1 AND ends_at > \S+ ORDER BY starts_at, id;$": "cronograma",
+    # lista do admin filtrada por categoria: o filtro já corta para poucas linhas
+    r"WHERE p\.store_id = \S+ AND p\.category_id (= \S+|IS NULL)( AND p\.is_active = \S+)? "
+    r"ORDER BY p\.is_active DESC, p\.name, p\.id LIMIT": "admin por categoria",
+}
+
+
+def normalize(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+def capture_hot_queries(app) -> list:
+    """
+    Passa pelas rotas com o test client e devolve [(sql, params)] sem repetição.
+    """
+    captured = {}
+    original = store.db_execute
+
+    def recording_execute(db, sql, params=()):
+        if EXPLAINABLE.match(sql):
+            captured.setdefault(normalize(sql), (sql, tuple(params)))
+        return original(db, sql, params)
+
+    store.db_execute = recording_execute
+    try:
+        client = app.test_client()
+        client.get("/")
+        client.get("/checkout")
+        client.get("/img/1.webp")
+        client.post(
+            "/api/whatsapp_link",
+            json=dict(
+                customer_name="x",
+                address="y",
+                phone="1",
+                payment_method="Pix",
+                items=[dict(qty=1, price_cents=100, name="z")],
+            ),
+        )
+        client.post("/login", data=dict(username=store.ADMIN_USER, password=store.ADMIN_PASSWORD))
+        client.get("/admin")
+        client.get("/admin?page=20")
+        client.get("/admin?q=PRODUTO%200001")
+        client.get("/admin?category_id=3&status=1")
+        client.get("/admin?promo=1")
+        client.get("/admin?category_id=none")
+        client.get("/admin/categories")
+        client.post(
+            "/admin/promotions/add",
+            data=dict(name="x", target="category:3", kind="percent", value="10",
+                      starts_at="2000-01-01T00:00", ends_at="2100-01-01T00:00"),
+        )
+        client.get("/")  # cronograma com a promoção valendo
+        client.get("/admin/promotions")
+        client.get("/admin/products/search?q=PRODUTO%200001")
+        client.get("/admin/products/search?q=42")
+        client.post("/admin/promotions/toggle/1")
+        client.post("/admin/categories/delete/5")
+        client.post("/admin/stores/add", data=dict(name="Filial", slug="filial", host="filial.test"))
+        client.get("/admin/stores")
+        client.get("/admin/maintenance")
+        client.get("/s/filial/")
+        client.get("/", headers={"Host": "filial.test"})
+        client.get("/s/filial/admin")
+        client.get("/s/filial/admin/promotions")
+    finally:
+        store.db_execute = original
+
+    return list(captured.values())
+
+
+def sqlite_plan(db, sql, params):
+    rows = db.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    details = [r[3] for r in rows]
+    scans = [d for d in details if SQLITE_TABLE_SCAN.match(d)]
+    sorts = [d for d in details if SQLITE_SORT.match(d)]
+    return details, scans, sorts
+
+
+def pg_plan(db, sql, params):
+    with db.cursor() as cur:
+        cur.execute("SET LOCAL enable_seqscan = off;")
+        cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cur.fetchone()[0][0]["Plan"]
+    db.rollback()
+
+    details, scans, sorts = [], [], []
+
+    def walk(node, depth=0):
+        label = node["Node Type"] + (f" on {node['Relation Name']}" if "Relation Name" in node else "")
+        if "Index Name" in node:
+            label += f" using {node['Index Name']}"
+        details.append("  " * depth + label)
+        if node["Node Type"] == "Seq Scan":
+            scans.append(label)
+        if node["Node Type"] in ("Sort", "Incremental Sort"):
+            sorts.append(label)
+        for child in node.get("Plans", []):
+            walk(child, depth + 1)
+
+    walk(plan)
+    return details, scans, sorts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Falha se alguma query quente virar table scan ou sort inesperado.")
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--verbose", action="store_true", help="mostra o plano de todas as queries")
+    args = parser.parse_args(argv)
+
+    pg_url = (os.getenv("PLAN_CHECK_DATABASE_URL") or "").strip()
+    tmp_path = None
+    if pg_url:
+        app = store.create_app({"DATABASE_URL": pg_url, "SERVER_TIMING": False})
+        reset_postgres(app)
+    else:
+        fd, tmp_path = tempfile.mkstemp(prefix="plans_", suffix=".sqlite3")
+        os.close(fd)
+        app = store.create_app({"DATABASE_URL": "", "SQLITE_PATH": tmp_path, "SERVER_TIMING": False})
+
+    try:
+        seed_catalog(app, args.products)
+        queries = capture_hot_queries(app)
+
+        failures = sort_failures = 0
+        with app.app_context():
+            db = store.get_db()
+            for sql, params in queries:
+                if store.using_postgres():
+                    details, scans, sorts = pg_plan(db, sql, params)
+                else:
+                    details, scans, sorts = sqlite_plan(db, sql, params)
+                if normalize(sql).replace("%s", "?") in FULL_TABLE_READS:
+                    scans = []
+                if any(re.search(pattern, normalize(sql)) for pattern in EXPECTED_SORTS):
+                    sorts = []
+                status = "FAIL" if scans else "SORT" if sorts else "ok"
+                failures += bool(scans)
+                sort_failures += bool(sorts) and not scans
+                if scans or sorts or args.verbose:
+                    print(f"[{status}] {normalize(sql)[:160]}")
+                    for d in details:
+                        print(f"        {d}")
+
+        print(f"{len(queries)} queries verificadas, {failures} com table scan, {sort_failures} com sort inesperado.")
+        return 1 if failures or sort_failures else 0
+    finally:
+        if tmp_path:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(tmp_path + suffix)
+                except OSError:
+                    pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+# bench/check_read_replica.py
+# -*- coding: utf-8 -*-
+"""
+Verificação do roteamento de leitura com réplica (DATABASE_READ_URL).
+
+Precisa de dois Postgres locais DESCARTÁVEIS: o primário e uma réplica por
+streaming dele (ex.: pg_basebackup -R). Confere:
+  - visitante lê da réplica; admin logado lê do primário;
+  - o admin vê na hora o que acabou de salvar; o visitante vê quando a
+    réplica aplica (mede quanto demorou);
+  - réplica acima de REPLICA_MAX_LAG_SECONDS -> primário;
+  - réplica fora do ar -> primário, sem travar as requests seguintes.
+Sai com código 1 se alguma conferência falhar.
+
+Uso:
+    REPLICA_CHECK_PRIMARY_URL=postgresql://...:5432/loja \\
+    REPLICA_CHECK_READ_URL=postgresql://...:5433/loja \\
+        python bench/check_read_replica.py [--products 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store  # noqa: E402
+from bench.seed import reset_postgres, seed_catalog  # noqa: E402
+
+failures = []
+
+
+def check(ok: bool, label: str):
+    print(("OK    " if ok else "FALHA ") + label)
+    if not ok:
+        failures.append(label)
+
+
+def read_target(app, admin: bool = False) -> str:
+    with app.test_request_context("/"):
+        if admin:
+            store.session["is_admin"] = True
+        db = store.get_read_db()
+        return "primary" if db is store.get_db() else "replica"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Confere o roteamento de leitura para a réplica.")
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--max-wait", type=float, default=10.0, help="espera máxima pela replicação (s)")
+    args = parser.parse_args(argv)
+
+    primary_url = os.getenv("REPLICA_CHECK_PRIMARY_URL")
+    read_url = os.getenv("REPLICA_CHECK_READ_URL")
+    if not primary_url or not read_url:
+        print("defina REPLICA_CHECK_PRIMARY_URL e REPLICA_CHECK_READ_URL", file=sys.stderr)
+        return 2
+
+    app = store.create_app(
+        {"DATABASE_URL": primary_url, "DATABASE_READ_URL": read_url, "RATE_LIMIT": False, "FRAGMENT_CACHE_MAX": 0}
+    )
+    reset_postgres(app)
+    seed_catalog(app, args.products)
+    replica = app.extensions["read_replica"]
+
+    check(read_target(app) == "replica", "visitante lê da réplica")
+    check(read_target(app, admin=True) == "primary", "admin logado lê do primário")
+    print(f"      atraso medido da réplica: {replica.lag:.3f}s")
+
+    # read-your-writes: admin salva um preço novo e recarrega a vitrine
+    admin = app.test_client()
+    admin.post("/login", data=dict(username=store.ADMIN_USER, password=store.ADMIN_PASSWORD))
+    visitor = app.test_client()
+    with app.app_context():
+        db = store.get_db()
+        row = store.db_fetchone(store.db_execute(db, "SELECT id, price_cents FROM products WHERE is_active=1 ORDER BY id LIMIT 1;"))
+        pid, new_price = row[0], row[1] + 1234
+        store.db_execute(db, "UPDATE products SET price_cents=%s WHERE id=%s;", (new_price, pid))
+        store.db_commit(db)
+    marker = store.money_br(new_price).encode()
+    written_at = time.perf_counter()
+    check(marker in admin.get("/").data, "admin vê o próprio preço novo na hora")
+
+    seen = None
+    while time.perf_counter() - written_at < args.max_wait:
+        if marker in visitor.get("/").data:
+            seen = time.perf_counter() - written_at
+            break
+        time.sleep(0.05)
+    check(seen is not None, f"visitante vê o preço novo em até {args.max_wait:.0f}s")
+    if seen is not None:
+        print(f"      visível para o visitante em {seen * 1000:.0f} ms")
+
+    # réplica atrasada demais
+    max_lag = replica.max_lag
+    replica.max_lag = -1.0
+    check(read_target(app) == "primary", "réplica acima do atraso máximo -> primário")
+    replica.max_lag = max_lag
+
+    # réplica fora do ar (porta sem ninguém ouvindo)
+    down = store.create_app(
+        {"DATABASE_URL": primary_url, "DATABASE_READ_URL": "postgresql://nobody@127.0.0.1:1/none", "RATE_LIMIT": False}
+    )
+    check(read_target(down) == "primary", "réplica fora do ar -> primário")
+    started = time.perf_counter()
+    status = down.test_client().get("/").status_code
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    check(status == 200 and elapsed_ms < 500, f"request seguinte não espera a réplica ({elapsed_ms:.0f} ms)")
+
+    replica.close()
+    print("\n%d falha(s)" % len(failures) if failures else "\ntudo certo")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
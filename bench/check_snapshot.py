@@ -0,0 +1,112 @@
+# bench/check_snapshot.py
+# -*- coding: utf-8 -*-
+"""
+Verificação da publicação do snapshot do catálogo fora da request.
+
+Num banco SQLite temporário, anotando em que thread o catálogo é lido para
+publicar (load_catalog_snapshot_data), confere que:
+  - snapshot vencido (SNAPSHOT_MAX_AGE_SECONDS): a request do cliente não
+    publica, serve a versão atual e uma thread confere o banco;
+  - sem mudança no banco, a conferência não grava arquivo novo (mesma
+    versão), só marca o mtime, e os outros workers não conferem de novo;
+  - escrita fora do admin (UPDATE direto) entra na conferência seguinte;
+  - a resposta do admin não espera a publicação, e a vitrine mostra a
+    edição assim que ela termina.
+Sai com código 1 se alguma conferência falhar.
+
+Uso:
+    python bench/check_snapshot.py [--products 2000]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store  # noqa: E402
+from bench.seed import seed_catalog  # noqa: E402
+
+failures = []
+
+
+def check(ok: bool, label: str):
+    print(("OK    " if ok else "FALHA ") + label)
+    if not ok:
+        failures.append(label)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Confere a publicação do snapshot em segundo plano.")
+    parser.add_argument("--products", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="snapshot_check_")
+    try:
+        path = os.path.join(work, "s.sqlite3")
+        app = store.create_app(
+            {"DATABASE_URL": "", "SQLITE_PATH": path, "SNAPSHOT_DIR": os.path.join(work, "snap"), "RATE_LIMIT": False}
+        )
+        seed_catalog(app, args.products)
+        snapshot = app.extensions["catalog_snapshot"]
+        client = app.test_client()
+        client.get("/")
+        with app.app_context():
+            snap_path = snapshot.path()
+            version = snapshot.current().version
+
+        loads = []
+        original = store.load_catalog_snapshot_data
+
+        def recording_load():
+            loads.append(threading.current_thread() is threading.main_thread())
+            return original()
+
+        store.load_catalog_snapshot_data = recording_load
+
+        def age(seconds: float):
+            # como se a última conferência tivesse sido há `seconds`
+            old = time.time() - seconds
+            os.utime(snap_path, (old, old))
+
+        age(snapshot.max_age + 5)
+        r = client.get("/")
+        snapshot.wait_published()
+        check(r.status_code == 200 and loads == [False], f"vencido: a request não lê o catálogo, a thread lê ({loads})")
+        with app.app_context():
+            view = snapshot.current()
+        check(view.version == version, "sem mudança no banco: nenhuma versão nova")
+        check(time.time() - os.stat(snap_path).st_mtime < 5, "conferência marcada no mtime do arquivo")
+        with app.app_context():
+            check(not snapshot.publish(refresh=True), "outro worker logo depois: não confere de novo")
+
+        with app.app_context():
+            pid = view.products()[0]["id"]
+            db = store.get_db()
+            db.execute("UPDATE products SET name = 'MUDOU FORA DO ADMIN' WHERE id = ?;", (pid,))
+            db.commit()
+        age(snapshot.max_age + 5)
+        client.get("/")
+        snapshot.wait_published()
+        check(b"MUDOU FORA DO ADMIN" in client.get("/").data, "escrita fora do admin entra na conferência seguinte")
+
+        client.post("/login", data=dict(username=store.ADMIN_USER, password=store.ADMIN_PASSWORD))
+        del loads[:]
+        r = client.post(f"/admin/edit/{pid}", data=dict(name="EDITADO NO ADMIN", price="9,99", category_id="", is_active="on"))
+        snapshot.wait_published()
+        check(r.status_code == 302 and loads == [False], f"edição no admin publica fora da request ({loads})")
+        check(b"EDITADO NO ADMIN" in client.get("/").data, "vitrine com a edição depois da publicação")
+        store.load_catalog_snapshot_data = original
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    print("\n%d falha(s)" % len(failures) if failures else "\ntudo certo")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+# bench/check_stores.py
+# -*- coding: utf-8 -*-
+"""
+Verificação do multi-loja (tabelas stores / store_settings).
+
+Num banco temporário com o catálogo sintético na loja principal, cria uma
+filial pelo /admin/stores, copia parte dos produtos para ela (ids novos,
+preços diferentes) e confere:
+  - /s/<slug>/ e o domínio próprio (Host) mostram só o catálogo da filial;
+    / continua só com o da principal; slug desconhecido dá 404;
+  - WhatsApp e nome são os da filial;
+  - o admin da filial não edita produto da principal;
+  - a lista do admin da filial aberta por /s/<slug>/ e pelo Host tem os
+    links certos para cada um (o cache de fragmentos não mistura os dois);
+  - uma rajada de edições na principal não republica o snapshot da filial
+    nem esvazia o cache de fragmentos dela.
+Mede a vitrine da filial antes e durante a rajada na principal.
+Sai com código 1 se alguma conferência falhar.
+
+Uso:
+    python bench/check_stores.py [--products 2000] [--branch-products 300] [--edits 30]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store  # noqa: E402
+from bench.seed import seed_catalog  # noqa: E402
+
+SLUG = "centro"
+HOST = "centro.loja.test"
+WHATSAPP = "5531988887777"
+
+failures = []
+
+
+def check(ok: bool, label: str):
+    print(("OK    " if ok else "FALHA ") + label)
+    if not ok:
+        failures.append(label)
+
+
+def median_ms(fn, repeat: int = 20) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return round(statistics.median(samples), 3)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Confere o isolamento entre lojas.")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--branch-products", type=int, default=300)
+    parser.add_argument("--edits", type=int, default=30, help="edições de produto na loja principal")
+    args = parser.parse_args(argv)
+
+    fd, path = tempfile.mkstemp(prefix="stores_", suffix=".sqlite3")
+    os.close(fd)
+    snap_dir = tempfile.mkdtemp(prefix="snap_")
+    try:
+        app = store.create_app(
+            {"DATABASE_URL": "", "SQLITE_PATH": path, "SNAPSHOT_DIR": snap_dir, "SERVER_TIMING": False, "RATE_LIMIT": False}
+        )
+        seed_catalog(app, args.products)
+        client = app.test_client()
+        client.post("/login", data=dict(username=store.ADMIN_USER, password=store.ADMIN_PASSWORD))
+        client.post(
+            "/admin/stores/add",
+            data=dict(name="Filial Centro", slug=SLUG, host=HOST, store_whatsapp=WHATSAPP),
+        )
+
+        with app.app_context():
+            db = store.get_db()
+            row = store.db_fetchone(store.db_execute(db, "SELECT id FROM stores WHERE slug=?;", (SLUG,)))
+            check(row is not None, "filial criada pelo /admin/stores")
+            if row is None:
+                return 1
+            branch_id = int(row[0])
+            # filial com parte do catálogo, nome marcado e preço 10% acima
+            store.db_execute(
+                db,
+                """
+                INSERT INTO products (name, description, price_cents, image_url, category_id,
+                                      is_active, is_promo, promo_price_cents, store_id)
+                SELECT 'FILIAL ' || name, description, price_cents * 11 / 10, '', category_id, 1, 0, NULL, ?
+                FROM products WHERE store_id = ? AND is_active = 1 ORDER BY id LIMIT ?;
+                """,
+                (branch_id, store.DEFAULT_STORE_ID, args.branch_products),
+            )
+            store.db_commit(db)
+            main_pid = int(
+                store.db_fetchone(
+                    store.db_execute(db, "SELECT id FROM products WHERE store_id=? AND is_active=1 ORDER BY id LIMIT 1;", (store.DEFAULT_STORE_ID,))
+                )[0]
+            )
+            branch_pid = int(
+                store.db_fetchone(store.db_execute(db, "SELECT id FROM products WHERE store_id=? ORDER BY id LIMIT 1;", (branch_id,)))[0]
+            )
+            main_name = store.db_fetchone(store.db_execute(db, "SELECT name FROM products WHERE id=?;", (main_pid,)))[0]
+            main_ids = [
+                int(r[0])
+                for r in store.db_fetchall(
+                    store.db_execute(
+                        db,
+                        "SELECT id FROM products WHERE store_id=? AND is_active=1 ORDER BY id LIMIT ?;",
+                        (store.DEFAULT_STORE_ID, max(1, args.edits)),
+                    )
+                )
+            ]
+
+        branch_html = client.get(f"/s/{SLUG}/").data
+        main_html = client.get("/").data
+        host_html = client.get("/", headers={"Host": HOST}).data
+        check(b"FILIAL PRODUTO" in branch_html and b"PRODUTO 000000" not in branch_html.replace(b"FILIAL PRODUTO", b""),
+              f"/s/{SLUG}/ só com o catálogo da filial")
+        check(b"FILIAL PRODUTO" not in main_html, "/ só com o catálogo da principal")
+        check(b"FILIAL PRODUTO" in host_html, f"Host {HOST} resolve a filial")
+        check(client.get("/s/nao-existe/").status_code == 404, "slug desconhecido dá 404")
+        check(b"Filial Centro" in branch_html, "vitrine da filial com o nome dela")
+
+        def order(pid):
+            return client.post(
+                f"/s/{SLUG}/api/whatsapp_link",
+                json=dict(customer_name="x", address="y", phone="1", payment_method="Pix",
+                          items=[dict(id=pid, qty=1, price_cents=100, name="z")]),
+            )
+
+        wa = order(branch_pid)
+        check(wa.status_code == 200 and WHATSAPP in (wa.get_json() or {}).get("link", ""), "pedido da filial vai para o WhatsApp dela")
+        check(order(main_pid).status_code == 400, "pedido na filial não aceita produto da principal")
+
+        client.post(f"/s/{SLUG}/admin/edit/{main_pid}", data=dict(name="INVADIDO", price="1,00", category_id="", is_active="on"))
+        with app.app_context():
+            name = store.db_fetchone(store.db_execute(store.get_db(), "SELECT name FROM products WHERE id=?;", (main_pid,)))[0]
+        check(name == main_name, "admin da filial não edita produto da principal")
+
+        edit_link = f'href="/s/{SLUG}/admin/edit/{branch_pid}"'.encode()
+        by_path = client.get(f"/s/{SLUG}/admin").data
+        # o cookie da sessão é por domínio: login também no da filial
+        client.post("/login", data=dict(username=store.ADMIN_USER, password=store.ADMIN_PASSWORD), headers={"Host": HOST})
+        by_host = client.get("/admin", headers={"Host": HOST}).data
+        check(edit_link in by_path, "admin da filial por /s/<slug>/: links com o prefixo")
+        check(f'href="/admin/edit/{branch_pid}"'.encode() in by_host and edit_link not in by_host,
+              "admin da filial pelo Host: links sem o prefixo (fragmento não veio do outro acesso)")
+
+        snapshot = app.extensions["catalog_snapshot"]
+        fragments = app.extensions["fragment_cache"]
+        with app.app_context():
+            branch_path = snapshot.path(branch_id)
+        branch_mtime = os.stat(branch_path).st_mtime_ns
+        client.get(f"/s/{SLUG}/")
+        branch_cache = fragments.get(branch_id)
+        entries_before, misses_before = len(branch_cache), branch_cache.misses
+        quiet_ms = median_ms(lambda: client.get(f"/s/{SLUG}/"))
+
+        busy_samples = []
+        for pid in main_ids:
+            client.post(f"/admin/edit/{pid}", data=dict(name=f"PRODUTO EDITADO {pid}", price="9,99", category_id="", is_active="on"))
+            started = time.perf_counter()
+            client.get(f"/s/{SLUG}/")
+            busy_samples.append((time.perf_counter() - started) * 1000.0)
+        busy_ms = round(statistics.median(busy_samples), 3)
+
+        check(os.stat(branch_path).st_mtime_ns == branch_mtime, "edições na principal não republicam o snapshot da filial")
+        check(len(branch_cache) == entries_before and branch_cache.misses == misses_before,
+              "edições na principal não tiram fragmentos da filial do cache")
+        snapshot.wait_published()  # a publicação roda numa thread, depois da resposta do admin
+        check(b"PRODUTO EDITADO" in client.get("/").data, "edições aparecem na vitrine da principal")
+
+        print(f"      vitrine da filial ({args.branch_products} produtos): {quiet_ms} ms parada, "
+              f"{busy_ms} ms com {len(main_ids)} edições na principal")
+    finally:
+        shutil.rmtree(snap_dir, ignore_errors=True)
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+
+    print("\n%d falha(s)" % len(failures) if failures else "\ntudo certo")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
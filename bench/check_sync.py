@@ -0,0 +1,173 @@
+# bench/check_sync.py
+# -*- coding: utf-8 -*-
+"""
+Verificação do `importar_produtos.py --sync` (desativação e reativação).
+
+Num banco SQLite temporário, roda o importador (processo novo, como o cron
+rodaria) com três exports do ERP e confere:
+  - produto que some de um export é desativado e marcado (deactivated_by_sync);
+  - quando ele volta no export seguinte, volta a ficar ativo (e a marca sai);
+  - produto que o admin escondeu continua escondido, mesmo estando no arquivo;
+  - produto que o sync escondeu e o admin reativou e escondeu de novo vira
+    decisão do admin: o sync não mexe mais;
+  - a vitrine (snapshot do catálogo) mostra o que o importador gravou;
+  - código com ponto/vírgula ("10.001") é erro de linha, não vira id 10;
+    float inteiro do XLSX (10.0) passa;
+  - coluna "descricao" não cobre o "produto" (só vira nome sem coluna de
+    nome), e duas colunas para o mesmo campo recusam o arquivo.
+Sai com código 1 se alguma conferência falhar.
+
+Uso:
+    python bench/check_sync.py
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app as store  # noqa: E402
+import importar_produtos as importer  # noqa: E402
+
+HEADER = "id;name;category;price\n"
+ROWS = {
+    910001: "910001;SYNC CERVEJA A;Cervejas;5,99\n",
+    910002: "910002;SYNC CERVEJA B;Cervejas;6,49\n",
+    910003: "910003;SYNC REFRI C;Refrigerantes;7,99\n",
+    910004: "910004;SYNC REFRI D;Refrigerantes;8,99\n",
+}
+
+failures = []
+
+
+def check(ok: bool, label: str):
+    print(("OK    " if ok else "FALHA ") + label)
+    if not ok:
+        failures.append(label)
+
+
+def write_export(path: str, ids):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEADER)
+        for pid in ids:
+            f.write(ROWS[pid])
+
+
+def run_sync(csv_path: str, sqlite_path: str, snap_dir: str) -> str:
+    env = dict(os.environ, DATABASE_URL="", SQLITE_PATH=sqlite_path, SNAPSHOT_DIR=snap_dir)
+    proc = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "importar_produtos.py"), csv_path, "--sync"],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importar_produtos.py --sync falhou:\n{proc.stdout}{proc.stderr}")
+    return proc.stdout
+
+
+def check_parsing(work: str):
+    stats = {}
+    rows = [
+        (2, dict(id="10.001", name="A", price="1,00")),
+        (3, dict(id="10.002", name="B", price="1,00")),
+        (4, dict(id="10,5", name="C", price="1,00")),
+        (5, dict(id=10.5, name="D", price=1.0)),
+        (6, dict(id=11.0, name="E", price=1.0)),
+        (7, dict(id=" 12 ", name="F", price="1,00")),
+    ]
+    ids = [p["id"] for _, p in importer.iter_valid_products(rows, stats)]
+    check(ids == [11, 12] and stats["errors"] == 4, f"ids com ponto/vírgula viram erro, 11.0 e '12' passam ({ids})")
+
+    header = importer._normalize_header(["codigo", "produto", "descricao", "preco"])
+    p = importer.validate_row(dict(zip(header, ["7", "Coca 2L", "Refrigerante de cola garrafa", "9,99"])))
+    check(p["name"] == "Coca 2L", f"produto + descricao: nome é o produto ({p['name']!r})")
+    header = importer._normalize_header(["codigo", "descricao", "preco"])
+    p = importer.validate_row(dict(zip(header, ["7", "Coca 2L", "9,99"])))
+    check(p["name"] == "Coca 2L", "só descricao: vira o nome")
+
+    csv_path = os.path.join(work, "dup.csv")
+    with open(csv_path, "w", encoding="utf-8") as f:
+        f.write("codigo;nome;produto;preco\n7;A;B;1,00\n")
+    try:
+        list(importer.iter_source_rows(importer.Path(csv_path)))
+        error = None
+    except importer.RowError as e:
+        error = e
+    check(error is not None, f"nome + produto no cabeçalho: arquivo recusado ({error})")
+
+
+def main(argv=None):
+    work = tempfile.mkdtemp(prefix="sync_")
+    try:
+        check_parsing(work)
+        path = os.path.join(work, "s.sqlite3")
+        snap_dir = os.path.join(work, "snap")
+        csv_path = os.path.join(work, "export.csv")
+        app = store.create_app({"DATABASE_URL": "", "SQLITE_PATH": path, "SNAPSHOT_DIR": snap_dir})
+        with app.app_context():
+            store.init_db()
+
+        def state(pid):
+            with app.app_context():
+                row = store.db_fetchone(
+                    store.db_execute(store.get_db(), "SELECT is_active, deactivated_by_sync FROM products WHERE id=?;", (pid,))
+                )
+            return (int(row[0]), int(row[1])) if row else None
+
+        client = app.test_client()
+        client.post("/login", data=dict(username=store.ADMIN_USER, password=store.ADMIN_PASSWORD))
+
+        def admin_set_active(pid, active: bool):
+            data = dict(name=ROWS[pid].split(";")[1], price=ROWS[pid].split(";")[3].strip(), category_id="")
+            if active:
+                data["is_active"] = "on"
+            client.post(f"/admin/edit/{pid}", data=data)
+
+        # 1) carga inicial; o admin esconde o D
+        write_export(csv_path, ROWS)
+        run_sync(csv_path, path, snap_dir)
+        check(all(state(pid) == (1, 0) for pid in ROWS), "carga inicial: todos ativos, sem marca")
+        admin_set_active(910004, False)
+        check(state(910004) == (0, 0), "admin escondeu o D (sem marca de sync)")
+
+        # 2) B e C somem do export
+        write_export(csv_path, [910001, 910004])
+        out = run_sync(csv_path, path, snap_dir)
+        check(state(910002) == (0, 1) and state(910003) == (0, 1), "B e C fora do export: desativados e marcados")
+        check("2 desativados" in out, "relatório conta 2 desativados")
+
+        # o admin reativa o C e esconde de novo: agora é decisão dele
+        admin_set_active(910003, True)
+        admin_set_active(910003, False)
+        check(state(910003) == (0, 0), "C escondido pelo admin perde a marca do sync")
+
+        # 3) B, C e D de volta (B com preço novo)
+        ROWS[910002] = "910002;SYNC CERVEJA B;Cervejas;6,99\n"
+        write_export(csv_path, ROWS)
+        out = run_sync(csv_path, path, snap_dir)
+        check(state(910002) == (1, 0), "B voltou ao export: reativado, marca limpa")
+        with app.app_context():
+            price = store.db_fetchone(store.db_execute(store.get_db(), "SELECT price_cents FROM products WHERE id=910002;"))[0]
+        check(int(price) == 699, "B reativado com o preço novo")
+        check(state(910003) == (0, 0), "C (escondido pelo admin) continua escondido")
+        check(state(910004) == (0, 0), "D (escondido pelo admin) continua escondido")
+        check("1 reativados" in out, "relatório conta 1 reativado")
+        check(b"SYNC CERVEJA B" in client.get("/").data, "B de volta na vitrine (snapshot republicado)")
+
+        # 4) rodar de novo o mesmo arquivo não muda nada
+        out = run_sync(csv_path, path, snap_dir)
+        check("0 novos, 0 alterados, 0 desativados, 0 reativados" in out, "segunda rodada igual: nada muda")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    print("\n%d falha(s)" % len(failures) if failures else "\ntudo certo")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
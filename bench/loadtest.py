@@ -0,0 +1,337 @@
+# bench/loadtest.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark reproduzível da vitrine e do checkout.
+
+Para cada cenário (banco x tamanho do catálogo x com/sem imagens) semeia um
+catálogo sintético, sobe o app num processo separado e dispara carga
+concorrente em /, /img/<id>.webp, /checkout, /api/whatsapp_link e /admin.
+O resultado sai em JSON (p50/p95/p99, req/s, erros e pico de RSS do servidor)
+junto com o commit, para comparar execuções entre commits.
+
+Uso:
+    python bench/loadtest.py [--sizes 200,5000,50000] [--images both|yes|no]
+                             [--concurrency 16] [--seconds 5]
+                             [--server werkzeug|gunicorn] [--output result.json]
+
+Postgres entra na matriz se BENCH_DATABASE_URL apontar para um banco
+DESCARTÁVEL (as tabelas são apagadas e recriadas a cada cenário).
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app as store  # noqa: E402
+from bench.seed import reset_postgres, seed_catalog  # noqa: E402
+
+CHECKOUT_BODY = json.dumps(
+    dict(
+        customer_name="Cliente Bench",
+        address="Rua Teste, 123",
+        phone="31999999999",
+        payment_method="Pix",
+        items=[dict(qty=2, price_cents=799, name="HEINEKEN LONG NECK"), dict(qty=1, price_cents=1200, name="GELO")],
+    )
+).encode("utf-8")
+
+
+# =========================
+# Servidor
+# =========================
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind: str, port: int, env: dict, workers: int, threads: int):
+    if kind == "gunicorn":
+        cmd = [
+            sys.executable, "-m", "gunicorn",
+            "-w", str(workers), "-k", "gthread", "--threads", str(threads),
+            "-b", f"127.0.0.1:{port}", "--log-level", "warning", "app:app",
+        ]
+    elif kind == "uvicorn":
+        cmd = [
+            sys.executable, "-m", "uvicorn", "--workers", str(workers),
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", "asgi:app",
+        ]
+        env = dict(env, ASGI_WSGI_THREADS=str(threads))
+    else:
+        cmd = [sys.executable, os.path.abspath(__file__), "serve", "--port", str(port)]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"servidor saiu com código {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/checkout")
+            conn.getresponse().read()
+            conn.close()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("servidor não respondeu em 60s")
+
+
+def process_tree(pid: int) -> list:
+    pids = [pid]
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                for child in f.read().split():
+                    pids += process_tree(int(child))
+    except OSError:
+        pass
+    return pids
+
+
+def peak_rss_kb(pid: int):
+    """
+    Soma do VmHWM (pico de RSS) do servidor e dos workers. Só Linux.
+    """
+    total = 0
+    found = False
+    for p in process_tree(pid):
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total += int(line.split()[1])
+                        found = True
+        except OSError:
+            pass
+    return total if found else None
+
+
+# =========================
+# Carga
+# =========================
+def login_cookie(port: int) -> str:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    body = urlencode(dict(username=store.ADMIN_USER, password=store.ADMIN_PASSWORD))
+    conn.request("POST", "/login", body=body, headers={"Content-Type": "application/x-www-form-urlencoded"})
+    resp = conn.getresponse()
+    resp.read()
+    cookie = resp.getheader("Set-Cookie") or ""
+    conn.close()
+    return cookie.split(";", 1)[0]
+
+
+def percentile(sorted_values, pct: float):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return round(sorted_values[k] * 1000.0, 2)
+
+
+def run_route(port: int, make_request, concurrency: int, seconds: float) -> dict:
+    """
+    `concurrency` threads, cada uma com a sua conexão keep-alive, repetindo
+    a request durante `seconds` segundos.
+    """
+    stop_at = time.perf_counter() + seconds
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(seed):
+        rnd = random.Random(seed)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        local, local_errors = [], 0
+        while time.perf_counter() < stop_at:
+            method, path, body, headers = make_request(rnd)
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status >= 400:
+                    local_errors += 1
+                else:
+                    local.append(time.perf_counter() - started)
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return dict(
+        requests=len(latencies),
+        errors=errors[0],
+        rps=round(len(latencies) / elapsed, 1),
+        p50_ms=percentile(latencies, 50),
+        p95_ms=percentile(latencies, 95),
+        p99_ms=percentile(latencies, 99),
+    )
+
+
+def route_plan(products: int, with_images: bool, cookie: str) -> list:
+    json_headers = {"Content-Type": "application/json"}
+    plan = [
+        ("index", lambda rnd: ("GET", "/", None, {})),
+        ("checkout", lambda rnd: ("GET", "/checkout", None, {})),
+        ("api_whatsapp_link", lambda rnd: ("POST", "/api/whatsapp_link", CHECKOUT_BODY, json_headers)),
+        ("admin", lambda rnd: ("GET", "/admin", None, {"Cookie": cookie})),
+    ]
+    if with_images:
+        plan.insert(1, ("product_image", lambda rnd: ("GET", f"/img/{rnd.randint(1, products)}.webp", None, {})))
+    return plan
+
+
+# =========================
+# Cenários
+# =========================
+def run_scenario(backend: str, products: int, with_images: bool, args) -> dict:
+    env = dict(os.environ)
+    env.pop("DATABASE_URL", None)
+    env["SERVER_TIMING"] = "0"
+    env["RATE_LIMIT"] = "0"  # a carga vem toda do mesmo IP
+    tmp_path = None
+
+    if backend == "postgres":
+        env["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"]
+        app = store.create_app({"DATABASE_URL": env["DATABASE_URL"]})
+        reset_postgres(app)
+    else:
+        fd, tmp_path = tempfile.mkstemp(prefix="loadtest_", suffix=".sqlite3")
+        os.close(fd)
+        env["SQLITE_PATH"] = tmp_path
+        app = store.create_app({"DATABASE_URL": "", "SQLITE_PATH": tmp_path})
+
+    try:
+        t0 = time.perf_counter()
+        blob_bytes = seed_catalog(app, products, with_images=with_images)
+        seed_s = time.perf_counter() - t0
+
+        port = free_port()
+        proc = start_server(args.server, port, env, args.workers, args.threads)
+        try:
+            cookie = login_cookie(port)
+            routes = {}
+            for name, make_request in route_plan(products, with_images, cookie):
+                run_route(port, make_request, 1, min(1.0, args.seconds))  # aquecimento
+                routes[name] = run_route(port, make_request, args.concurrency, args.seconds)
+                print(f"  {backend:8s} {products:6d} img={int(with_images)} {name:18s} {routes[name]}", file=sys.stderr)
+            rss = peak_rss_kb(proc.pid)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+        return dict(
+            backend=backend,
+            products=products,
+            images=with_images,
+            image_bytes=blob_bytes,
+            seed_seconds=round(seed_s, 2),
+            server_peak_rss_kb=rss,
+            routes=routes,
+        )
+    finally:
+        if tmp_path:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(tmp_path + suffix)
+                except OSError:
+                    pass
+
+
+def git_revision() -> dict:
+    def git(*a):
+        try:
+            return subprocess.check_output(["git", *a], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+        except Exception:
+            return None
+
+    return dict(commit=git("rev-parse", "HEAD"), dirty=bool(git("status", "--porcelain", "--untracked-files=no")))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de carga da vitrine/checkout.")
+    sub = parser.add_subparsers(dest="cmd")
+    serve = sub.add_parser("serve", help="(interno) sobe o app com o servidor do werkzeug")
+    serve.add_argument("--port", type=int, required=True)
+
+    parser.add_argument("--sizes", default="200,5000,50000")
+    parser.add_argument("--images", choices=("both", "yes", "no"), default="both")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--server", choices=("werkzeug", "gunicorn", "uvicorn"), default="werkzeug")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn/uvicorn: processos")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn/uvicorn: threads por processo")
+    parser.add_argument("--output", default="", help="grava o JSON neste arquivo (além do stdout)")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "serve":
+        store.app.run(host="127.0.0.1", port=args.port, threaded=True, debug=False, use_reloader=False)
+        return 0
+
+    backends = ["sqlite"] + (["postgres"] if os.getenv("BENCH_DATABASE_URL") else [])
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    image_modes = {"both": (False, True), "yes": (True,), "no": (False,)}[args.images]
+
+    scenarios = [
+        run_scenario(backend, size, with_images, args)
+        for backend in backends
+        for size in sizes
+        for with_images in image_modes
+    ]
+
+    result = dict(
+        git=git_revision(),
+        timestamp=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        cpus=os.cpu_count(),
+        params=dict(
+            concurrency=args.concurrency,
+            seconds=args.seconds,
+            server=args.server,
+            workers=args.workers,
+            threads=args.threads,
+        ),
+        scenarios=scenarios,
+    )
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# bench/seed.py
+# -*- coding: utf-8 -*-
+"""
+Catálogo sintético para os benchmarks (usa o schema do app via init_db).
+
+As funções recebem um app apontando para um banco DESCARTÁVEL:
+    store.create_app({"SQLITE_PATH": "/tmp/x.sqlite3"})   (SQLite)
+    store.create_app({"DATABASE_URL": "postgresql://..."})   (Postgres)
+"""
+
+import os
+import random
+import sys
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store  # noqa: E402
+
+
+def make_image_blob(size: int = 800) -> bytes:
+    """
+    Um WEBP 800x800 com cara de foto (gradiente + ruído), no mesmo formato
+    que process_image_to_webp_bytes gera.
+    """
+    Image, _ = store.load_pillow()
+    if Image is None:
+        raise RuntimeError("Pillow não está instalado. Rode: pip install pillow")
+    img = Image.radial_gradient("L").resize((size, size)).convert("RGB")
+    # ruído em baixa resolução ampliado: dá ~30 KB, perto de uma foto real de produto
+    noise = Image.effect_noise((size // 8, size // 8), 40).resize((size, size)).convert("RGB")
+    img = Image.blend(img, noise, 0.35)
+    out = BytesIO()
+    img.save(out, "WEBP", quality=82, method=6)
+    return out.getvalue()
+
+
+def reset_postgres(app):
+    with app.app_context():
+        db = store.get_db()
+        store.db_execute(db, "DROP TABLE IF EXISTS promotions, products, categories, store_settings, stores, settings CASCADE;")
+        db.commit()
+        # mesmo banco, schema novo: init_db/ensure_indexes precisam rodar de novo
+        store._schema_ready.discard(store.db_key())
+        store._indexes_ready.discard(store.db_key())
+
+
+def seed_catalog(app, products: int, with_images: bool = False, categories: int = 30, seed: int = 42, batch: int = 1000):
+    """
+    Cria o schema e insere `products` produtos em `categories` categorias
+    (10% em promoção, 5% inativos). Com with_images, todo produto recebe o
+    mesmo blob WEBP. Retorna o tamanho do blob (0 sem imagens).
+    """
+    rnd = random.Random(seed)
+    blob = make_image_blob() if with_images else None
+
+    with app.app_context():
+        store.init_db()
+        db = store.get_db()
+        pg = store.using_postgres()
+        ph = "%s" if pg else "?"
+
+        for i in range(categories):
+            store.db_execute(db, f"INSERT INTO categories (name, is_active) VALUES ({ph}, 1);", (f"Categoria {i:02d}",))
+        db.commit()
+        cur = store.db_execute(db, "SELECT id FROM categories;")
+        cat_ids = [r[0] for r in store.db_fetchall(cur)]
+
+        sql = (
+            "INSERT INTO products (name, description, price_cents, image_url, category_id, "
+            "is_active, is_promo, promo_price_cents, image_blob, image_mime) "
+            f"VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph});"
+        )
+
+        def rows(start, end):
+            for i in range(start, end):
+                promo = rnd.random() < 0.1
+                price = rnd.randint(150, 15000)
+                yield (
+                    f"PRODUTO {i:06d}",
+                    f"descrição do produto {i}",
+                    price,
+                    "",
+                    rnd.choice(cat_ids),
+                    0 if rnd.random() < 0.05 else 1,
+                    1 if promo else 0,
+                    int(price * 0.85) if promo else None,
+                    blob,
+                    "image/webp" if blob is not None else None,
+                )
+
+        for start in range(0, products, batch):
+            chunk = list(rows(start, min(products, start + batch)))
+            if pg:
+                with db.cursor() as c:
+                    c.executemany(sql, chunk)
+            else:
+                db.executemany(sql, chunk)
+            db.commit()
+
+        if blob is not None:
+            # mesmo formato que save_image_to_db deixa
+            Image, _ = store.load_pillow()
+            version = store.product_image_url(0, blob).split("?", 1)[1]
+            placeholder = store.image_placeholder(Image.open(BytesIO(blob)))
+            store.db_execute(
+                db,
+                "UPDATE products SET image_url='/img/' || id || '.webp?%s', image_placeholder=%s;" % (version, "%s" if pg else "?"),
+                (placeholder,),
+            )
+            db.commit()
+
+        store.db_execute(db, "ANALYZE;")
+        db.commit()
+
+    return len(blob) if blob is not None else 0
@@ -0,0 +1,306 @@
+# gerar_assets.py
+# -*- coding: utf-8 -*-
+"""
+Gera os assets estáticos servidos pelo próprio app (sem CDN no caminho crítico).
+
+Uso:
+    python gerar_assets.py [--offline] [--keep-old]
+
+O que faz:
+- baixa Bootstrap (CSS/JS), bootstrap-icons e a Poppins (Google Fonts) para
+  .assets_cache/ (--offline usa só o que já está lá);
+- bootstrap-icons: só as regras dos ícones usados nos templates, e a fonte
+  reduzida a esses glifos (precisa de fonttools);
+- Poppins: só os subsets latin e latin-ext;
+- brand/logo.png e brand/banner.jpg viram WEBP nos tamanhos usados no layout;
+- CSS de static/css/ com as url(...) reescritas para os arquivos gerados;
+- tudo vai para static/dist/ com hash do conteúdo no nome, irmãos .gz e .br
+  (.br precisa do pacote brotli) e um manifest.json lido por asset_url().
+
+Se um download falhar o asset fica fora do manifest e o app continua usando
+o CDN para ele. No Railway rode no build:
+    pip install -r requirements.txt && python gerar_assets.py
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import posixpath
+import re
+import shutil
+import sys
+import urllib.request
+from io import BytesIO
+from pathlib import Path
+
+from app import ASSET_FALLBACKS, ASSETS_DIR, load_pillow
+
+# Brotli (opcional: sem ele só sai .gz)
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+# fonttools (opcional: sem ele a fonte de ícones vai inteira)
+try:
+    from fontTools import subset as font_subset
+except Exception:
+    font_subset = None
+
+BASE_DIR = Path(__file__).resolve().parent
+STATIC_DIR = BASE_DIR / "static"
+TEMPLATES_DIR = BASE_DIR / "templates"
+CACHE_DIR = BASE_DIR / ".assets_cache"
+DIST_DIR = Path(ASSETS_DIR)
+
+BOOTSTRAP_ICONS_FONT = "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/fonts/bootstrap-icons.woff2"
+VENDOR_FILES = {
+    "vendor/bootstrap.min.css": ASSET_FALLBACKS["vendor/bootstrap.min.css"],
+    "vendor/bootstrap.bundle.min.js": ASSET_FALLBACKS["vendor/bootstrap.bundle.min.js"],
+}
+POPPINS_SUBSETS = ("latin", "latin-ext")
+# o Google Fonts só manda woff2 para navegadores que ele reconhece
+BROWSER_UA = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+# origem -> [(nome lógico, largura, corta em quadrado?)]
+# os logos aparecem em círculos de 44px (navbar) e 96px (vitrine) com
+# object-fit: cover, então o recorte quadrado não muda nada na tela (2x p/ retina)
+IMAGE_VARIANTS = {
+    "brand/logo.png": [
+        ("brand/logo-96.webp", 96, True),
+        ("brand/logo-192.webp", 192, True),
+        ("brand/logo-512.webp", 512, True),  # ícone do PWA (manifest)
+    ],
+    "brand/banner.jpg": [("brand/banner-1600.webp", 1600, False)],
+}
+STYLESHEETS = ("css/base.css", "css/index.css", "css/checkout.css")
+
+COMPRESSIBLE = (".css", ".js", ".svg", ".json")
+CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+ICON_RULE_RE = re.compile(r"""\.bi-([a-z0-9-]+)::before\s*\{\s*content:\s*"\\([0-9a-f]+)"\s*;?\s*\}""")
+FONT_FACE_RE = re.compile(r"@font-face\s*\{[^}]*\}")
+FONT_BLOCK_RE = re.compile(r"/\*\s*([a-z-]+)\s*\*/\s*(@font-face\s*\{[^}]*\})")
+ICON_USE_RE = re.compile(r"\bbi-([a-z0-9]+(?:-[a-z0-9]+)*)")
+
+
+# =========================
+# Downloads (com cache local)
+# =========================
+def fetch(url: str, offline: bool, user_agent: str = "") -> bytes:
+    name = hashlib.sha1(f"{url}|{user_agent}".encode("utf-8")).hexdigest()[:16] + "-" + posixpath.basename(url.split("?")[0])
+    cached = CACHE_DIR / name
+    if cached.exists():
+        return cached.read_bytes()
+    if offline:
+        raise OSError(f"não está em {CACHE_DIR.name}/ (rodando com --offline)")
+    req = urllib.request.Request(url, headers={"User-Agent": user_agent or "gerar_assets"})
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        data = resp.read()
+    CACHE_DIR.mkdir(exist_ok=True)
+    cached.write_bytes(data)
+    return data
+
+
+# =========================
+# Saída com hash + .gz/.br
+# =========================
+class Dist:
+    def __init__(self, root: Path):
+        self.root = root
+        self.manifest = {}
+        self.sizes = {}
+
+    def emit(self, logical: str, data: bytes) -> str:
+        """
+        Grava `data` como <dir>/<nome>.<hash><ext> e devolve o caminho relativo.
+        """
+        stem, ext = posixpath.splitext(logical)
+        digest = hashlib.sha256(data).hexdigest()[:10]
+        rel = f"{stem}.{digest}{ext}"
+        out = self.root / rel
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_bytes(data)
+        sizes = dict(raw=len(data))
+        if ext in COMPRESSIBLE:
+            gz = gzip.compress(data, compresslevel=9, mtime=0)
+            Path(str(out) + ".gz").write_bytes(gz)
+            sizes["gz"] = len(gz)
+            if brotli is not None:
+                br = brotli.compress(data, quality=11)
+                Path(str(out) + ".br").write_bytes(br)
+                sizes["br"] = len(br)
+        self.manifest[logical] = rel
+        self.sizes[logical] = sizes
+        return rel
+
+    def relative_url(self, from_logical: str, to_logical: str) -> str:
+        """
+        URL relativa do arquivo gerado `to_logical` visto de dentro de `from_logical`.
+        """
+        return posixpath.relpath(self.manifest[to_logical], posixpath.dirname(from_logical) or ".")
+
+    def write_manifest(self):
+        (self.root / "manifest.json").write_text(json.dumps(self.manifest, indent=2, sort_keys=True), encoding="utf-8")
+
+
+# =========================
+# Etapas
+# =========================
+def used_icons() -> set:
+    names = set()
+    for path in TEMPLATES_DIR.glob("*.html"):
+        names.update(ICON_USE_RE.findall(path.read_text(encoding="utf-8")))
+    return names
+
+
+def build_images(dist: Dist):
+    Image, ImageOps = load_pillow()
+    if Image is None:
+        raise RuntimeError("Pillow não está instalado. Rode: pip install pillow")
+    for source, variants in IMAGE_VARIANTS.items():
+        path = STATIC_DIR / source
+        if not path.exists():
+            print(f"  ! {source}: não encontrado, pulando")
+            continue
+        with Image.open(path) as original:
+            img = ImageOps.exif_transpose(original)
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+            for logical, width, square in variants:
+                variant = img
+                if square:
+                    side = min(img.size)
+                    left, top = (img.width - side) // 2, (img.height - side) // 2
+                    variant = img.crop((left, top, left + side, top + side))
+                if variant.width > width:
+                    height = round(variant.height * width / variant.width)
+                    variant = variant.resize((width, height), Image.Resampling.LANCZOS)
+                out = BytesIO()
+                variant.save(out, "WEBP", quality=85, method=6)
+                dist.emit(logical, out.getvalue())
+                print(f"  {logical}: {path.stat().st_size} B -> {len(out.getvalue())} B")
+
+
+def build_vendor(dist: Dist, offline: bool):
+    for logical, url in VENDOR_FILES.items():
+        dist.emit(logical, fetch(url, offline))
+        print(f"  {logical}")
+
+
+def build_icons(dist: Dist, offline: bool):
+    css = fetch(ASSET_FALLBACKS["vendor/bootstrap-icons.css"], offline).decode("utf-8")
+    font = fetch(BOOTSTRAP_ICONS_FONT, offline)
+
+    used = used_icons()
+    rules = {name: code for name, code in ICON_RULE_RE.findall(css)}
+    kept = {name: code for name, code in rules.items() if name in used}
+
+    if font_subset is not None and kept:
+        options = font_subset.Options()
+        options.flavor = "woff2"
+        options.layout_features = []
+        options.name_IDs = []
+        options.notdef_outline = True
+        ttf = font_subset.load_font(BytesIO(font), options)
+        subsetter = font_subset.Subsetter(options)
+        subsetter.populate(unicodes=[int(code, 16) for code in kept.values()])
+        subsetter.subset(ttf)
+        out = BytesIO()
+        font_subset.save_font(ttf, out, options)
+        font_out = out.getvalue()
+    else:
+        if font_subset is None:
+            print("  ! fonttools não instalado: fonte de ícones vai inteira (pip install fonttools)")
+        font_out = font
+    dist.emit("vendor/fonts/bootstrap-icons.woff2", font_out)
+
+    # @font-face só com o woff2 gerado; regras só dos ícones usados
+    font_url = dist.relative_url("vendor/bootstrap-icons.css", "vendor/fonts/bootstrap-icons.woff2")
+    face = FONT_FACE_RE.search(css).group(0)
+    face = re.sub(r"src:[^;}]*", f'src:url("{font_url}") format("woff2")', face)
+    body = ICON_RULE_RE.sub("", FONT_FACE_RE.sub("", css))
+    license_comment = re.match(r"\s*/\*!.*?\*/", body, re.S)
+    head = license_comment.group(0) if license_comment else ""
+    icons = "".join(f'.bi-{name}::before{{content:"\\{code}"}}' for name, code in sorted(kept.items()))
+    dist.emit("vendor/bootstrap-icons.css", (head + face + body[len(head):] + icons).encode("utf-8"))
+    print(f"  vendor/bootstrap-icons.css: {len(kept)} de {len(rules)} ícones, fonte {len(font)} B -> {len(font_out)} B")
+
+
+def build_poppins(dist: Dist, offline: bool):
+    css = fetch(ASSET_FALLBACKS["vendor/poppins.css"], offline, user_agent=BROWSER_UA).decode("utf-8")
+    blocks = []
+    for subset_name, block in FONT_BLOCK_RE.findall(css):
+        if subset_name not in POPPINS_SUBSETS:
+            continue
+        weight = re.search(r"font-weight:\s*(\d+)", block).group(1)
+        url = CSS_URL_RE.search(block).group(2)
+        logical = f"vendor/fonts/poppins-{weight}-{subset_name}.woff2"
+        dist.emit(logical, fetch(url, offline))
+        blocks.append(f"/* {subset_name} */\n" + block.replace(url, dist.relative_url("vendor/poppins.css", logical)))
+    if not blocks:
+        raise OSError("resposta do Google Fonts sem blocos latin/latin-ext")
+    dist.emit("vendor/poppins.css", "\n".join(blocks).encode("utf-8"))
+    print(f"  vendor/poppins.css: {len(blocks)} arquivos woff2")
+
+
+def build_stylesheets(dist: Dist):
+    # url(...) relativas a static/ que apontam para algo gerado (ex.: banner.jpg -> webp)
+    replacements = {}
+    for source, variants in IMAGE_VARIANTS.items():
+        if variants[0][0] in dist.manifest:
+            replacements[source] = variants[0][0]
+
+    for logical in STYLESHEETS:
+        css = (STATIC_DIR / logical).read_text(encoding="utf-8")
+
+        def rewrite(m, logical=logical):
+            ref = m.group(2)
+            if ref.startswith(("/", "data:", "http:", "https:")):
+                return m.group(0)
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(logical), ref))
+            built = replacements.get(target)
+            if built is None:
+                # não foi gerado: aponta para o original em /static/
+                return f'url("/static/{target}")'
+            return f'url("{dist.relative_url(logical, built)}")'
+
+        dist.emit(logical, CSS_URL_RE.sub(rewrite, css).encode("utf-8"))
+        print(f"  {logical}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera static/dist (assets com hash, .gz/.br e manifest).")
+    parser.add_argument("--offline", action="store_true", help="não baixa nada; usa só .assets_cache/")
+    parser.add_argument("--keep-old", action="store_true", help="não apaga os arquivos da geração anterior")
+    args = parser.parse_args(argv)
+
+    if DIST_DIR.exists() and not args.keep_old:
+        shutil.rmtree(DIST_DIR)
+    DIST_DIR.mkdir(parents=True, exist_ok=True)
+    dist = Dist(DIST_DIR)
+    if brotli is None:
+        print("! brotli não instalado: só .gz (pip install brotli)")
+
+    print("Imagens:")
+    build_images(dist)
+
+    failed = []
+    print("Vendor:")
+    for step in (build_vendor, build_icons, build_poppins):
+        try:
+            step(dist, args.offline)
+        except Exception as e:
+            failed.append(step.__name__)
+            print(f"  ! {step.__name__}: {e} (continua pelo CDN)")
+
+    print("CSS:")
+    build_stylesheets(dist)
+
+    dist.write_manifest()
+    total = sum(s["raw"] for s in dist.sizes.values())
+    print(f"{len(dist.manifest)} arquivos em {DIST_DIR.relative_to(BASE_DIR)} ({total} B sem compressão)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
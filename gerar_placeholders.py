@@ -0,0 +1,104 @@
+# gerar_placeholders.py
+# -*- coding: utf-8 -*-
+"""
+Gera o placeholder (LQIP) das imagens que já estão no banco.
+
+Uploads novos já saem com placeholder (process_image_to_webp_bytes); este
+script cobre os produtos antigos. Anda pelo catálogo em lotes por id (uma
+imagem por vez na memória) e commita a cada lote, então dá pra interromper
+e rodar de novo: só pega quem ainda está sem placeholder.
+
+Também versiona a URL da imagem (/img/<id>.webp?v=...) de quem ainda não
+tem, para o cache do navegador/service worker. Só entra quem mostra o blob
+(image_url em /img/): produto com link externo guarda o blob antigo de
+propósito (ver maintenance_gc_images) e não é mexido.
+
+Uso:
+    python gerar_placeholders.py [--all] [--batch 100]
+
+--all refaz todos (ex.: depois de mudar PLACEHOLDER_SIZE no app.py).
+"""
+
+import argparse
+import sys
+import time
+from io import BytesIO
+
+import app as store
+
+
+def pending_batch(db, after_id: int, batch: int, redo_all: bool) -> list:
+    ph = "%s" if store.using_postgres() else "?"
+    only_missing = "" if redo_all else "AND (image_placeholder IS NULL OR image_placeholder = '')"
+    cur = store.db_execute(
+        db,
+        f"""
+        SELECT id, image_blob, image_url FROM products
+        WHERE id > {ph} AND image_blob IS NOT NULL AND image_url LIKE '/img/%' {only_missing}
+        ORDER BY id
+        LIMIT {ph};
+        """,
+        (after_id, batch),
+    )
+    return [(int(r[0]), bytes(r[1]), r[2] or "") for r in store.db_fetchall(cur)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera placeholders (LQIP) das imagens já cadastradas.")
+    parser.add_argument("--all", action="store_true", help="refaz também quem já tem placeholder")
+    parser.add_argument("--batch", type=int, default=100, help="imagens por commit")
+    args = parser.parse_args(argv)
+
+    Image, _ = store.load_pillow()
+    if Image is None:
+        print("Pillow não está instalado. Rode: pip install pillow", file=sys.stderr)
+        return 1
+
+    app = store.create_app()
+    ph = "%s" if store.using_postgres() else "?"
+    started = time.perf_counter()
+    done = errors = placeholder_bytes = 0
+    with app.app_context():
+        store.init_db()
+        db = store.get_db()
+        last_id = 0
+        while True:
+            rows = pending_batch(db, last_id, max(1, args.batch), args.all)
+            if not rows:
+                break
+            for pid, blob, image_url in rows:
+                last_id = pid
+                try:
+                    with Image.open(BytesIO(blob)) as img:
+                        placeholder = store.image_placeholder(img)
+                except Exception as e:
+                    errors += 1
+                    print(f"  ! produto {pid}: {e}", file=sys.stderr)
+                    continue
+                if "?v=" not in image_url:
+                    image_url = store.product_image_url(pid, blob)
+                store.db_execute(
+                    db,
+                    f"UPDATE products SET image_placeholder={ph}, image_url={ph} WHERE id={ph};",
+                    (placeholder, image_url, pid),
+                )
+                done += 1
+                placeholder_bytes += len(placeholder)
+            store.db_commit(db)
+            print(f"  ... {done} placeholder(s) até o id {last_id}")
+
+        snapshot = app.extensions.get("catalog_snapshot")
+        if snapshot is not None and done:
+            # as imagens podem ser de qualquer loja: os snapshots das outras
+            # são refeitos no primeiro request de cada uma
+            snapshot.discard_all()
+            snapshot.publish()
+
+    elapsed = time.perf_counter() - started
+    avg = placeholder_bytes // done if done else 0
+    print(f"{done} placeholder(s) gerado(s), {errors} erro(s), média de {avg} bytes, em {elapsed:.1f}s")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
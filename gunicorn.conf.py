@@ -0,0 +1,51 @@
+# gunicorn.conf.py
+# -*- coding: utf-8 -*-
+# Lido automaticamente pelo gunicorn quando ele roda nesta pasta.
+
+import os
+import tempfile
+import time
+
+# PRELOAD_WARMUP=1: o app carrega uma vez no master e é aquecido (schema,
+# templates, cache do banco) antes do fork; os workers já nascem prontos.
+preload_app = (os.getenv("PRELOAD_WARMUP") or "").strip() == "1"
+
+# rate limit com o mesmo estado em todos os workers (SQLite local, ver app.py)
+os.environ.setdefault("RATE_LIMIT_STORAGE", os.path.join(tempfile.gettempdir(), "nc_ratelimit.sqlite3"))
+
+# atrás do proxy do Railway: 1 salto, para o rate limit por IP ver o cliente
+# (e não o proxy). Sem proxy na frente, PROXY_HOPS=0 (senão o cliente escolhe
+# o próprio IP pelo X-Forwarded-For).
+os.environ.setdefault("PROXY_HOPS", "1")
+
+# agendador de manutenção só no servidor (MAINTENANCE=0 desliga; ver app.py)
+os.environ.setdefault("MAINTENANCE", "1")
+
+
+def when_ready(server):
+    if preload_app:
+        from app import warm_up
+
+        started = time.perf_counter()
+        warm_up(server.app.wsgi())
+        server.log.info("Warm-up em %.0f ms", (time.perf_counter() - started) * 1000.0)
+
+    # METRICS_PORT: /metrics agregado de todos os workers numa porta separada
+    # (só faz sentido com PROMETHEUS_MULTIPROC_DIR definido)
+    port = (os.getenv("METRICS_PORT") or "").strip()
+    if port and os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import CollectorRegistry, start_http_server
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(int(port), registry=registry)
+        server.log.info("Métricas em :%s/metrics", port)
+
+
+def child_exit(server, worker):
+    # tira os gauges "live" do worker que morreu da agregação
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,278 +1,648 @@
-# importar_produtos.py
-# -*- coding: utf-8 -*-
-
-import sqlite3
-from pathlib import Path
-
-BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = BASE_DIR / "database.sqlite3"
-
-
-def money_to_cents(v: float) -> int:
-    return int(round(v * 100))
-
-
-def get_or_create_category(conn, category_name: str):
-    cur = conn.cursor()
-
-    row = cur.execute(
-        "SELECT id FROM categories WHERE name=?;",
-        (category_name.strip(),)
-    ).fetchone()
-
-    if row:
-        return row[0]
-
-    cur.execute(
-        "INSERT INTO categories (name, is_active) VALUES (?, 1);",
-        (category_name.strip(),)
-    )
-    conn.commit()
-
-    return cur.lastrowid
-
-
-def upsert_product(conn, product):
-    cur = conn.cursor()
-
-    category_id = get_or_create_category(conn, product["category"])
-
-    cur.execute("""
-        INSERT INTO products (
-            id,
-            name,
-            description,
-            price_cents,
-            image_url,
-            category_id,
-            category,
-            is_active,
-            is_promo,
-            promo_price_cents
-        )
-        VALUES (?, ?, '', ?, '', ?, NULL, 1, 0, NULL)
-        ON CONFLICT(id) DO UPDATE SET
-            name=excluded.name,
-            price_cents=excluded.price_cents,
-            category_id=excluded.category_id,
-            is_active=1
-    """, (
-        int(product["id"]),
-        product["name"].strip(),
-        money_to_cents(float(product["price"])),
-        category_id
-    ))
-
-    conn.commit()
-
-
-def main():
-    conn = sqlite3.connect(DB_PATH)
-
-    # 👇 COLE AQUI SUA LISTA COMPLETA ORIGINAL 👇
-    produtos = [
-        # REFRIGERANTES (SUKITA)
-        # ------------------------
-        {"id": 73, "name": "SUKITA LARANJA 2 LITROS", "category": "Refrigerantes", "price": 7.99, "stock": 4},
-        {"id": 62, "name": "SUKITA LATA 350 ML", "category": "Refrigerantes", "price": 3.50, "stock": 18},
-        {"id": 74, "name": "SUKITA LIMÃO 2 LITROS", "category": "Refrigerantes", "price": 7.99, "stock": 0},
-        {"id": 54, "name": "SUKITA PET 200 ML", "category": "Refrigerantes", "price": 2.00, "stock": 11},
-        {"id": 72, "name": "SUKITA UVA 2 LITROS", "category": "Refrigerantes", "price": 7.99, "stock": 0},
-        {"id": 56, "name": "SUKITA UVA 200 ML", "category": "Refrigerantes", "price": 2.00, "stock": 0},
-        {"id": 63, "name": "SUKITA UVA LATA 350 ML", "category": "Refrigerantes", "price": 3.50, "stock": 2},
-
-        # ------------------------
-        # SORVETES / PICOLES
-        # ------------------------
-        {"id": 222, "name": "SUNDAE LEITINHO C/ COB. CHOCOLATE 130 ML", "category": "Sorvetes e Picolés", "price": 7.90, "stock": 8},
-        {"id": 220, "name": "SORVETE FLOCOS 400 ML", "category": "Sorvetes e Picolés", "price": 2.00, "stock": 2},
-        {"id": 221, "name": "SORVETE NAPOLITANO 400 ML", "category": "Sorvetes e Picolés", "price": 11.50, "stock": 3},
-        {"id": 210, "name": "PICOLÉ CARIBENHO", "category": "Sorvetes e Picolés", "price": 10.00, "stock": 0},
-        {"id": 209, "name": "PICOLÉ DE BRIGADEIRO RECHEADO", "category": "Sorvetes e Picolés", "price": 8.25, "stock": 24},
-        {"id": 211, "name": "PICOLÉ DE COCO", "category": "Sorvetes e Picolés", "price": 8.25, "stock": 23},
-        {"id": 214, "name": "PICOLÉ DE LIMÃO", "category": "Sorvetes e Picolés", "price": 5.25, "stock": 30},
-        {"id": 217, "name": "PICOLÉ DE UVA", "category": "Sorvetes e Picolés", "price": 5.00, "stock": 29},
-        {"id": 212, "name": "PICOLÉ DUELLITO", "category": "Sorvetes e Picolés", "price": 5.00, "stock": 29},
-        {"id": 213, "name": "PICOLÉ EXTRA CROC", "category": "Sorvetes e Picolés", "price": 8.90, "stock": 26},
-        {"id": 215, "name": "PICOLÉ MORANGO", "category": "Sorvetes e Picolés", "price": 12.90, "stock": 21},
-
-        # ------------------------
-        # SUCOS / CHÁS
-        # ------------------------
-        {"id": 165, "name": "TIAL NECTAR 250 ML", "category": "Sucos", "price": 4.00, "stock": 25},
-        {"id": 104, "name": "SUCO TIAL 330 ML", "category": "Sucos", "price": 3.99, "stock": 1},
-        {"id": 106, "name": "SUCO TIAL 1 L", "category": "Sucos", "price": 5.00, "stock": 10},
-
-        # ------------------------
-        # ENERGÉTICOS
-        # ------------------------
-        {"id": 6, "name": "RED BULL TROPICAL", "category": "Energéticos", "price": 10.50, "stock": 4},
-        {"id": 75, "name": "RED BULL LATA 250 ML", "category": "Energéticos", "price": 10.50, "stock": 7},
-        {"id": 78, "name": "RED BULL LATÃO 473 ML", "category": "Energéticos", "price": 16.99, "stock": 18},
-        {"id": 77, "name": "RED BULL MELANCIA LATA 250 ML", "category": "Energéticos", "price": 10.50, "stock": 3},
-        {"id": 76, "name": "RED BULL ZERO LATA 250 ML", "category": "Energéticos", "price": 10.50, "stock": 4},
-        {"id": 176, "name": "RED HOUSE ENERGÉTICO 2 L", "category": "Energéticos", "price": 12.90, "stock": 5},
-        {"id": 203, "name": "ENGOV 250 ML", "category": "Energéticos", "price": 15.99, "stock": 4},
-        {"id": 81, "name": "FUSION ENERGÉTICO 2 LITROS", "category": "Energéticos", "price": 10.00, "stock": 7},
-        {"id": 79, "name": "FUSION ENERGÉTICO LATÃO 473 ML", "category": "Energéticos", "price": 6.00, "stock": 7},
-        {"id": 82, "name": "FUSION TROPICAL 2 LITROS", "category": "Energéticos", "price": 9.99, "stock": 0},
-
-        # ------------------------
-        # ÁGUA / TÔNICA
-        # ------------------------
-        {"id": 168, "name": "TÔNICA ANTARCTICA ZERO 350 ML", "category": "Água", "price": 4.20, "stock": 14},
-        {"id": 156, "name": "TÔNICA FYS", "category": "Água", "price": 4.50, "stock": 1},
-        {"id": 65, "name": "TÔNICA LATA 350 ML", "category": "Água", "price": 4.20, "stock": 4},
-        {"id": 178, "name": "ÁGUA MINERAL 240 ML", "category": "Água", "price": 2.50, "stock": 1},
-        {"id": 97, "name": "ÁGUA MINERAL PUREZ VITAL C/ GÁS", "category": "Água", "price": 1.50, "stock": 22},
-        {"id": 171, "name": "CRYSTAL COM GÁS SABORIZADA 510 ML", "category": "Água", "price": 4.00, "stock": 11998},
-
-        # ------------------------
-        # CERVEJAS (parte)
-        # ------------------------
-        {"id": 44, "name": "SPATEN GARRAFA 600 ML", "category": "Cervejas", "price": 9.99, "stock": 16},
-        {"id": 16, "name": "SPATEN LATÃO 473 ML", "category": "Cervejas", "price": 6.40, "stock": 59},
-        {"id": 12, "name": "SPATEN LONG NECK 330 ML", "category": "Cervejas", "price": 7.50, "stock": 24},
-
-        {"id": 42, "name": "STELLA ARTOIS GARRAFA 600 ML", "category": "Cervejas", "price": 10.60, "stock": 43},
-        {"id": 11, "name": "STELLA ARTOIS LONG NECK 330 ML", "category": "Cervejas", "price": 7.50, "stock": 0},
-        {"id": 138, "name": "STELLA LATÃO", "category": "Cervejas", "price": 6.30, "stock": 64},
-        {"id": 162, "name": "STELLA PURE GOLD LATA 350 ML", "category": "Cervejas", "price": 5.99, "stock": 9},
-        {"id": 10, "name": "STELLA PURE GOLD LATÃO 473 ML", "category": "Cervejas", "price": 7.00, "stock": 0},
-        {"id": 8, "name": "STELLA PURE GOLD LONG NECK 330 ML", "category": "Cervejas", "price": 7.50, "stock": 21},
-        {"id": 19, "name": "SUB-ZERO LATÃO 473 ML", "category": "Cervejas", "price": 5.00, "stock": 38},
-
-        {"id": 37, "name": "BUDWEISER LITRINHO 300 ML", "category": "Cervejas", "price": 3.50, "stock": 112},
-        {"id": 1, "name": "BUDWEISER LONG NECK 330 ML", "category": "Cervejas", "price": 6.50, "stock": 32},
-        {"id": 2, "name": "BUDWEISER ZERO LATA 350 ML", "category": "Cervejas", "price": 4.80, "stock": 0},
-        {"id": 9, "name": "BUDWEISER ZERO LONG NECK 330 ML", "category": "Cervejas", "price": 6.70, "stock": 18},
-        {"id": 174, "name": "BUDWEISER 1 L", "category": "Cervejas", "price": 9.99, "stock": 0},
-
-        {"id": 21, "name": "BOA LATÃO 473 ML", "category": "Cervejas", "price": 4.80, "stock": 179},
-        {"id": 47, "name": "BOA LITRÃO", "category": "Cervejas", "price": 9.99, "stock": 1},
-        {"id": 35, "name": "BOA LITRINHO 300 ML", "category": "Cervejas", "price": 3.50, "stock": 134},
-        {"id": 13, "name": "BOHEMIA LATÃO 473 ML", "category": "Cervejas", "price": 5.40, "stock": 50},
-        {"id": 24, "name": "BRAHMA DUPLO MALTE LATÃO 473 ML", "category": "Cervejas", "price": 3.50, "stock": 118},
-        {"id": 39, "name": "BRAHMA DUPLO MALTE LITRINHO", "category": "Cervejas", "price": 6.10, "stock": 7},
-        {"id": 45, "name": "BRAHMA GARRAFA 600 ML", "category": "Cervejas", "price": 4.00, "stock": 115},
-        {"id": 5, "name": "BRAHMA LATÃO 473 ML", "category": "Cervejas", "price": 8.50, "stock": 32},
-        {"id": 46, "name": "BRAHMA LITRÃO", "category": "Cervejas", "price": 5.50, "stock": 193},
-        {"id": 34, "name": "BRAHMA LITRINHO 300 ML", "category": "Cervejas", "price": 10.50, "stock": 10},
-        {"id": 23, "name": "BRAHMA ZERO LATA 350 ML", "category": "Cervejas", "price": 3.50, "stock": 153},
-        {"id": 88, "name": "BRUTAL FRUIT", "category": "Cervejas", "price": 4.80, "stock": 0},
-        {"id": 40, "name": "BUDWEISER GARRAFA 600 ML", "category": "Cervejas", "price": 10.99, "stock": 0},
-        {"id": 25, "name": "BUDWEISER LATA 350 ML", "category": "Cervejas", "price": 8.50, "stock": 0},
-        {"id": 15, "name": "BUDWEISER LATÃO 473 ML", "category": "Cervejas", "price": 6.00, "stock": 15},
-
-        # ------------------------
-        # SKOL BEATS / ICE
-        # ------------------------
-        {"id": 145, "name": "SKOL BEATS RED MIX LONG NECK", "category": "Gelo e Drinks Prontos", "price": 7.50, "stock": 25},
-        {"id": 90, "name": "SKOL BEATS SENSES LATA 269 ML", "category": "Gelo e Drinks Prontos", "price": 7.50, "stock": 2},
-        {"id": 85, "name": "SKOL BEATS SENSES LONG NECK", "category": "Gelo e Drinks Prontos", "price": 7.50, "stock": 17},
-        {"id": 93, "name": "SKOL BEATS TROPICAL LATA 269 ML", "category": "Gelo e Drinks Prontos", "price": 8.50, "stock": 7},
-        {"id": 83, "name": "SKOL BEATS TROPICAL LONG NECK", "category": "Gelo e Drinks Prontos", "price": 8.50, "stock": 22},
-        {"id": 146, "name": "SKOL BEATS RED MIX LATA", "category": "Gelo e Drinks Prontos", "price": 6.00, "stock": 0},
-        {"id": 87, "name": "51 ICE BALADA", "category": "Gelo e Drinks Prontos", "price": 7.99, "stock": 0},
-
-        # ------------------------
-        # REFRIGERANTES (PEPSI)
-        # ------------------------
-        {"id": 70, "name": "PEPSI BLACK 2 LITROS", "category": "Refrigerantes", "price": 10.00, "stock": 0},
-        {"id": 53, "name": "PEPSI BLACK 200 ML", "category": "Refrigerantes", "price": 2.00, "stock": 0},
-        {"id": 60, "name": "PEPSI BLACK LATA 350 ML", "category": "Refrigerantes", "price": 3.60, "stock": 3},
-        {"id": 166, "name": "PEPSI BLACK SEM AÇÚCAR 350 ML", "category": "Refrigerantes", "price": 3.99, "stock": 9},
-        {"id": 61, "name": "PEPSI LATA 350 ML", "category": "Refrigerantes", "price": 10.00, "stock": 5},
-        {"id": 69, "name": "PEPSI TWIST 2 LITROS", "category": "Refrigerantes", "price": 3.60, "stock": 10},
-        {"id": 68, "name": "PEPSI COLA 2 LITROS", "category": "Refrigerantes", "price": 3.99, "stock": 9},
-        {"id": 164, "name": "PEPSI 200 ML", "category": "Refrigerantes", "price": 2.00, "stock": 1},
-
-        # ------------------------
-        # REFRIGERANTES (COCA-COLA)
-        # ------------------------
-        {"id": 113, "name": "COCA-COLA 200 ML", "category": "Refrigerantes", "price": 2.50, "stock": 25},
-        {"id": 115, "name": "COCA-COLA 600 ML", "category": "Refrigerantes", "price": 6.00, "stock": 15},
-        {"id": 149, "name": "COCA-COLA CAFÉ 220 ML", "category": "Refrigerantes", "price": 3.60, "stock": 25},
-        {"id": 114, "name": "COCA-COLA LATA 350 ML", "category": "Refrigerantes", "price": 4.75, "stock": 38},
-        {"id": 117, "name": "COCA-COLA MINI 220 ML", "category": "Refrigerantes", "price": 3.60, "stock": 23},
-        {"id": 121, "name": "COCA-COLA RETORNÁVEL 2 L", "category": "Refrigerantes", "price": 8.00, "stock": 9},
-        {"id": 120, "name": "COCA-COLA ZERO 2 LITROS", "category": "Refrigerantes", "price": 14.00, "stock": 0},
-        {"id": 148, "name": "COCA-COLA ZERO 200 ML", "category": "Refrigerantes", "price": 2.50, "stock": 36},
-        {"id": 173, "name": "COCA-COLA 250 ML", "category": "Refrigerantes", "price": 4.70, "stock": 29},
-        {"id": 192, "name": "COCA-COLA 310 ML", "category": "Refrigerantes", "price": 4.20, "stock": 12},
-        {"id": 182, "name": "COCA-COLA ZERO 220 ML", "category": "Refrigerantes", "price": 3.60, "stock": 24},
-        {"id": 191, "name": "COCA-COLA ZERO 250 ML", "category": "Refrigerantes", "price": 4.70, "stock": 34},
-        {"id": 158, "name": "COCA-COLA 1 L", "category": "Refrigerantes", "price": 7.75, "stock": 14},
-        {"id": 119, "name": "COCA-COLA 2 LITROS", "category": "Refrigerantes", "price": 14.00, "stock": 17},
-
-        # ------------------------
-        # DESTILADOS / BEBIDAS
-        # ------------------------
-        {"id": 179, "name": "VODCA ORLOFF 1 L", "category": "Destilados", "price": 65.00, "stock": 2},
-        {"id": 107, "name": "VERMELHÃO", "category": "Destilados", "price": 65.00, "stock": 2},
-        {"id": 112, "name": "CACHAÇA 51", "category": "Destilados", "price": 20.00, "stock": 4},
-        {"id": 163, "name": "CAMPARI", "category": "Destilados", "price": 70.00, "stock": 6},
-        {"id": 200, "name": "CAMPO LARGO 750 ML", "category": "Destilados", "price": 15.00, "stock": 5},
-        {"id": 201, "name": "CANELINHA 900 ML", "category": "Destilados", "price": 15.00, "stock": 5},
-        {"id": 199, "name": "CATUABA SELVAGEM 900 ML", "category": "Destilados", "price": 18.00, "stock": 4},
-        {"id": 205, "name": "CHANCELER 1 L", "category": "Destilados", "price": 13.99, "stock": 24},
-        {"id": 130, "name": "XEQUE MATE", "category": "Gelo e Drinks Prontos", "price": 6.00, "stock": 0},
-        {"id": 202, "name": "XEQUE MATE 362 ML", "category": "Gelo e Drinks Prontos", "price": 8.90, "stock": 10},
-        {"id": 110, "name": "WHISKY RED LABEL", "category": "Destilados", "price": 100.00, "stock": 1},
-
-        # ------------------------
-        # HEINEKEN / H2O / IGARAPÉ / ETC (da foto)
-        # ------------------------
-        {"id": 95, "name": "H2O LIMONETO", "category": "Refrigerantes", "price": 5.00, "stock": 0},
-        {"id": 102, "name": "H2O LIMONETO 1,5 L", "category": "Refrigerantes", "price": 9.00, "stock": 0},
-        {"id": 132, "name": "HALLS", "category": "Snacks e Doces", "price": 9.00, "stock": 0},
-        {"id": 193, "name": "HEINEKEN 350 ML", "category": "Cervejas", "price": 2.50, "stock": 23},
-        {"id": 123, "name": "HEINEKEN GARRAFA 600 ML", "category": "Cervejas", "price": 6.45, "stock": 30},
-        {"id": 20, "name": "HEINEKEN LATÃO 473 ML", "category": "Cervejas", "price": 13.00, "stock": 9},
-        {"id": 125, "name": "HEINEKEN LONG NECK 330 ML", "category": "Cervejas", "price": 7.00, "stock": 6},
-        {"id": 139, "name": "HEINEKEN LONG NECK ZERO", "category": "Cervejas", "price": 7.70, "stock": 68},
-        {"id": 169, "name": "HEINEKEN PURO MALTE 269 ML", "category": "Cervejas", "price": 8.00, "stock": 82},
-
-        {"id": 195, "name": "IGARAPÉ 1,5 ML COM GÁS", "category": "Água", "price": 4.99, "stock": 8},
-        {"id": 187, "name": "IGARAPÉ 1,5 ML COM GÁS", "category": "Água", "price": 9.00, "stock": 0},
-        {"id": 196, "name": "IGARAPÉ 1,5 ML SEM GÁS", "category": "Água", "price": 4.75, "stock": 12},
-        {"id": 194, "name": "IGARAPÉ 500 ML SEM GÁS", "category": "Água", "price": 4.75, "stock": 9},
-
-        {"id": 135, "name": "ISQUEIRO", "category": "Outros", "price": 2.50, "stock": 20},
-        {"id": 204, "name": "JACK POWER 20", "category": "Outros", "price": 12.00, "stock": 11},
-
-        # ------------------------
-        # GELO / GATORADE / GUARANÁ
-        # ------------------------
-        {"id": 122, "name": "GATORADE", "category": "Outros", "price": 6.00, "stock": 33},
-        {"id": 27, "name": "GELO CUBO 4 KG", "category": "Gelo e Drinks Prontos", "price": 12.00, "stock": 6},
-        {"id": 26, "name": "GELO TRITURADO 8 KG", "category": "Gelo e Drinks Prontos", "price": 12.00, "stock": 5},
-        {"id": 33, "name": "GELO TROPICAL ÁGUA DE COCO", "category": "Gelo e Drinks Prontos", "price": 2.99, "stock": 22},
-        {"id": 32, "name": "GELO TROPICAL LARANJA", "category": "Gelo e Drinks Prontos", "price": 2.99, "stock": 27},
-        {"id": 29, "name": "GELO TROPICAL MAÇÃ VERDE", "category": "Gelo e Drinks Prontos", "price": 2.99, "stock": 33},
-        {"id": 31, "name": "GELO TROPICAL MARACUJÁ", "category": "Gelo e Drinks Prontos", "price": 2.99, "stock": 22},
-        {"id": 30, "name": "GELO TROPICAL MELANCIA", "category": "Gelo e Drinks Prontos", "price": 2.99, "stock": 5},
-        {"id": 28, "name": "GELO TROPICAL MORANGO", "category": "Gelo e Drinks Prontos", "price": 2.99, "stock": 23},
-
-        {"id": 67, "name": "GUARANÁ ANTARCTICA 2 LITROS", "category": "Refrigerantes", "price": 10.00, "stock": 5},
-        {"id": 52, "name": "GUARANÁ ANTARCTICA 200 ML", "category": "Refrigerantes", "price": 2.00, "stock": 4},
-        {"id": 58, "name": "GUARANÁ ANTARCTICA LATA 350 ML", "category": "Refrigerantes", "price": 4.10, "stock": 27},
-        {"id": 66, "name": "GUARANÁ ANTARCTICA ZERO 2 LITROS", "category": "Refrigerantes", "price": 10.50, "stock": 7},
-        {"id": 57, "name": "GUARANÁ ANTARCTICA ZERO 200 ML", "category": "Refrigerantes", "price": 2.00, "stock": 5},
-        {"id": 59, "name": "GUARANÁ ANTARCTICA ZERO LATA 350 ML", "category": "Refrigerantes", "price": 4.10, "stock": 22},
-    ]
-
-    inserted = 0
-
-    for p in produtos:
-        upsert_product(conn, p)
-        inserted += 1
-
-    conn.close()
-
-    print(f"OK! Produtos importados/atualizados: {inserted}")
-    print(f"Banco usado: {DB_PATH}")
-
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+# importar_produtos.py
+# -*- coding: utf-8 -*-
+"""
+Importa/atualiza o catálogo a partir de um export do ERP (CSV ou XLSX).
+
+Uso:
+    python importar_produtos.py [arquivo.csv|arquivo.xlsx] [--chunk-size 500] [--store centro]
+
+Com --sync, só o que mudou é gravado (novos, alterados e desativação do que
+sumiu do arquivo, que volta sozinho se reaparecer), com relatório das
+diferenças; --dry-run só mostra o relatório.
+
+Com --store <slug> o arquivo vai para o catálogo dessa loja (padrão: a loja
+principal). Ids que já pertencem a outra loja são pulados e reportados.
+
+Com DATABASE_URL definido (Postgres), as linhas vão via COPY para uma tabela
+temporária e são mescladas em um único INSERT ... ON CONFLICT.
+Sem ele, grava no mesmo SQLite que o app lê (SQLITE_PATH, se definido).
+
+As linhas passam por um pipeline de geradores (leitura -> validação -> gravação),
+então a memória fica constante mesmo para arquivos com 100k+ linhas. Linhas com
+erro são reportadas (com o número da linha) e puladas, sem abortar a importação.
+"""
+
+import argparse
+import csv
+import hashlib
+import sqlite3
+import sys
+from itertools import islice
+from pathlib import Path
+
+from app import (
+    DATABASE_URL,
+    DB_PATH,
+    DEFAULT_STORE_ID,
+    create_app,
+    init_db,
+    load_psycopg,
+    money_br,
+    parse_price_to_cents,
+    using_postgres,
+)
+
+# XLSX (opcional)
+try:
+    import openpyxl
+except Exception:
+    openpyxl = None
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_FILE = BASE_DIR / "produtos.csv"
+
+DEFAULT_CHUNK_SIZE = 500
+
+# Cabeçalhos aceitos (o ERP exporta em português)
+COLUMN_ALIASES = {
+    "id": "id",
+    "codigo": "id",
+    "código": "id",
+    "cod": "id",
+    "name": "name",
+    "nome": "name",
+    "produto": "name",
+    # descrição só vira nome quando o arquivo não tem coluna de nome
+    "descricao": "description",
+    "descrição": "description",
+    "category": "category",
+    "categoria": "category",
+    "grupo": "category",
+    "price": "price",
+    "preco": "price",
+    "preço": "price",
+    "valor": "price",
+    "stock": "stock",
+    "estoque": "stock",
+}
+
+
+class RowError(ValueError):
+    pass
+
+
+def money_to_cents(v: float) -> int:
+    return int(round(v * 100))
+
+
+def resolve_store_id(conn, slug, pg: bool = False) -> int:
+    if not slug:
+        return DEFAULT_STORE_ID
+    ph = "%s" if pg else "?"
+    row = conn.cursor().execute(f"SELECT id FROM stores WHERE slug={ph};", (slug.strip().lower(),)).fetchone()
+    if row is None:
+        raise RowError(f"loja não encontrada: {slug!r}")
+    return int(row[0])
+
+
+def get_or_create_category(conn, category_name: str, cache=None, commit: bool = True, pg: bool = False):
+    name = category_name.strip()
+    if cache is not None and name in cache:
+        return cache[name]
+
+    cur = conn.cursor()
+    ph = "%s" if pg else "?"
+
+    row = cur.execute(
+        f"SELECT id FROM categories WHERE name={ph};",
+        (name,)
+    ).fetchone()
+
+    if row:
+        category_id = row[0]
+    elif pg:
+        category_id = cur.execute(
+            "INSERT INTO categories (name, is_active) VALUES (%s, 1) RETURNING id;",
+            (name,)
+        ).fetchone()[0]
+        if commit:
+            conn.commit()
+    else:
+        cur.execute(
+            "INSERT INTO categories (name, is_active) VALUES (?, 1);",
+            (name,)
+        )
+        if commit:
+            conn.commit()
+        category_id = cur.lastrowid
+
+    if cache is not None:
+        cache[name] = category_id
+    return category_id
+
+
+def upsert_product(conn, product, category_cache=None, commit: bool = True, store_id: int = DEFAULT_STORE_ID) -> bool:
+    """
+    Insere/atualiza o produto na loja. False se o id já for de outra loja.
+    """
+    cur = conn.cursor()
+
+    category_id = get_or_create_category(conn, product["category"], cache=category_cache, commit=commit)
+
+    price_cents = product.get("price_cents")
+    if price_cents is None:
+        price_cents = money_to_cents(float(product["price"]))
+
+    cur.execute("""
+        INSERT INTO products (
+            id,
+            name,
+            description,
+            price_cents,
+            image_url,
+            category_id,
+            category,
+            is_active,
+            is_promo,
+            promo_price_cents,
+            store_id
+        )
+        VALUES (?, ?, '', ?, '', ?, NULL, 1, 0, NULL, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            name=excluded.name,
+            price_cents=excluded.price_cents,
+            category_id=excluded.category_id,
+            is_active=1,
+            deactivated_by_sync=0
+        WHERE products.store_id = excluded.store_id
+    """, (
+        int(product["id"]),
+        product["name"].strip(),
+        price_cents,
+        category_id,
+        store_id
+    ))
+
+    if commit:
+        conn.commit()
+    return cur.rowcount > 0
+
+
+# =========================
+# PIPELINE (geradores)
+# =========================
+def _normalize_header(cells):
+    header = [COLUMN_ALIASES.get(str(c or "").strip().lower(), str(c or "").strip().lower()) for c in cells]
+    seen = {}
+    for raw, key in zip(cells, header):
+        if key and key in seen:
+            raise RowError(f"cabeçalho: as colunas {seen[key]!r} e {raw!r} são o mesmo campo ({key})")
+        seen[key] = raw
+    return header
+
+
+def iter_csv_rows(path: Path, encoding: str = "utf-8-sig", delimiter=None):
+    """
+    Gera (numero_da_linha, dict) lendo o CSV linha a linha.
+    O separador (; ou ,) é detectado automaticamente se não for informado.
+    """
+    with open(path, newline="", encoding=encoding) as f:
+        if delimiter is None:
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                delimiter = csv.Sniffer().sniff(sample, delimiters=";,\t").delimiter
+            except csv.Error:
+                delimiter = ";" if sample.count(";") > sample.count(",") else ","
+
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = _normalize_header(header)
+
+        for row in reader:
+            if not any((c or "").strip() for c in row):
+                continue
+            yield reader.line_num, dict(zip(header, row))
+
+
+def iter_xlsx_rows(path: Path):
+    """
+    Gera (numero_da_linha, dict) da primeira planilha do XLSX em modo read_only
+    (o openpyxl não carrega a planilha inteira na memória).
+    """
+    if openpyxl is None:
+        raise RuntimeError("openpyxl não instalado. Rode: pip install openpyxl")
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = _normalize_header(header)
+
+        for line_no, row in enumerate(rows, start=2):
+            if not any(c not in (None, "") for c in row):
+                continue
+            yield line_no, dict(zip(header, row))
+    finally:
+        wb.close()
+
+
+def iter_source_rows(path: Path, encoding: str = "utf-8-sig", delimiter=None):
+    if path.suffix.lower() in (".xlsx", ".xlsm"):
+        return iter_xlsx_rows(path)
+    return iter_csv_rows(path, encoding=encoding, delimiter=delimiter)
+
+
+def validate_row(raw: dict) -> dict:
+    """
+    Converte uma linha crua em produto. Levanta RowError se algo estiver inválido.
+    """
+    raw_id = raw.get("id")
+    # só inteiro: "10.001" não pode virar 10 (o XLSX entrega 10.0 como float)
+    if isinstance(raw_id, float) and raw_id.is_integer():
+        pid = int(raw_id)
+    elif isinstance(raw_id, int) and not isinstance(raw_id, bool):
+        pid = raw_id
+    elif isinstance(raw_id, str) and raw_id.strip().isascii() and raw_id.strip().isdigit():
+        pid = int(raw_id.strip())
+    else:
+        raise RowError(f"id inválido: {raw_id!r}")
+    if pid <= 0:
+        raise RowError(f"id inválido: {raw_id!r}")
+
+    name = str((raw.get("name") if "name" in raw else raw.get("description")) or "").strip()
+    if not name:
+        raise RowError("nome vazio")
+
+    category = str(raw.get("category") or "").strip() or "Outros"
+
+    raw_price = raw.get("price")
+    try:
+        if isinstance(raw_price, (int, float)):
+            price_cents = money_to_cents(float(raw_price))
+        else:
+            price_cents = parse_price_to_cents(str(raw_price or ""))
+    except Exception:
+        raise RowError(f"preço inválido: {raw_price!r}")
+    if price_cents < 0:
+        raise RowError(f"preço negativo: {raw_price!r}")
+
+    return dict(id=pid, name=name, category=category, price_cents=price_cents)
+
+
+def iter_valid_products(rows, stats: dict):
+    """
+    Filtra as linhas válidas. Cada erro vai direto para stderr (nada é acumulado),
+    e `stats["errors"]` conta quantas linhas foram puladas.
+    """
+    for line_no, raw in rows:
+        try:
+            yield line_no, validate_row(raw)
+        except RowError as e:
+            stats["errors"] = stats.get("errors", 0) + 1
+            print(f"Linha {line_no}: {e}", file=sys.stderr)
+
+
+def chunked(iterable, size: int):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_products(conn, products, chunk_size: int = DEFAULT_CHUNK_SIZE, store_id: int = DEFAULT_STORE_ID) -> int:
+    """
+    Grava os produtos em blocos de `chunk_size`, com um commit por bloco.
+    """
+    category_cache = {}
+    imported = 0
+
+    for chunk in chunked(products, chunk_size):
+        for line_no, p in chunk:
+            try:
+                if upsert_product(conn, p, category_cache=category_cache, commit=False, store_id=store_id):
+                    imported += 1
+                else:
+                    print(f"Linha {line_no}: id {p['id']} pertence a outra loja (pulado)", file=sys.stderr)
+            except sqlite3.Error as e:
+                print(f"Linha {line_no}: erro no banco: {e}", file=sys.stderr)
+        conn.commit()
+
+    return imported
+
+
+# =========================
+# POSTGRES (COPY + merge em lote)
+# =========================
+PG_MERGE_SQL = """
+    WITH incoming_cats AS (
+        SELECT DISTINCT category AS name FROM staging_products
+    ),
+    new_cats AS (
+        INSERT INTO categories (name, is_active)
+        SELECT name, 1 FROM incoming_cats
+        ON CONFLICT (name) DO NOTHING
+        RETURNING id, name
+    ),
+    cats AS (
+        SELECT id, name FROM new_cats
+        UNION ALL
+        SELECT c.id, c.name FROM categories c JOIN incoming_cats i ON i.name = c.name
+    )
+    INSERT INTO products (
+        id, name, description, price_cents, image_url,
+        category_id, category, is_active, is_promo, promo_price_cents, store_id
+    )
+    SELECT DISTINCT ON (s.id)
+        s.id, s.name, '', s.price_cents, '', cats.id, NULL, 1, 0, NULL, %s
+    FROM staging_products s
+    JOIN cats ON cats.name = s.category
+    ORDER BY s.id, s.line_no DESC
+    ON CONFLICT (id) DO UPDATE SET
+        name=EXCLUDED.name,
+        price_cents=EXCLUDED.price_cents,
+        category_id=EXCLUDED.category_id,
+        is_active=1,
+        deactivated_by_sync=0
+    WHERE products.store_id = EXCLUDED.store_id;
+"""
+
+
+def import_products_postgres(conn, products, store_id: int = DEFAULT_STORE_ID) -> int:
+    """
+    Carrega tudo com COPY ... FROM STDIN numa tabela temporária e mescla com um
+    único INSERT ... ON CONFLICT (categorias resolvidas no mesmo comando).
+    Tudo numa transação só: ou o catálogo inteiro entra, ou nada muda.
+    Ids de outra loja ficam de fora da contagem (o WHERE do ON CONFLICT pula).
+    """
+    with conn.transaction():
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TEMP TABLE staging_products (
+                line_no INTEGER NOT NULL,
+                id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                category TEXT NOT NULL,
+                price_cents INTEGER NOT NULL
+            ) ON COMMIT DROP;
+            """
+        )
+
+        with cur.copy("COPY staging_products (line_no, id, name, category, price_cents) FROM STDIN") as copy:
+            for line_no, p in products:
+                copy.write_row((line_no, p["id"], p["name"], p["category"], p["price_cents"]))
+
+        cur.execute(PG_MERGE_SQL, (store_id,))
+        imported = cur.rowcount
+
+        # ids vieram do ERP: acerta a sequence do SERIAL para o /admin/add não colidir
+        cur.execute(
+            """
+            SELECT setval(pg_get_serial_sequence('products', 'id'),
+                          GREATEST((SELECT MAX(id) FROM products), 1));
+            """
+        )
+
+    return imported
+
+
+# =========================
+# SYNC (só grava o que mudou)
+# =========================
+def row_hash(name: str, category: str, price_cents: int) -> bytes:
+    key = f"{name.strip()}\x1f{category.strip()}\x1f{int(price_cents)}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=12).digest()
+
+
+def load_current_state(conn, store_id: int = DEFAULT_STORE_ID, pg: bool = False) -> dict:
+    """
+    {id: (hash, is_active, name, category, price_cents, deactivated_by_sync)}
+    do catálogo atual da loja. Só colunas pequenas (sem image_blob).
+    """
+    ph = "%s" if pg else "?"
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT p.id, p.name, COALESCE(c.name, p.category, 'Outros'), p.price_cents, p.is_active,
+               p.deactivated_by_sync
+        FROM products p
+        LEFT JOIN categories c ON c.id = p.category_id
+        WHERE p.store_id = {ph};
+        """,
+        (store_id,),
+    )
+    state = {}
+    for pid, name, category, price_cents, is_active, by_sync in cur.fetchall():
+        name = name or ""
+        price_cents = int(price_cents or 0)
+        state[int(pid)] = (
+            row_hash(name, category, price_cents), bool(is_active), name, category, price_cents, bool(by_sync)
+        )
+    return state
+
+
+def load_foreign_ids(conn, store_id: int = DEFAULT_STORE_ID, pg: bool = False) -> set:
+    # ids usados por outras lojas: a chave é global, não dá pra inserir de novo
+    ph = "%s" if pg else "?"
+    cur = conn.cursor()
+    cur.execute(f"SELECT id FROM products WHERE store_id <> {ph};", (store_id,))
+    return {int(r[0]) for r in cur.fetchall()}
+
+
+def sync_products(conn, products, dry_run: bool = False, deactivate_missing: bool = True,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, pg: bool = False, store_id: int = DEFAULT_STORE_ID) -> dict:
+    """
+    Compara o arquivo com o banco e aplica só inserções, alterações e
+    desativações (produtos que sumiram do arquivo). A desativação fica marcada
+    (deactivated_by_sync) e só esses produtos voltam a aparecer quando
+    reaparecem no arquivo: o que o admin escondeu continua escondido.
+    Imprime um relatório das diferenças; com dry_run nada é gravado.
+    """
+    ph = "%s" if pg else "?"
+    insert_sql = (
+        "INSERT INTO products (id, name, description, price_cents, image_url, category_id, is_active, is_promo, store_id) "
+        f"VALUES ({ph}, {ph}, '', {ph}, '', {ph}, 1, 0, {ph});"
+    )
+    update_sql = f"UPDATE products SET name={ph}, price_cents={ph}, category_id={ph} WHERE id={ph} AND store_id={ph};"
+    deactivate_sql = f"UPDATE products SET is_active=0, deactivated_by_sync=1 WHERE id={ph} AND store_id={ph};"
+    reactivate_sql = (
+        f"UPDATE products SET is_active=1, deactivated_by_sync=0 "
+        f"WHERE id={ph} AND store_id={ph} AND deactivated_by_sync=1;"
+    )
+
+    state = load_current_state(conn, store_id, pg=pg)
+    foreign = load_foreign_ids(conn, store_id, pg=pg)
+    category_cache = {}
+    seen = set()
+    stats = {"inserted": 0, "updated": 0, "deactivated": 0, "reactivated": 0, "unchanged": 0, "skipped": 0}
+    inserts, updates, reactivations = [], [], []
+
+    def flush():
+        # no dry-run os blocos só são descartados: memória constante nos dois modos
+        if not dry_run:
+            cur = conn.cursor()
+            if inserts:
+                cur.executemany(insert_sql, inserts)
+            if updates:
+                cur.executemany(update_sql, updates)
+            if reactivations:
+                cur.executemany(reactivate_sql, reactivations)
+            conn.commit()
+        inserts.clear()
+        updates.clear()
+        reactivations.clear()
+
+    for line_no, p in products:
+        pid = p["id"]
+        if pid in foreign:
+            stats["skipped"] += 1
+            print(f"! {pid} {p['name']} (pulado: o id pertence a outra loja)")
+            continue
+        if deactivate_missing:
+            seen.add(pid)  # só os ids (o que sumiu do arquivo sai da diferença)
+        current = state.get(pid)
+        if current is not None and current[5]:
+            # o próprio sync tinha escondido: voltou ao arquivo, volta à vitrine
+            stats["reactivated"] += 1
+            print(f"^ {pid} {p['name']} (reativado: voltou ao arquivo)")
+            reactivations.append((pid, store_id))
+        if current is not None and current[0] == row_hash(p["name"], p["category"], p["price_cents"]):
+            if not current[5]:
+                stats["unchanged"] += 1
+            if len(reactivations) >= chunk_size:
+                flush()
+            continue
+
+        category_id = None
+        if not dry_run:
+            category_id = get_or_create_category(conn, p["category"], cache=category_cache, commit=False, pg=pg)
+
+        if current is None:
+            stats["inserted"] += 1
+            print(f"+ {pid} {p['name']} [{p['category']}] {money_br(p['price_cents'])}")
+            inserts.append((pid, p["name"], p["price_cents"], category_id, store_id))
+        else:
+            stats["updated"] += 1
+            _, _, old_name, old_cat, old_price, _ = current
+            changes = []
+            if old_name != p["name"]:
+                changes.append(f"nome: {old_name!r} -> {p['name']!r}")
+            if old_cat != p["category"]:
+                changes.append(f"categoria: {old_cat} -> {p['category']}")
+            if old_price != p["price_cents"]:
+                changes.append(f"preço: {money_br(old_price)} -> {money_br(p['price_cents'])}")
+            print(f"~ {pid} {p['name']}: " + "; ".join(changes))
+            updates.append((p["name"], p["price_cents"], category_id, pid, store_id))
+
+        if len(inserts) + len(updates) + len(reactivations) >= chunk_size:
+            flush()
+
+    flush()
+
+    if deactivate_missing:
+        missing = [pid for pid, cur_state in state.items() if cur_state[1] and pid not in seen]
+        for pid in missing:
+            print(f"- {pid} {state[pid][2]} (desativado: não está no arquivo)")
+        stats["deactivated"] = len(missing)
+        if missing and not dry_run:
+            conn.cursor().executemany(deactivate_sql, [(pid, store_id) for pid in missing])
+            conn.commit()
+
+    if pg and stats["inserted"] and not dry_run:
+        conn.execute(
+            """
+            SELECT setval(pg_get_serial_sequence('products', 'id'),
+                          GREATEST((SELECT MAX(id) FROM products), 1));
+            """
+        )
+        conn.commit()
+
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa produtos de um CSV/XLSX exportado do ERP.")
+    parser.add_argument("arquivo", nargs="?", default=str(DEFAULT_FILE), help="CSV ou XLSX (padrão: produtos.csv)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="linhas por commit (SQLite)")
+    parser.add_argument("--encoding", default="utf-8-sig", help="encoding do CSV (ex: latin-1)")
+    parser.add_argument("--delimiter", default=None, help="separador do CSV (padrão: detecta ; ou ,)")
+    parser.add_argument("--sync", action="store_true", help="grava só o que mudou e desativa o que sumiu do arquivo")
+    parser.add_argument("--dry-run", action="store_true", help="com --sync: só mostra o relatório, sem gravar")
+    parser.add_argument("--keep-missing", action="store_true", help="com --sync: não desativa produtos ausentes do arquivo")
+    parser.add_argument("--store", default=None, help="slug da loja (padrão: a loja principal)")
+    args = parser.parse_args(argv)
+
+    path = Path(args.arquivo)
+    if not path.exists():
+        print(f"Arquivo não encontrado: {path}", file=sys.stderr)
+        return 1
+
+    # schema em dia (colunas/tabelas novas) no mesmo banco que o app usa
+    app = create_app()
+    with app.app_context():
+        init_db()
+
+    stats = {"errors": 0}
+    products = iter_valid_products(iter_source_rows(path, encoding=args.encoding, delimiter=args.delimiter), stats)
+
+    if using_postgres():
+        psycopg = load_psycopg()
+        if psycopg is None:
+            raise RuntimeError("psycopg não instalado. Adicione psycopg[binary]==3.2.6 no requirements.txt")
+        conn = psycopg.connect(DATABASE_URL)
+        db_label = "Postgres (DATABASE_URL)"
+    else:
+        conn = sqlite3.connect(DB_PATH)
+        db_label = str(DB_PATH)
+
+    try:
+        try:
+            store_id = resolve_store_id(conn, args.store, pg=using_postgres())
+        except RowError as e:
+            print(str(e), file=sys.stderr)
+            return 1
+        try:
+            if args.sync:
+                result = sync_products(
+                    conn,
+                    products,
+                    dry_run=args.dry_run,
+                    deactivate_missing=not args.keep_missing,
+                    chunk_size=max(1, args.chunk_size),
+                    pg=using_postgres(),
+                    store_id=store_id,
+                )
+            elif using_postgres():
+                inserted = import_products_postgres(conn, products, store_id=store_id)
+            else:
+                inserted = import_products(conn, products, chunk_size=max(1, args.chunk_size), store_id=store_id)
+        except RowError as e:
+            # cabeçalho inválido: o erro sai antes da primeira linha, nada gravado
+            print(f"{path}: {e}", file=sys.stderr)
+            return 1
+    finally:
+        conn.close()
+
+    if not (args.sync and args.dry_run):
+        snapshot = app.extensions.get("catalog_snapshot")
+        if snapshot is not None:
+            # sem o arquivo, a vitrine (todos os workers) republica no próximo acesso
+            with app.app_context():
+                snapshot.discard(store_id)
+
+    if args.sync:
+        prefix = "DRY-RUN (nada gravado)" if args.dry_run else "OK! Sync"
+        print(
+            f"{prefix}: {result['inserted']} novos, {result['updated']} alterados, "
+            f"{result['deactivated']} desativados, {result['reactivated']} reativados, "
+            f"{result['unchanged']} sem mudança"
+            + (f", {result['skipped']} de outra loja (pulados)" if result["skipped"] else "")
+        )
+    else:
+        print(f"OK! Produtos importados/atualizados: {inserted}")
+    if stats["errors"]:
+        print(f"Linhas com erro (ignoradas): {stats['errors']}")
+    print(f"Arquivo: {path}")
+    print(f"Banco usado: {db_label}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+/* sw.js - service worker da vitrine (gerado por /sw.js, ver PWA no app.py)
+ *
+ * - shell (CSS/JS/ícones/checkout): guardado na instalação; cache novo a cada deploy
+ * - vitrine (URLS.index): sai do cache na hora e, em segundo plano, compara a revisão
+ *   do catálogo (/api/catalog/revision); mudou -> baixa de novo e avisa a página
+ * - imagens /img/<id>.webp?v=...: stale-while-revalidate, uma versão por produto
+ * - /assets/* (nome com hash) e CDN: cache-first
+ * O carrinho continua no localStorage; o pedido sai pelo checkout.html.
+ * Cada loja registra o próprio worker (/sw.js ou /s/<slug>/sw.js): URLS são as dela.
+ */
+const SHELL_REVISION = {{ shell_revision|tojson }};
+const PRECACHE = {{ precache|tojson }};
+const URLS = {{ urls|tojson }};
+
+const SHELL_CACHE = "nc-shell-" + SHELL_REVISION;
+const PAGES_CACHE = "nc-pages-v1";
+const IMG_CACHE = "nc-img-v1";
+const CDN_CACHE = "nc-cdn-v1";
+const KEEP = [SHELL_CACHE, PAGES_CACHE, IMG_CACHE, CDN_CACHE];
+
+const IMG_MAX_ENTRIES = 400;
+const REVISION_HEADER = "X-Catalog-Revision";
+const CDN_HOSTS = ["cdn.jsdelivr.net", "fonts.googleapis.com", "fonts.gstatic.com"];
+
+self.addEventListener("install", (event) => {
+  event.waitUntil(
+    caches.open(SHELL_CACHE)
+      .then((cache) => cache.addAll(PRECACHE))
+      .then(() => self.skipWaiting())
+  );
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    caches.keys()
+      .then((names) => Promise.all(names.filter((n) => n.startsWith("nc-") && !KEEP.includes(n)).map((n) => caches.delete(n))))
+      .then(() => self.clients.claim())
+  );
+});
+
+self.addEventListener("message", (event) => {
+  // admin logado: a vitrine guardada é a do visitante, não serve para ele
+  if (event.data === "drop-pages") {
+    event.waitUntil(caches.delete(PAGES_CACHE));
+  }
+});
+
+self.addEventListener("fetch", (event) => {
+  const req = event.request;
+  if (req.method !== "GET") return;
+  const url = new URL(req.url);
+
+  if (url.origin !== self.location.origin) {
+    if (CDN_HOSTS.includes(url.hostname)) event.respondWith(cacheFirst(CDN_CACHE, req));
+    return;
+  }
+  if (url.pathname === URLS.index && !url.search && req.mode === "navigate") {
+    event.respondWith(catalogPage(event));
+  } else if (url.pathname === URLS.checkout && req.mode === "navigate") {
+    event.respondWith(staleWhileRevalidate(PAGES_CACHE, req, event));
+  } else if (url.pathname.startsWith("/img/")) {
+    event.respondWith(productImage(req, url, event));
+  } else if (url.pathname.startsWith(URLS.assets) || PRECACHE.includes(url.pathname)) {
+    event.respondWith(cacheFirst(SHELL_CACHE, req));
+  }
+});
+
+// ---- vitrine ----
+async function catalogPage(event) {
+  const cache = await caches.open(PAGES_CACHE);
+  const cached = await cache.match(URLS.index);
+  if (cached) {
+    event.waitUntil(refreshCatalog(cache, cached.headers.get(REVISION_HEADER)));
+    return cached;
+  }
+  const fresh = await fetch(event.request);
+  if (fresh.ok && fresh.headers.get(REVISION_HEADER)) {
+    await cache.put(URLS.index, fresh.clone());
+  }
+  return fresh;
+}
+
+async function refreshCatalog(cache, cachedRevision) {
+  let revision;
+  try {
+    const res = await fetch(URLS.revision, { cache: "no-store", credentials: "same-origin" });
+    revision = (await res.json()).revision;
+  } catch (e) {
+    return; // offline: fica com a versão guardada
+  }
+  if (revision === cachedRevision) return;
+  if (revision === null) {
+    await cache.delete(URLS.index);
+    return;
+  }
+  const fresh = await fetch(URLS.index, { credentials: "same-origin" });
+  if (!fresh.ok || !fresh.headers.get(REVISION_HEADER)) return;
+  await cache.put(URLS.index, fresh);
+  const clients = await self.clients.matchAll({ type: "window" });
+  clients.forEach((c) => c.postMessage({ type: "catalog-updated", revision }));
+}
+
+// ---- imagens de produto ----
+async function productImage(req, url, event) {
+  const cache = await caches.open(IMG_CACHE);
+  const cached = await cache.match(req);
+  const network = fetch(req).then(async (res) => {
+    if (res.ok) {
+      await cache.put(req, res.clone());
+      await dropOtherVersions(cache, url);
+      await trim(cache, IMG_MAX_ENTRIES);
+    }
+    return res;
+  });
+  if (cached) {
+    event.waitUntil(network.catch(() => null));
+    return cached;
+  }
+  return network;
+}
+
+async function dropOtherVersions(cache, url) {
+  // /img/12.webp?v=novo substitui /img/12.webp?v=velho
+  const keys = await cache.keys();
+  await Promise.all(
+    keys.filter((k) => {
+      const u = new URL(k.url);
+      return u.pathname === url.pathname && u.search !== url.search;
+    }).map((k) => cache.delete(k))
+  );
+}
+
+async function trim(cache, max) {
+  const keys = await cache.keys();
+  // keys() vem na ordem de inserção: sai o mais antigo
+  for (let i = 0; i < keys.length - max; i++) await cache.delete(keys[i]);
+}
+
+// ---- genéricos ----
+async function cacheFirst(name, req) {
+  const cache = await caches.open(name);
+  const cached = await cache.match(req);
+  if (cached) return cached;
+  const res = await fetch(req);
+  if (res.ok || res.type === "opaque") await cache.put(req, res.clone());
+  return res;
+}
+
+async function staleWhileRevalidate(name, req, event) {
+  const cache = await caches.open(name);
+  const cached = await cache.match(req, { ignoreSearch: true }) || await caches.match(req, { ignoreSearch: true });
+  const network = fetch(req).then(async (res) => {
+    if (res.ok) await cache.put(req, res.clone());
+    return res;
+  });
+  if (cached) {
+    event.waitUntil(network.catch(() => null));
+    return cached;
+  }
+  return network;
+}